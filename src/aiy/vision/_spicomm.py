@@ -13,13 +13,18 @@
 # limitations under the License.
 """Python wrapper around the VisionBonnet Spicomm device node."""
 
+import contextlib
 import fcntl
+import logging
 import mmap
 import multiprocessing as mp
 import os
 import signal
 import struct
 import threading
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger(__name__)
 
 SPICOMM_DEV = '/dev/vision_spicomm'
 
@@ -29,6 +34,7 @@ SPICOMM_IOCTL_TRANSACT_MMAP = 0xc0108904
 
 HEADER_SIZE = 4 * 4
 DEFAULT_PAYLOAD_SIZE = 12 * 1024 * 1024  # 12M
+DEFAULT_POOL_SIZE = 0  # Pooling is opt-in, see SyncSpicommMmap.
 
 FLAG_ERROR = 1 << 0
 FLAG_TIMEOUT = 1 << 1
@@ -38,6 +44,9 @@ def _get_default_payload_size():
     return int(os.environ.get('VISION_BONNET_SPICOMM_DEFAULT_PAYLOAD_SIZE',
                               DEFAULT_PAYLOAD_SIZE))
 
+def _get_pool_size():
+    return int(os.environ.get('VISION_BONNET_SPICOMM_POOL_SIZE', DEFAULT_POOL_SIZE))
+
 
 class SpicommError(IOError):
     """Base class for all Spicomm errors."""
@@ -74,6 +83,11 @@ def _read_payload(buf, payload_size):
     return buf[HEADER_SIZE:HEADER_SIZE + payload_size]
 
 
+def _view_payload(buf, payload_size):
+    """Returns memoryview of payload bytes without copying them."""
+    return memoryview(buf)[HEADER_SIZE:HEADER_SIZE + payload_size]
+
+
 def _write_header(buf, timeout_ms, payload_size):
     """Writes transaction header into buffer."""
     buf[0:HEADER_SIZE] = struct.pack('IIII', 0, timeout_ms, len(buf), payload_size)
@@ -139,6 +153,61 @@ def _async_loop(dev, pipe, default_payload_size):
         except Exception as e:
             pipe.send(e)
 
+def _async_shm_loop(dev, pipe, shm):
+    # Essentially this process can only receive SIGKILL.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    while True:
+        payload_size, timeout = pipe.recv()
+        use_shm = payload_size <= (len(shm) - HEADER_SIZE)
+
+        if use_shm:
+            buf = shm  # Request payload is already there.
+        else:
+            buf = bytearray(HEADER_SIZE + payload_size)
+
+        timeout_ms = _get_timeout_ms(timeout, payload_size)
+
+        _write_header(buf, timeout_ms, payload_size)
+        if not use_shm:
+            pipe.recv_bytes_into(buf, HEADER_SIZE)
+
+        try:
+            fcntl.ioctl(dev, SPICOMM_IOCTL_TRANSACT, buf)
+            flags, _, _, payload_size = _read_header(buf)
+            e = _get_exception(flags, timeout_ms, payload_size)
+            if e is not None:
+                pipe.send(e)
+            else:
+                pipe.send(payload_size)
+                if not use_shm:
+                    pipe.send_bytes(buf, HEADER_SIZE, payload_size)
+        except Exception as e:
+            pipe.send(e)
+
+
+@contextlib.contextmanager
+def _deferred_sigint():
+    """Defers SIGINT handling in the main thread until the end of the block."""
+    if threading.current_thread() is not threading.main_thread():
+        yield  # Signals are only delivered to the main thread.
+        return
+
+    captured_args = None
+    def handler(*args):
+        nonlocal captured_args
+        captured_args = args
+    old_handler = signal.signal(signal.SIGINT, handler)
+    try:
+        yield
+    finally:
+        # Setup old SIGINT handler or call it directly if SIGINT already happened
+        signal.signal(signal.SIGINT, old_handler)
+        if captured_args:
+            old_handler(*captured_args)
+
+
 class AsyncSpicomm:
     """Class for communication with VisionBonnet via kernel driver.
 
@@ -151,14 +220,18 @@ class AsyncSpicomm:
         self._dev = os.open(SPICOMM_DEV, os.O_RDWR)
         self._pipe, pipe = mp.Pipe()
         self._lock = threading.Lock()
-        ctx = mp.get_context('fork')
 
         if default_payload_size is None:
             default_payload_size = _get_default_payload_size()
 
-        self._process = ctx.Process(target=_async_loop, daemon=True,
+        self._process = self._start_process(pipe, default_payload_size)
+
+    def _start_process(self, pipe, default_payload_size):
+        ctx = mp.get_context('fork')
+        process = ctx.Process(target=_async_loop, daemon=True,
             args=(self._dev, pipe, default_payload_size))
-        self._process.start()
+        process.start()
+        return process
 
     def __enter__(self):
         return self
@@ -174,12 +247,14 @@ class AsyncSpicomm:
     def reset(self):
         fcntl.ioctl(self._dev, SPICOMM_IOCTL_RESET)
 
-    def transact(self, request, timeout=None):
+    def transact(self, request, timeout=None, copy=True):
         """Execute transaction in a separate process.
 
         Args:
           request: Request bytes to send.
           timeout: How long a response will be waited for, in seconds.
+          copy: Whether to copy response data out of the transaction buffer.
+            Only makes difference for AsyncSpicommShm.
 
         Returns:
           Bytes-like object with response data.
@@ -189,29 +264,66 @@ class AsyncSpicomm:
           SpicommTimeoutError: Transaction timed out.
           SpicommError: Transaction error.
         """
+        # Execute communication transaction without SIGINT interruptions
+        with self._lock, _deferred_sigint():
+            response = self.transact_impl(request, timeout, copy)
 
-        # Setup temporary SIGINT handler
-        with self._lock:
-            captured_args = None
-            def handler(*args):
-                nonlocal captured_args
-                captured_args = args
-            old_handler = signal.signal(signal.SIGINT, handler)
-
-            # Execute communication transaction without SIGINT interruptions
-            self._pipe.send((len(request), timeout))
-            self._pipe.send_bytes(request)
-            response = self._pipe.recv()
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def transact_impl(self, request, timeout, copy):
+        self._pipe.send((len(request), timeout))
+        self._pipe.send_bytes(request)
+        return self._pipe.recv()
 
-            # Setup old SIGINT handler or call it directly if SIGINT already happened
-            signal.signal(signal.SIGINT, old_handler)
-            if captured_args:
-                old_handler(*captured_args)
 
-            if isinstance(response, Exception):
-                raise response
+class AsyncSpicommShm(AsyncSpicomm):
+    """Class for communication with VisionBonnet via kernel driver.
+
+    Same as AsyncSpicomm, but request and response payloads are passed through
+    memory shared with the helper process, only their sizes go through the
+    pipe. Payloads which don't fit into default_payload_size still go through
+    the pipe.
+    """
+
+    def _start_process(self, pipe, default_payload_size):
+        # Anonymous mapping is shared with the child process after fork().
+        self._shm = mmap.mmap(-1, HEADER_SIZE + default_payload_size)
+        ctx = mp.get_context('fork')
+        process = ctx.Process(target=_async_shm_loop, daemon=True,
+            args=(self._dev, pipe, self._shm))
+        process.start()
+        return process
+
+    def close(self):
+        super().close()
+        self._shm.close()
+
+    def transact_impl(self, request, timeout, copy):
+        """With copy=False the response is returned as memoryview over shared
+        memory. It is only valid until the next transaction and must be
+        released before close()."""
+        payload_size = len(request)
+        use_shm = payload_size <= (len(self._shm) - HEADER_SIZE)
+
+        if use_shm:
+            _write_payload(self._shm, request)
+            self._pipe.send((payload_size, timeout))
+        else:
+            self._pipe.send((payload_size, timeout))
+            self._pipe.send_bytes(request)
+
+        response = self._pipe.recv()
+        if isinstance(response, Exception):
             return response
 
+        if not use_shm:
+            return self._pipe.recv_bytes()
+        if not copy:
+            return _view_payload(self._shm, response)
+        return bytearray(_read_payload(self._shm, response))
+
 
 class SyncSpicommBase:
     def __init__(self):
@@ -230,11 +342,11 @@ class SyncSpicommBase:
     def reset(self):
         fcntl.ioctl(self._dev, SPICOMM_IOCTL_RESET)
 
-    def transact(self, request, timeout=None):
+    def transact(self, request, timeout=None, copy=True):
         with self._lock:
-            return self.transact_impl(request, timeout)
+            return self.transact_impl(request, timeout, copy)
 
-    def transact_impl(self, request, timeout):
+    def transact_impl(self, request, timeout, copy):
         raise NotImplementedError
 
 
@@ -251,12 +363,15 @@ class SyncSpicomm(SyncSpicommBase):
             default_payload_size = _get_default_payload_size()
         self._allocated_buf = bytearray(HEADER_SIZE + default_payload_size)
 
-    def transact_impl(self, request, timeout):
+    def transact_impl(self, request, timeout, copy):
         """Execute transaction in the current process.
 
         Args:
           request: Request bytes to send.
           timeout: How long a response will be waited for, in seconds.
+          copy: Whether to copy response data out of the transaction buffer.
+            If False, returned memoryview is only valid until the next
+            transaction and must be released before close().
 
         Returns:
           Bytes-like object with response data.
@@ -284,12 +399,14 @@ class SyncSpicomm(SyncSpicommBase):
         _check_flags(flags, timeout_ms, payload_size)
 
         if use_allocated_buf:
+            if not copy:
+                return _view_payload(buf, payload_size)
             return bytearray(_read_payload(buf, payload_size))
 
         return _read_payload(buf, payload_size)
 
 
-def _transact_mmap(dev, mm, offset, request, timeout):
+def _transact_mmap(dev, mm, offset, request, timeout, copy=True):
     payload_size = len(request)
     timeout_ms = _get_timeout_ms(timeout, payload_size)
     flags = 0
@@ -303,34 +420,136 @@ def _transact_mmap(dev, mm, offset, request, timeout):
     fcntl.ioctl(dev, SPICOMM_IOCTL_TRANSACT_MMAP, buf)
     flags, _, _, payload_size = _read_header(buf)
     _check_flags(flags, timeout_ms, payload_size)
+    if not copy:
+        return memoryview(mm)[0:payload_size]
     return bytearray(mm[0:payload_size])
 
 
+# hits: int, number of transactions which reused pooled mapping.
+# misses: int, number of transactions which needed a new mapping.
+# evictions: int, number of pooled mappings closed to stay within limits.
+# mapped_bytes: int, total size of currently pooled mappings.
+MmapPoolStats = namedtuple('MmapPoolStats', ('hits', 'misses', 'evictions', 'mapped_bytes'))
+
+
+def _num_pages(size):
+    return (size + mmap.PAGESIZE - 1) // mmap.PAGESIZE
+
+
+class _MmapPool:
+    """Pool of mappings for requests which don't fit into the default mapping.
+
+    Mappings are grouped into power-of-two size classes (in pages), one mapping
+    per class. Class with 2^k pages always lives at base + 2^k page offset, so
+    mappings of different classes never overlap. Least recently used mappings
+    are closed when the total size or count goes over the limit.
+    """
+
+    def __init__(self, dev, base_offset, max_bytes, max_mappings):
+        self._dev = dev
+        self._base_offset = base_offset
+        self._max_bytes = max_bytes
+        self._max_mappings = max_mappings
+        self._mappings = OrderedDict()  # size class -> mmap, in LRU order
+        self._mapped_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def stats(self):
+        return MmapPoolStats(self._hits, self._misses, self._evictions, self._mapped_bytes)
+
+    def _evict(self, needed_bytes):
+        while self._mappings and (
+                self._mapped_bytes + needed_bytes > self._max_bytes or
+                len(self._mappings) >= self._max_mappings):
+            _, mm = self._mappings.popitem(last=False)
+            self._mapped_bytes -= len(mm)
+            self._evictions += 1
+            mm.close()
+
+    @contextlib.contextmanager
+    def mapping(self, size):
+        """Yields (page offset, mmap) pair with at least size bytes."""
+        size_class = 1 << (_num_pages(size) - 1).bit_length()
+        offset = self._base_offset + size_class
+        length = size_class * mmap.PAGESIZE
+
+        mm = self._mappings.get(size_class)
+        if mm is not None:
+            self._hits += 1
+            self._mappings.move_to_end(size_class)
+            yield offset, mm
+            return
+
+        self._misses += 1
+        if length > self._max_bytes:
+            # Doesn't fit into the pool at all, use temporary mapping.
+            with mmap.mmap(self._dev, length=size, offset=mmap.PAGESIZE * offset) as mm:
+                yield offset, mm
+            return
+
+        self._evict(length)
+        mm = mmap.mmap(self._dev, length=length, offset=mmap.PAGESIZE * offset)
+        self._mappings[size_class] = mm
+        self._mapped_bytes += length
+        yield offset, mm
+
+    def close(self):
+        self._evict(self._max_bytes + 1)
+
+
 class SyncSpicommMmap(SyncSpicommBase):
     """Class for communication with VisionBonnet via kernel driver.
 
     Driver ioctl() calls are made in the same process. All threads in the current
     process are *not* blocked while icotl() is running.
+
+    Requests which don't fit into the default mapping get a temporary mapping
+    by default. With pool_size (or VISION_BONNET_SPICOMM_POOL_SIZE environment
+    variable) greater than 0 such mappings are kept for reuse instead, up to
+    pool_size bytes in total. Pooled mappings are driver (vmalloc) memory which
+    stays allocated until close(), in addition to the default mapping.
     """
 
-    def __init__(self, default_payload_size=None):
+    # Driver supports up to 8 mappings: default, pooled and one temporary.
+    MAX_POOLED_MAPPINGS = 6
+
+    def __init__(self, default_payload_size=None, pool_size=None):
         super().__init__()
         if default_payload_size is None:
             default_payload_size = _get_default_payload_size()
+        if pool_size is None:
+            pool_size = _get_pool_size()
         self._mm = mmap.mmap(self._dev, length=default_payload_size, offset=0)
+        self._pool = _MmapPool(self._dev, _num_pages(default_payload_size), pool_size,
+                               self.MAX_POOLED_MAPPINGS)
 
     def close(self):
+        self._pool.close()
         self._mm.close()
         super().close()
 
-    def transact_impl(self, request, timeout=None):
+    def pool_stats(self):
+        """Returns MmapPoolStats of the extra mappings pool."""
+        with self._lock:
+            return self._pool.stats
+
+    def transact_impl(self, request, timeout=None, copy=True):
+        """Execute transaction in the current process.
+
+        With copy=False the response is returned as memoryview over the default
+        mapping. It is only valid until the next transaction and must be
+        released before close(). Responses to requests which don't fit into
+        the default mapping are always copied.
+        """
         if len(request) < len(self._mm):
             # Default buffer
-            return _transact_mmap(self._dev, self._mm, 0, request, timeout)
+            return _transact_mmap(self._dev, self._mm, 0, request, timeout, copy)
 
-        # Temporary bigger buffer
-        offset = (len(self._mm) + (mmap.PAGESIZE - 1)) // mmap.PAGESIZE
-        with mmap.mmap(self._dev, length=len(request), offset=mmap.PAGESIZE * offset) as mm:
+        # Bigger buffer from the pool
+        with self._pool.mapping(len(request)) as (offset, mm):
             return _transact_mmap(self._dev, mm, offset, request, timeout)
 
 
@@ -343,5 +562,22 @@ class SyncSpicommMmap(SyncSpicommBase):
 _spicomm_type = os.environ.get('VISION_BONNET_SPICOMM', None)
 _spicomm_types = {'sync': SyncSpicomm,
                   'sync_mmap': SyncSpicommMmap,
-                  'async': AsyncSpicomm}
-Spicomm = _spicomm_types.get(_spicomm_type, SyncSpicommMmap)
+                  'async': AsyncSpicomm,
+                  'async_shm': AsyncSpicommShm}
+
+
+def _auto_spicomm(*args, **kwargs):
+    """Creates the fastest Spicomm saved by 'python3 -m aiy.vision.spicomm_bench --auto'."""
+    from . import spicomm_bench
+    spicomm_type = spicomm_bench.cached_type()
+    if spicomm_type is None:
+        logger.warning('No saved Spicomm benchmark, using sync_mmap. Run '
+                       '"python3 -m aiy.vision.spicomm_bench --auto" to pick the fastest type.')
+        spicomm_type = 'sync_mmap'
+    return _spicomm_types[spicomm_type](*args, **kwargs)
+
+
+if _spicomm_type == 'auto':
+    Spicomm = _auto_spicomm
+else:
+    Spicomm = _spicomm_types.get(_spicomm_type, SyncSpicommMmap)
@@ -0,0 +1,190 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Conversion of images to planar VisionBonnet input tensors."""
+
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# data: bytes-like object with pixel data, e.g. picamera capture buffer.
+# width: int, image width.
+# height: int, image height.
+# format: string, 'rgb' (interleaved), 'yuv' (planar YUV420) or 'gray'.
+#
+# Buffers may have picamera padding: width rounded up to 32 and height to 16.
+RawImage = namedtuple('RawImage', ('data', 'width', 'height', 'format'))
+
+RAW_FORMATS = ('rgb', 'yuv', 'gray')
+
+
+class TensorError(ValueError):
+    pass
+
+
+def _round_up(value, n):
+    return (value + n - 1) // n * n
+
+
+def _raw_size(width, height, fmt):
+    if fmt == 'rgb':
+        return 3 * width * height
+    if fmt == 'yuv':
+        return width * height + 2 * ((width + 1) // 2) * ((height + 1) // 2)
+    if fmt == 'gray':
+        return width * height
+    raise TensorError('Unsupported raw image format: %s. Must be one of %s.' %
+                      (fmt, ', '.join(RAW_FORMATS)))
+
+
+def _raw_frame_size(image):
+    """Returns (frame_width, frame_height) of the buffer, i.e. with padding."""
+    size = len(memoryview(image.data).cast('B'))
+    if size == _raw_size(image.width, image.height, image.format):
+        return image.width, image.height
+    frame_width, frame_height = _round_up(image.width, 32), _round_up(image.height, 16)
+    if size == _raw_size(frame_width, frame_height, image.format):
+        return frame_width, frame_height
+    raise TensorError('Raw %s image buffer size %d does not match %dx%d resolution.' %
+                      (image.format, size, image.width, image.height))
+
+
+def _require_numpy(what):
+    if np is None:
+        raise TensorError('NumPy is required to convert %s.' % what)
+
+
+def is_jpeg(image):
+    return isinstance(image, (bytes, bytearray, memoryview))
+
+
+def tensor_shape(image):
+    """Returns (batch, height, width, depth) of the tensor for the image.
+
+    Zero height, width and depth mean JPEG data decoded on the bonnet.
+    """
+    if is_jpeg(image):
+        return 1, 0, 0, 0
+
+    if isinstance(image, RawImage):
+        _raw_size(image.width, image.height, image.format)  # Validates format.
+        return 1, image.height, image.width, 1 if image.format == 'gray' else 3
+
+    if np is not None and isinstance(image, np.ndarray):
+        if image.dtype != np.uint8:
+            raise TensorError('Unsupported array type: %s. Must be uint8.' % image.dtype)
+        if image.ndim == 2:
+            return (1,) + image.shape + (1,)
+        if image.ndim == 3 and image.shape[2] in (1, 3):
+            return (1,) + image.shape
+        raise TensorError('Unsupported array shape: %s. Must be HxW, HxWx1 or HxWx3.' %
+                          (image.shape,))
+
+    width, height = image.size
+    if image.mode == 'RGB':
+        return 1, height, width, 3
+    if image.mode == 'L':
+        return 1, height, width, 1
+    raise TensorError('Unsupported image format: %s. Must be L or RGB.' % image.mode)
+
+
+def _write_yuv(image, out):
+    height, width = image.height, image.width
+    frame_width, frame_height = _raw_frame_size(image)
+    data = np.frombuffer(image.data, dtype=np.uint8)
+    y_size = frame_width * frame_height
+    uv_width, uv_height = (frame_width + 1) // 2, (frame_height + 1) // 2
+    uv_size = uv_width * uv_height
+
+    y = data[:y_size].reshape(frame_height, frame_width)[:height, :width]
+    u = data[y_size:y_size + uv_size].reshape(uv_height, uv_width)
+    v = data[y_size + uv_size:y_size + 2 * uv_size].reshape(uv_height, uv_width)
+    u = u[:(height + 1) // 2, :(width + 1) // 2] - np.float32(128.0)
+    v = v[:(height + 1) // 2, :(width + 1) // 2] - np.float32(128.0)
+
+    # Full range BT.601, the same as JPEG and picamera use. Chroma terms are
+    # rounded at chroma resolution, luma is added in integers.
+    planes = out.reshape(3, height, width)
+    for plane, chroma in zip(planes, (1.402 * v,
+                                      -0.344136 * u - 0.714136 * v,
+                                      1.772 * u)):
+        offset = np.floor(chroma + 0.5).astype(np.int16)
+        # Chroma planes are upsampled by pixel repetition.
+        offset = offset.repeat(2, axis=0).repeat(2, axis=1)[:height, :width]
+        np.add(offset, y, out=offset)
+        np.clip(offset, 0, 255, out=offset)
+        plane[...] = offset
+
+
+def _write_array(array, out):
+    """Writes HxWxC array into planar CxHxW output array."""
+    height, width = array.shape[:2]
+    if array.ndim == 2:
+        out.reshape(height, width)[...] = array
+    else:
+        out.reshape(array.shape[2], height, width)[...] = array.transpose(2, 0, 1)
+
+
+def write_tensor(image, out):
+    """Writes planar tensor data of the image into writable buffer.
+
+    Args:
+      image: PIL.Image, HxW or HxWxC uint8 NumPy array, RawImage or JPEG bytes.
+      out: writable bytes-like object with exact size of the tensor data.
+    """
+    out = memoryview(out).cast('B')
+    if is_jpeg(image):
+        image = memoryview(image).cast('B')
+        if len(image) != len(out):
+            raise TensorError('JPEG data size %d does not match tensor data size %d.' %
+                              (len(image), len(out)))
+        out[:] = image
+        return
+
+    if isinstance(image, RawImage):
+        _require_numpy('raw images')
+        array = np.frombuffer(out, dtype=np.uint8)
+        if image.format == 'yuv':
+            _write_yuv(image, array)
+            return
+        frame_width, frame_height = _raw_frame_size(image)
+        depth = 1 if image.format == 'gray' else 3
+        data = np.frombuffer(image.data, dtype=np.uint8)
+        data = data[:frame_width * frame_height * depth].reshape(frame_height, frame_width, depth)
+        _write_array(data[:image.height, :image.width], array)
+        return
+
+    if np is not None and isinstance(image, np.ndarray):
+        _write_array(image, np.frombuffer(out, dtype=np.uint8))
+        return
+
+    if np is not None:
+        _write_array(np.asarray(image), np.frombuffer(out, dtype=np.uint8))
+        return
+
+    # PIL image without NumPy.
+    if image.mode == 'RGB':
+        size = image.size[0] * image.size[1]
+        for i, band in enumerate(image.split()):
+            out[i * size:(i + 1) * size] = band.tobytes()
+    else:
+        out[:] = image.tobytes()
+
+
+def tensor_data_size(shape):
+    batch, height, width, depth = shape
+    return batch * height * width * depth
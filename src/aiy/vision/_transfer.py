@@ -0,0 +1,129 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Host-side reduction of ImageInference payload.
+
+Images much larger than the model input are downscaled before sending, and
+then sent either as raw planar tensor or as JPEG, whichever is expected to be
+cheaper. The bonnet resizes input to the model input shape anyway, so the
+result only differs by resampling.
+"""
+
+import io
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bonnet decodes JPEG and the host encodes it, both take time. The overhead is
+# expressed as the number of raw bytes which take the same time to transfer.
+JPEG_OVERHEAD_BYTES = 64 * 1024
+
+# Rough compressed size of natural images, bytes per pixel per quality level.
+_JPEG_BYTES_PER_PIXEL = ((50, 0.1), (75, 0.15), (90, 0.25), (95, 0.4), (100, 1.0))
+
+
+def estimate_jpeg_size(width, height, quality):
+    for max_quality, bytes_per_pixel in _JPEG_BYTES_PER_PIXEL:
+        if quality <= max_quality:
+            break
+    return int(width * height * bytes_per_pixel)
+
+
+def _to_pil(image):
+    """Returns PIL.Image for supported inputs, or None to send image as is."""
+    if isinstance(image, Image.Image):
+        return image if image.mode in ('RGB', 'L') else None
+    if np is not None and isinstance(image, np.ndarray) and image.dtype == np.uint8:
+        if image.ndim == 2:
+            return Image.fromarray(image, 'L')
+        if image.ndim == 3 and image.shape[2] == 3:
+            return Image.fromarray(image, 'RGB')
+    return None
+
+
+def target_size(size, input_size, max_scale):
+    """Returns image size reduced to at most max_scale times model input size.
+
+    Aspect ratio is preserved. Zero input dimension means any size.
+    """
+    width, height = size
+    input_width, input_height = input_size
+    factor = 1.0
+    if input_width:
+        factor = max(factor, width / (max_scale * input_width))
+    if input_height:
+        factor = max(factor, height / (max_scale * input_height))
+    if factor == 1.0:
+        return size
+    return max(1, round(width / factor)), max(1, round(height / factor))
+
+
+def optimize(image, input_size, max_scale=2.0, jpeg_quality=90):
+    """Returns (image, original_size) to send instead of the original image.
+
+    Args:
+      image: PIL.Image, NumPy array or anything else ImageInference accepts.
+      input_size: (width, height) of the model input, zeros mean any size.
+      max_scale: float, maximum ratio of sent image size to model input size.
+      jpeg_quality: int, quality of JPEG encoding.
+
+    Returns:
+      Tuple of image to send (possibly JPEG bytes) and (width, height) of the
+      original image, which is None when the original image is sent unchanged.
+    """
+    pil_image = _to_pil(image)
+    if pil_image is None:
+        return image, None
+
+    size = target_size(pil_image.size, input_size, max_scale)
+    depth = 3 if pil_image.mode == 'RGB' else 1
+    raw_bytes = size[0] * size[1] * depth
+    jpeg_bytes = estimate_jpeg_size(size[0], size[1], jpeg_quality) + JPEG_OVERHEAD_BYTES
+
+    if size == pil_image.size and (depth == 1 or raw_bytes <= jpeg_bytes):
+        return image, None
+
+    original_size = pil_image.size
+    if size != original_size:
+        pil_image = pil_image.resize(size, Image.BILINEAR)
+
+    # Bonnet expects 3 channel JPEG input.
+    if depth == 3 and jpeg_bytes < raw_bytes:
+        f = io.BytesIO()
+        pil_image.save(f, format='JPEG', quality=jpeg_quality)
+        return f.getvalue(), original_size
+    return pil_image, original_size
+
+
+def restore(result, original_size):
+    """Maps InferenceResult coordinates from sent image space back to original.
+
+    Only result size and window are changed; models with pixel coordinates in
+    output tensors have zero input size, so their images are never resized.
+    """
+    if not result.width or not result.height:
+        return result
+    width, height = original_size
+    scale_x, scale_y = width / result.width, height / result.height
+    result.width, result.height = width, height
+    window = result.window
+    window.x = round(window.x * scale_x)
+    window.y = round(window.y * scale_y)
+    window.width = round(window.width * scale_x)
+    window.height = round(window.height * scale_y)
+    return result
@@ -27,35 +27,55 @@ class _SpiTransport:
     def __init__(self):
         self._spicomm = _spicomm.Spicomm()
 
-    def send(self, request, timeout=None):
-        return self._spicomm.transact(request, timeout=timeout)
+    def send(self, request, timeout=None, copy=True):
+        return self._spicomm.transact(request, timeout=timeout, copy=copy)
 
     def close(self):
         self._spicomm.close()
 
 
+_HEADER = struct.Struct('!I')  # Message size, 4 bytes.
+
+
+def _socket_recvall_into(s, view):
+    """Fills the whole view with received bytes. Returns False on EOF."""
+    while view:
+        size = s.recv_into(view)
+        if not size:
+            return False
+        view = view[size:]
+    return True
+
+
 def _socket_recvall(s, size):
-    buf = b''
-    while size:
-        newbuf = s.recv(size)
-        if not newbuf:
-            return None
-        buf += newbuf
-        size -= len(newbuf)
+    buf = bytearray(size)
+    if not _socket_recvall_into(s, memoryview(buf)):
+        return None
     return buf
 
 
 def _socket_receive_message(s):
-    buf = _socket_recvall(s, 4)  # 4 bytes
+    buf = _socket_recvall(s, _HEADER.size)
     if not buf:
         return None
-    size = struct.unpack('!I', buf)[0]
+    size = _HEADER.unpack(buf)[0]
     return _socket_recvall(s, size)
 
 
 def _socket_send_message(s, msg):
-    s.sendall(struct.pack('!I', len(msg)))  # 4 bytes
-    s.sendall(msg)  # len(msg) bytes
+    header = _HEADER.pack(len(msg))
+    if not hasattr(s, 'sendmsg'):
+        s.sendall(header)
+        s.sendall(msg)
+        return
+
+    # Header and message in one syscall, the rest (if any) with sendall().
+    sent = s.sendmsg((header, msg))
+    if sent < len(header):
+        s.sendall(header[sent:])
+        s.sendall(msg)
+    elif sent < len(header) + len(msg):
+        s.sendall(memoryview(msg)[sent - len(header):])
 
 
 class _SocketTransport:
@@ -63,25 +83,64 @@ class _SocketTransport:
 
     def __init__(self):
         """Open connection to the bonnet."""
-        self._client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
         host = os.environ.get('VISION_BONNET_HOST', '172.28.28.10')
         port = int(os.environ.get('VISION_BONNET_PORT', '35000'))
-        self._client.connect((host, port))
-
-    def send(self, request, timeout=None):
-        _socket_send_message(self._client, request)
-        return _socket_receive_message(self._client)
+        self._address = (host, port)
+        self._header = bytearray(_HEADER.size)
+        self._buf = bytearray(64 * 1024)
+        self._client = None
+        self._connect()
+
+    def _connect(self):
+        self._client = socket.create_connection(self._address)
+        self._client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _receive(self):
+        if not _socket_recvall_into(self._client, memoryview(self._header)):
+            raise ConnectionError('Connection closed by VisionBonnet.')
+        size = _HEADER.unpack(self._header)[0]
+        if size > len(self._buf):
+            self._buf = bytearray(max(size, 2 * len(self._buf)))
+        view = memoryview(self._buf)[:size]
+        if not _socket_recvall_into(self._client, view):
+            raise ConnectionError('Connection closed by VisionBonnet.')
+        return view
+
+    def send(self, request, timeout=None, copy=True):
+        """Sends request and returns response bytes.
+
+        With copy=False the response is returned as memoryview over the
+        internal receive buffer, valid only until the next call.
+        """
+        if self._client is None:
+            self._connect()
+
+        self._client.settimeout(timeout)
+        try:
+            _socket_send_message(self._client, request)
+            response = self._receive()
+        except OSError:
+            # Response stream is out of sync now, reconnect on the next call.
+            self.close()
+            raise
+        return response if not copy else bytes(response)
 
     def close(self):
-        self._client.close()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
 
 
 def _is_arm():
     return os.uname()[4].startswith('arm')
 
 
+_transport_types = {'spi': _SpiTransport,
+                    'socket': _SocketTransport}
+
+
 def make_transport():
-    if _is_arm():
-        return _SpiTransport()
-    return _SocketTransport()
+    transport_type = os.environ.get('VISION_BONNET_TRANSPORT', None)
+    if transport_type is None:
+        transport_type = 'spi' if _is_arm() else 'socket'
+    return _transport_types[transport_type]()
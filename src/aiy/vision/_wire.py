@@ -0,0 +1,239 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Decoding of serialized Response with output tensors as NumPy arrays.
+
+Protobuf parser turns every float of packed FloatTensor.data into a Python
+float, which takes most of the parse time for dense model outputs (e.g. 15K
+floats of object detection). Here serialized bytes are scanned instead,
+packed float payloads become np.frombuffer() views and only the remaining
+small fields (model name, window, frame, tensor shape) are parsed by protobuf.
+"""
+
+from collections import namedtuple
+
+from google.protobuf.message import DecodeError
+
+from .proto import protocol_pb2 as pb2
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_LENGTH_DELIMITED = 2
+_WIRE_FIXED32 = 5
+
+_RESPONSE_INFERENCE_RESULT = \
+    pb2.Response.DESCRIPTOR.fields_by_name['inference_result'].number
+_INFERENCE_RESULT_TENSORS = \
+    pb2.InferenceResult.DESCRIPTOR.fields_by_name['tensors'].number
+_TENSORS_ENTRY_KEY = 1
+_TENSORS_ENTRY_VALUE = 2
+_FLOAT_TENSOR_DATA = pb2.FloatTensor.DESCRIPTOR.fields_by_name['data'].number
+
+# Message methods which would leave tensors out of sync with the message.
+_MESSAGE_REPLACING_METHODS = frozenset(('Clear', 'CopyFrom', 'MergeFrom', 'MergeFromString',
+                                        'ParseFromString'))
+
+# Same fields as pb2.FloatTensor, data is read-only float32 NumPy array.
+FloatTensor = namedtuple('FloatTensor', ('shape', 'data', 'indices'))
+
+
+class InferenceResult:
+    """pb2.InferenceResult with tensors dict of FloatTensor namedtuples.
+
+    All other fields are read from (and written to) the parsed message.
+    Serialization and field listing see the tensors too, methods replacing
+    the whole message are not supported.
+    """
+    __slots__ = ('_message', 'tensors')
+
+    def __init__(self, message, tensors):
+        object.__setattr__(self, '_message', message)
+        object.__setattr__(self, 'tensors', tensors)
+
+    def __getattr__(self, name):
+        if name in _MESSAGE_REPLACING_METHODS:
+            raise TypeError('InferenceResult with NumPy tensors does not support %s().' % name)
+        return getattr(self._message, name)
+
+    def to_message(self):
+        """Returns equivalent pb2.InferenceResult, tensor data is copied."""
+        message = pb2.InferenceResult()
+        message.CopyFrom(self._message)
+        for name, tensor in self.tensors.items():
+            entry = message.tensors[name]
+            entry.shape.CopyFrom(tensor.shape)
+            entry.data.extend(tensor.data.tolist())
+            entry.indices.extend(tensor.indices)
+        return message
+
+    def SerializeToString(self, **kwargs):
+        return self.to_message().SerializeToString(**kwargs)
+
+    def ByteSize(self):
+        return self.to_message().ByteSize()
+
+    def ListFields(self):
+        return self.to_message().ListFields()
+
+    def HasField(self, name):
+        return self.to_message().HasField(name)
+
+    def __setattr__(self, name, value):
+        setattr(self._message, name, value)
+
+    def __repr__(self):
+        return 'InferenceResult(%r, tensors=%r)' % (self._message, self.tensors)
+
+
+class Response:
+    """pb2.Response with inference_result as InferenceResult, or as bytes
+    from parse_response_raw()."""
+    __slots__ = ('_message', 'inference_result')
+
+    def __init__(self, message, inference_result):
+        self._message = message
+        self.inference_result = inference_result
+
+    def __getattr__(self, name):
+        return getattr(self._message, name)
+
+
+def _read_varint(data, pos, end):
+    result = shift = 0
+    while pos < end:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+    raise DecodeError('Truncated varint.')
+
+
+def _fields(data, start, end):
+    """Yields (field number, wire type, field start, value start, value end)."""
+    pos = start
+    while pos < end:
+        key, value_start = _read_varint(data, pos, end)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == _WIRE_VARINT:
+            _, value_end = _read_varint(data, value_start, end)
+        elif wire_type == _WIRE_FIXED64:
+            value_end = value_start + 8
+        elif wire_type == _WIRE_FIXED32:
+            value_end = value_start + 4
+        elif wire_type == _WIRE_LENGTH_DELIMITED:
+            size, value_start = _read_varint(data, value_start, end)
+            value_end = value_start + size
+        else:
+            raise DecodeError('Unsupported wire type: %d.' % wire_type)
+        if value_end > end:
+            raise DecodeError('Truncated message.')
+        yield number, wire_type, pos, value_start, value_end
+        pos = value_end
+
+
+def _float_tensor(data, start, end):
+    rest, chunks = [], []
+    for number, wire_type, field_start, value_start, value_end in _fields(data, start, end):
+        if number == _FLOAT_TENSOR_DATA and wire_type == _WIRE_LENGTH_DELIMITED:
+            chunks.append((value_start, value_end))
+        else:
+            rest.append(data[field_start:value_end])
+    tensor = pb2.FloatTensor.FromString(b''.join(rest))
+
+    if any((end - start) % 4 for start, end in chunks):
+        raise DecodeError('Packed float data size is not a multiple of 4.')
+    arrays = [np.frombuffer(data, dtype='<f4', count=(end - start) // 4, offset=start)
+              for start, end in chunks]
+    if tensor.data:  # Unpacked floats, allowed by protobuf but never sent.
+        arrays.append(np.array(tensor.data, dtype='<f4'))
+    if len(arrays) == 1:
+        values = arrays[0]
+    else:
+        values = np.concatenate(arrays) if arrays else np.empty(0, dtype='<f4')
+        values.flags.writeable = False
+    return FloatTensor(tensor.shape, values, tensor.indices)
+
+
+def _tensors_entry(data, start, end):
+    name, tensor = '', None
+    for number, wire_type, _, value_start, value_end in _fields(data, start, end):
+        if wire_type != _WIRE_LENGTH_DELIMITED:
+            continue
+        if number == _TENSORS_ENTRY_KEY:
+            name = bytes(data[value_start:value_end]).decode('utf-8')
+        elif number == _TENSORS_ENTRY_VALUE:
+            tensor = _float_tensor(data, value_start, value_end)
+    if tensor is None:
+        tensor = FloatTensor(pb2.TensorShape(), np.empty(0, dtype='<f4'), ())
+    return name, tensor
+
+
+def _inference_result(data, start, end):
+    rest, tensors = [], {}
+    for number, wire_type, field_start, value_start, value_end in _fields(data, start, end):
+        if number == _INFERENCE_RESULT_TENSORS and wire_type == _WIRE_LENGTH_DELIMITED:
+            name, tensor = _tensors_entry(data, value_start, value_end)
+            tensors[name] = tensor  # Last entry wins, like in protobuf maps.
+        else:
+            rest.append(data[field_start:value_end])
+    return InferenceResult(pb2.InferenceResult.FromString(b''.join(rest)), tensors)
+
+
+def _split_response(data):
+    """Returns (pb2.Response without inference_result, list of its payload spans)."""
+    rest, chunks = [], []
+    for number, wire_type, field_start, value_start, value_end in _fields(data, 0, len(data)):
+        if number == _RESPONSE_INFERENCE_RESULT and wire_type == _WIRE_LENGTH_DELIMITED:
+            chunks.append((value_start, value_end))
+        else:
+            rest.append(data[field_start:value_end])
+    return pb2.Response.FromString(b''.join(rest)), chunks
+
+
+def parse_response_raw(data):
+    """Returns Response with inference_result as serialized pb2.InferenceResult.
+
+    Parsing of the result is left to the caller, e.g. to a worker process.
+    """
+    data = bytes(data)
+    message, chunks = _split_response(data)
+    # Concatenated messages are merged by protobuf parser.
+    return Response(message, b''.join(data[start:end] for start, end in chunks))
+
+
+def parse_response(data):
+    """Returns Response parsed from serialized pb2.Response.
+
+    Float arrays of inference_result tensors keep a reference to a copy of
+    data, so data itself may be reused after the call.
+    """
+    data = bytes(data)
+    message, chunks = _split_response(data)
+    if not chunks:
+        return Response(message, message.inference_result)
+    if len(chunks) > 1:
+        # Repeated embedded message is merged by protobuf, never sent this way.
+        merged = pb2.InferenceResult()
+        for start, end in chunks:
+            merged.MergeFromString(data[start:end])
+        data = merged.SerializeToString()
+        chunks = [(0, len(data))]
+    return Response(message, _inference_result(data, *chunks[0]))
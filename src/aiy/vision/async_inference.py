@@ -0,0 +1,241 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Asyncio interface to the inference engine on the Vision Bonnet.
+
+All transactions of one engine run one by one on a dedicated thread, so the
+event loop is never blocked by the transport. Example::
+
+  async def main():
+      async with AsyncCameraInference(face_detection.model()) as inference:
+          async for result in inference.results():
+              print(face_detection.get_faces(result))
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import time
+
+from .inference import InferenceEngine
+
+
+class AsyncInferenceEngine:
+    """Awaitable version of InferenceEngine.
+
+    Methods have the same arguments and results as in InferenceEngine.
+    """
+
+    def __init__(self, engine=None, loop=None):
+        """Initialization.
+
+        Args:
+          engine: InferenceEngine to use, new one is created by default and
+            closed together with this object.
+          loop: asyncio event loop, the loop running the calling coroutine
+            by default.
+        """
+        self._owns_engine = engine is None
+        self._engine = engine or InferenceEngine()
+        self._loop = loop
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def engine(self):
+        return self._engine
+
+    def _get_loop(self):
+        # Called from coroutines, where get_event_loop() returns the running loop.
+        return self._loop or asyncio.get_event_loop()
+
+    def _run(self, func, *args, **kwargs):
+        return self._get_loop().run_in_executor(self._executor,
+                                                functools.partial(func, *args, **kwargs))
+
+    async def close(self):
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        try:
+            # Waits for transactions in flight, e.g. from cancelled calls.
+            await self._get_loop().run_in_executor(None, executor.shutdown)
+        finally:
+            if self._owns_engine:
+                self._engine.close()
+            self._engine = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_tb):
+        await self.close()
+
+    async def load_model(self, descriptor):
+        return await self._run(self._engine.load_model, descriptor)
+
+    async def unload_model(self, model_name):
+        return await self._run(self._engine.unload_model, model_name)
+
+    async def start_camera_inference(self, model_name, params=None, sparse_configs=None):
+        return await self._run(self._engine.start_camera_inference,
+                               model_name, params, sparse_configs)
+
+    async def camera_inference(self):
+        return await self._run(self._engine.camera_inference)
+
+    async def stop_camera_inference(self):
+        return await self._run(self._engine.stop_camera_inference)
+
+    async def get_inference_state(self):
+        return await self._run(self._engine.get_inference_state)
+
+    async def get_camera_state(self):
+        return await self._run(self._engine.get_camera_state)
+
+    async def get_firmware_info(self):
+        return await self._run(self._engine.get_firmware_info)
+
+    async def get_system_info(self):
+        return await self._run(self._engine.get_system_info)
+
+    async def image_inference(self, model_name, image, params=None, sparse_configs=None):
+        return await self._run(self._engine.image_inference,
+                               model_name, image, params, sparse_configs)
+
+    async def reset(self):
+        return await self._run(self._engine.reset)
+
+
+class _CameraResults:
+    """Async iterator over camera inference results."""
+
+    def __init__(self, inference, count):
+        self._inference = inference
+        self._remaining = count
+        self._before = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._remaining is not None:
+            if self._remaining <= 0:
+                raise StopAsyncIteration
+            self._remaining -= 1
+
+        result = await self._inference.engine.camera_inference()
+        now = time.monotonic()
+        self._inference._rate = 1.0 / (now - self._before) if self._before else 0.0
+        self._before = now
+        self._inference._count += 1
+        return result
+
+
+class AsyncCameraInference:
+    """Asyncio version of CameraInference, use with 'async with'.
+
+    Cancelling the task which waits for the next result is safe: the result
+    of the transaction in flight is dropped.
+    """
+
+    def __init__(self, descriptor, params=None, sparse_configs=None, engine=None,
+                 model_cache=None):
+        """Initialization.
+
+        Args:
+          descriptor: ModelDescriptor of the model to run.
+          params: dict, additional parameters to run inference.
+          sparse_configs: dict, sparse configs of output tensors.
+          engine: AsyncInferenceEngine to share, new one is created by default.
+          model_cache: ModelCache to borrow the model from. By default the
+            model is loaded if needed and unloaded on close.
+        """
+        self._descriptor = descriptor
+        self._params = params
+        self._sparse_configs = sparse_configs
+        self._owns_engine = engine is None
+        self._engine = engine
+        self._model_cache = model_cache
+        self._model_name = None
+        self._model_loaded = False
+        self._model_borrowed = False
+        self._started = False
+        self._rate = 0.0
+        self._count = 0
+
+    async def open(self):
+        if self._engine is None:
+            self._engine = AsyncInferenceEngine()
+            self._owns_engine = True
+        try:
+            if self._model_cache is not None:
+                self._model_name = await self._engine._run(self._model_cache.acquire,
+                                                           self._descriptor)
+                self._model_borrowed = True
+            else:
+                self._model_name, self._model_loaded = await self._engine._run(
+                    self._engine.engine._load_model, self._descriptor)
+
+            await self._engine.start_camera_inference(self._model_name, self._params,
+                                                      self._sparse_configs)
+            self._started = True
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    def results(self, count=None):
+        """Returns async iterator over camera inference results.
+
+        Args:
+          count: int, number of results, unlimited by default.
+        """
+        return _CameraResults(self, count)
+
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @property
+    def count(self):
+        return self._count
+
+    async def close(self):
+        if self._engine is None:
+            return
+        try:
+            if self._started:
+                self._started = False
+                await self._engine.stop_camera_inference()
+            if self._model_loaded:
+                self._model_loaded = False
+                await self._engine.unload_model(self._model_name)
+            if self._model_borrowed:
+                self._model_borrowed = False
+                self._model_cache.release(self._model_name)
+        finally:
+            if self._owns_engine:
+                await self._engine.close()
+            self._engine = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_value, exc_tb):
+        await self.close()
@@ -0,0 +1,417 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+VisionBonnet emulator which speaks the same protocol as the socket transport.
+
+It lets :class:`~aiy.vision.inference.InferenceEngine` run on any host without
+the board: the emulator keeps track of loaded models and camera inference state
+and replays canned or synthetic inference results with a configurable per-model
+latency. Start it and point the library to it::
+
+  python3 -m aiy.vision.emulator --port 35000 \\
+      --latency object_detection=0.036 \\
+      --tensor object_detection:concat_1=1,1,1,7668
+  VISION_BONNET_HOST=127.0.0.1 VISION_BONNET_PORT=35000 python3 my_app.py
+"""
+
+import argparse
+import itertools
+import logging
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from .proto import protocol_pb2 as pb2
+from ._transport import _socket_receive_message, _socket_send_message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 35000
+DEFAULT_CAMERA_RESOLUTION = (1640, 1232)
+
+
+def synthetic_result(shapes, rng=random):
+    """Returns InferenceResult with random dense tensors of the given shapes.
+
+    Args:
+      shapes: dict, tensor name -> (batch, height, width, depth) tuple.
+      rng: random.Random-like object used to generate tensor values.
+    """
+    result = pb2.InferenceResult()
+    for name, (batch, height, width, depth) in shapes.items():
+        tensor = result.tensors[name]
+        tensor.shape.batch = batch
+        tensor.shape.height = height
+        tensor.shape.width = width
+        tensor.shape.depth = depth
+        tensor.data.extend(rng.random() for _ in range(batch * height * width * depth))
+    return result
+
+
+def read_results(f):
+    """Reads sequence of serialized InferenceResult messages from binary file.
+
+    Each message is prefixed with its size as 4-byte big-endian integer, i.e.
+    the same framing the socket transport uses.
+    """
+    results = []
+    while True:
+        buf = f.read(4)
+        if not buf:
+            return results
+        size = struct.unpack('!I', buf)[0]
+        result = pb2.InferenceResult()
+        result.ParseFromString(f.read(size))
+        results.append(result)
+
+
+def write_results(f, results):
+    """Writes sequence of InferenceResult messages readable by read_results()."""
+    for result in results:
+        data = result.SerializeToString()
+        f.write(struct.pack('!I', len(data)))
+        f.write(data)
+
+
+def _jpeg_size(data):
+    """Returns (width, height) of JPEG image or (0, 0) if size is unknown."""
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return 0, 0
+        marker = data[i + 1]
+        length = struct.unpack('>H', data[i + 2:i + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return 0, 0
+
+
+class _Error(Exception):
+    pass
+
+
+class BonnetEmulator:
+    """Emulates VisionBonnet request processing.
+
+    The emulator is transport agnostic: handle() takes serialized pb2.Request
+    bytes and returns serialized pb2.Response bytes.
+    """
+
+    def __init__(self, results=None, latency=None, default_latency=0.0,
+                 camera_resolution=DEFAULT_CAMERA_RESOLUTION, framerate=30.0,
+                 firmware_version=(1, 2), seed=None):
+        """Initialization.
+
+        Args:
+          results: dict, model name -> list of pb2.InferenceResult to replay
+            cyclically, or dict of tensor name -> shape to generate synthetic
+            results with. Models without entry produce results without tensors.
+          latency: dict, model name -> simulated inference time in seconds.
+          default_latency: float, inference time for models not in latency.
+          camera_resolution: (width, height) of the emulated camera.
+          framerate: float, emulated camera frame rate.
+          firmware_version: (major, minor) reported firmware version.
+          seed: optional seed for synthetic tensor values.
+        """
+        self._results = dict(results or {})
+        self._latency = dict(latency or {})
+        self._default_latency = default_latency
+        self._camera_resolution = camera_resolution
+        self._frame_period = 1.0 / framerate
+        self._firmware_version = firmware_version
+        self._rng = random.Random(seed)
+        self._start_time = time.monotonic()
+
+        self._lock = threading.Lock()  # Protects everything below.
+        self._replay = {}
+        self._loaded_models = {}
+        self._processing_model = None
+        self._frame_index = 0
+        self._last_frame_time = 0.0
+
+        self._handlers = {
+            'load_model': self._load_model,
+            'unload_model': self._unload_model,
+            'image_inference': self._image_inference,
+            'start_camera_inference': self._start_camera_inference,
+            'camera_inference': self._camera_inference,
+            'stop_camera_inference': self._stop_camera_inference,
+            'get_camera_state': self._get_camera_state,
+            'get_firmware_info': self._get_firmware_info,
+            'get_system_info': self._get_system_info,
+            'get_inference_state': self._get_inference_state,
+            'reset': self._reset,
+        }
+
+    @property
+    def loaded_models(self):
+        with self._lock:
+            return set(self._loaded_models)
+
+    def handle(self, request_bytes):
+        """Processes serialized request and returns serialized response."""
+        response = pb2.Response()
+        try:
+            request = pb2.Request()
+            request.ParseFromString(request_bytes)
+            kind = request.WhichOneof('request')
+            handler = self._handlers.get(kind)
+            if handler is None:
+                raise _Error('Unsupported request: %s' % kind)
+            handler(getattr(request, kind), response)
+            response.status.code = pb2.Response.Status.OK
+        except Exception as e:
+            response.Clear()
+            response.status.code = pb2.Response.Status.ERROR
+            response.status.message = str(e) or e.__class__.__name__
+        return response.SerializeToString()
+
+    def _model_latency(self, model_name):
+        return self._latency.get(model_name, self._default_latency)
+
+    def _check_loaded(self, model_name):
+        if model_name not in self._loaded_models:
+            raise _Error('Model "%s" is not loaded.' % model_name)
+
+    def _next_result(self, model_name):
+        source = self._results.get(model_name)
+        if source is None:
+            return pb2.InferenceResult()
+        if isinstance(source, dict):
+            return synthetic_result(source, self._rng)
+        replay = self._replay.get(model_name)
+        if replay is None:
+            replay = self._replay[model_name] = itertools.cycle(source)
+        result = pb2.InferenceResult()
+        result.CopyFrom(next(replay))
+        return result
+
+    def _make_result(self, model_name, width, height):
+        with self._lock:
+            result = self._next_result(model_name)
+        latency = self._model_latency(model_name)
+        if latency > 0:
+            time.sleep(latency)
+        result.model_name = model_name
+        result.width = width
+        result.height = height
+        if not result.HasField('window'):
+            result.window.width = width
+            result.window.height = height
+        result.duration_ms = int(1000 * latency)
+        return result
+
+    def _load_model(self, request, response):
+        if not request.model_name:
+            raise _Error('Model name must not be empty.')
+        with self._lock:
+            if request.model_name in self._loaded_models:
+                raise _Error('Model "%s" is already loaded.' % request.model_name)
+            self._loaded_models[request.model_name] = request.input_shape
+        logger.info('Loaded model "%s" (%d bytes).', request.model_name,
+                    len(request.compute_graph))
+
+    def _unload_model(self, request, response):
+        with self._lock:
+            self._check_loaded(request.model_name)
+            if self._processing_model == request.model_name:
+                raise _Error('Model "%s" is running camera inference.' % request.model_name)
+            del self._loaded_models[request.model_name]
+
+    def _image_inference(self, request, response):
+        with self._lock:
+            self._check_loaded(request.model_name)
+        shape = request.tensor.shape
+        if shape.width and shape.height:
+            width, height = shape.width, shape.height
+        else:
+            width, height = _jpeg_size(request.tensor.data)
+        response.inference_result.CopyFrom(
+            self._make_result(request.model_name, width, height))
+
+    def _start_camera_inference(self, request, response):
+        with self._lock:
+            self._check_loaded(request.model_name)
+            if self._processing_model is not None:
+                raise _Error('Camera inference is already running.')
+            self._processing_model = request.model_name
+
+    def _camera_inference(self, request, response):
+        with self._lock:
+            model_name = self._processing_model
+            if model_name is None:
+                raise _Error('Camera inference is not running.')
+            # Wait for the next camera frame like the real board does.
+            now = time.monotonic()
+            self._last_frame_time = max(now, self._last_frame_time + self._frame_period)
+            wait = self._last_frame_time - now
+            self._frame_index += 1
+            index = self._frame_index
+        if wait > 0:
+            time.sleep(wait)
+
+        width, height = self._camera_resolution
+        result = self._make_result(model_name, width, height)
+        result.frame.index = index
+        result.frame.timestamp_us = int(time.monotonic() * 1000000)
+        response.inference_result.CopyFrom(result)
+
+    def _stop_camera_inference(self, request, response):
+        with self._lock:
+            self._processing_model = None
+
+    def _get_camera_state(self, request, response):
+        width, height = self._camera_resolution
+        response.camera_state.running = True
+        response.camera_state.width = width
+        response.camera_state.height = height
+
+    def _get_firmware_info(self, request, response):
+        major, minor = self._firmware_version
+        response.firmware_info.major_version = major
+        response.firmware_info.minor_version = minor
+
+    def _get_system_info(self, request, response):
+        response.system_info.uptime_seconds = int(time.monotonic() - self._start_time)
+        response.system_info.temperature_celsius = 40.0
+
+    def _get_inference_state(self, request, response):
+        with self._lock:
+            response.inference_state.loaded_models.extend(sorted(self._loaded_models))
+            if self._processing_model is not None:
+                response.inference_state.processing_models.append(self._processing_model)
+
+    def _reset(self, request, response):
+        with self._lock:
+            self._loaded_models.clear()
+            self._processing_model = None
+            self._replay.clear()
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        logger.info('New connection from %s:%d', *self.client_address)
+        while True:
+            request = _socket_receive_message(self.request)
+            if request is None:
+                break
+            _socket_send_message(self.request, self.server.emulator.handle(request))
+        logger.info('Connection from %s:%d closed', *self.client_address)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class EmulatorServer:
+    """Serves BonnetEmulator over TCP in a background thread.
+
+    Use port=0 to pick any free port, then read the actual one from address.
+    """
+
+    def __init__(self, emulator=None, host='127.0.0.1', port=DEFAULT_PORT):
+        self._server = _TCPServer((host, port), _RequestHandler)
+        self._server.emulator = emulator or BonnetEmulator()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info('Emulator is listening on %s:%d', *self.address)
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    @property
+    def emulator(self):
+        return self._server.emulator
+
+    def close(self):
+        self._server.shutdown()
+        self._thread.join()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+
+def _parse_latency(value):
+    model_name, seconds = value.split('=', 1)
+    return model_name, float(seconds)
+
+
+def _parse_tensor(value):
+    key, shape = value.split('=', 1)
+    model_name, tensor_name = key.split(':', 1)
+    shape = tuple(int(x) for x in shape.split(','))
+    if len(shape) != 4:
+        raise argparse.ArgumentTypeError('Tensor shape must be batch,height,width,depth')
+    return model_name, tensor_name, shape
+
+
+def _parse_replay(value):
+    model_name, path = value.split('=', 1)
+    return model_name, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='VisionBonnet emulator.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=_parse_latency, action='append', default=[],
+                        metavar='MODEL=SECONDS', help='Per-model inference latency.')
+    parser.add_argument('--default_latency', type=float, default=0.0,
+                        help='Inference latency for models without --latency.')
+    parser.add_argument('--tensor', type=_parse_tensor, action='append', default=[],
+                        metavar='MODEL:NAME=B,H,W,D', help='Synthetic output tensor.')
+    parser.add_argument('--replay', type=_parse_replay, action='append', default=[],
+                        metavar='MODEL=FILE', help='File with InferenceResults to replay.')
+    parser.add_argument('--framerate', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    results = {}
+    for model_name, tensor_name, shape in args.tensor:
+        results.setdefault(model_name, {})[tensor_name] = shape
+    for model_name, path in args.replay:
+        with open(path, 'rb') as f:
+            results[model_name] = read_results(f)
+
+    emulator = BonnetEmulator(results=results,
+                              latency=dict(args.latency),
+                              default_latency=args.default_latency,
+                              framerate=args.framerate,
+                              seed=args.seed)
+    with EmulatorServer(emulator, args.host, args.port):
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -23,12 +23,23 @@ how to use this API.
 """
 
 import contextlib
+import fcntl
+import hashlib
 import itertools
+import json
 import logging
+import os
+import queue
+import tempfile
+import threading
 import time
 from collections import namedtuple
 
 from .proto import protocol_pb2 as pb2
+from . import _tensor
+from . import _transfer
+from . import _wire
+from ._tensor import RawImage
 from ._transport import make_transport
 
 logger = logging.getLogger(__name__)
@@ -91,31 +102,229 @@ def _close_stack_silently(stack):
     except Exception:
         pass
 
+def _enter_model(stack, engine, descriptor, model_cache):
+    """Loads or borrows model for the lifetime of stack, returns its name."""
+    if model_cache is not None:
+        return stack.enter_context(model_cache.borrow(descriptor))
+
+    model_name, uploaded = engine._load_model(descriptor)
+    if uploaded:
+        stack.callback(lambda: engine.unload_model(model_name))
+    return model_name
+
+class _Prefetcher:
+    """Requests camera inference results on a background thread.
+
+    The next transaction is in flight while up to depth received results wait
+    in the queue.
+    """
+
+    def __init__(self, fetch, depth):
+        self._fetch = fetch
+        self._queue = queue.Queue(maxsize=depth)
+        self._stopped = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='CameraInferencePrefetch',
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                self._queue.put(self._fetch())
+        except Exception as e:
+            self._queue.put(e)
+
+    def get(self):
+        """Returns the next result, None after close()."""
+        if self._error is not None:
+            raise self._error
+        item = self._queue.get()
+        if item is None:
+            self._queue.put(None)  # Wake up other waiting callers.
+        elif isinstance(item, Exception):
+            self._error = item
+            raise item
+        return item
+
+    def _drain(self):
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def close(self):
+        self._stopped.set()
+        # Unblocks put() of the last result, the thread exits after it.
+        while self._thread.is_alive():
+            self._drain()
+            self._thread.join(timeout=0.01)
+        self._drain()
+        self._queue.put(None)
+
+
+class _LatestPoller:
+    """Requests camera inference results on a background thread, keeping only
+    the newest one."""
+
+    def __init__(self, engine):
+        self._engine = engine
+        self._condition = threading.Condition()  # Protects everything below.
+        self._result = None
+        self._received = None
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='CameraInferencePoller',
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._closed:
+                result = self._engine.camera_inference()
+                with self._condition:
+                    self._result, self._received = result, time.monotonic()
+                    self._condition.notify_all()
+        except Exception as e:
+            with self._condition:
+                self._error = e
+                self._condition.notify_all()
+
+    def latest(self):
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            if self._result is None:
+                return None, None
+            return self._result, time.monotonic() - self._received
+
+    def wait(self, after=None, timeout=None):
+        def ready():
+            return (self._error is not None or self._closed or
+                    (self._result is not None and
+                     (after is None or self._result.frame.index > after)))
+
+        with self._condition:
+            if not self._condition.wait_for(ready, timeout):
+                return None
+            if self._error is not None:
+                raise self._error
+            if self._closed:
+                return None
+            return self._result
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        # The thread exits after the transaction in flight.
+        self._thread.join()
+
+
 class CameraInference:
     """Helper class to run camera inference."""
 
-    def __init__(self, descriptor, params=None, sparse_configs=None):
+    def __init__(self, descriptor, params=None, sparse_configs=None, model_cache=None,
+                 prefetch=0, latest_only=False, raw_results=False):
+        """Initialization.
+
+        Args:
+          descriptor: ModelDescriptor of the model to run.
+          params: dict, additional parameters to run inference.
+          sparse_configs: dict, sparse configs of output tensors.
+          model_cache: ModelCache to borrow the model from. By default the
+            model is loaded if needed and unloaded on close.
+          prefetch: int, number of results requested ahead on a background
+            thread while the caller processes the current one. Zero (default)
+            requests each result only when run() needs it. With prefetching
+            results may be up to prefetch frames old if the caller is slower
+            than the camera.
+          latest_only: bool, whether a background thread polls results all
+            the time and keeps only the newest one, see latest() and wait().
+            run() then skips results which arrived while the caller was busy.
+          raw_results: bool, whether run() yields serialized
+            pb2.InferenceResult bytes, which are parsed later, e.g. in worker
+            processes of postprocess.ordered_map(). Not supported with
+            latest_only.
+        """
+        if prefetch < 0:
+            raise ValueError('Prefetch must be non-negative.')
+        if prefetch and latest_only:
+            raise ValueError('Prefetch and latest_only cannot be used together.')
+        if raw_results and latest_only:
+            raise ValueError('Raw results and latest_only cannot be used together.')
         self._rate = 0.0
         self._count = 0
+        self._prefetcher = None
+        self._poller = None
+        self._last_index = None
         self._stack = contextlib.ExitStack()
         self._engine = self._stack.enter_context(InferenceEngine())
+        if raw_results:
+            self._fetch = self._engine.camera_inference_bytes
+        else:
+            self._fetch = self._engine.camera_inference
 
         try:
-            model_name = descriptor.name
-            if model_name not in self._engine.get_inference_state().loaded_models:
-                self._engine.load_model(descriptor)
-                self._stack.callback(lambda: self._engine.unload_model(model_name))
+            model_name = _enter_model(self._stack, self._engine, descriptor, model_cache)
 
             self._engine.start_camera_inference(model_name, params, sparse_configs)
             self._stack.callback(lambda: self._engine.stop_camera_inference())
+            if prefetch:
+                self._prefetcher = _Prefetcher(self._fetch, prefetch)
+                self._stack.callback(self._prefetcher.close)
+            if latest_only:
+                self._poller = _LatestPoller(self._engine)
+                self._stack.callback(self._poller.close)
         except Exception:
             _close_stack_silently(self._stack)
             raise
 
+    def _next_result(self):
+        if self._poller is not None:
+            result = self._poller.wait(after=self._last_index)
+            if result is not None:
+                self._last_index = result.frame.index
+            return result
+        if self._prefetcher is not None:
+            return self._prefetcher.get()
+        return self._fetch()
+
+    def _check_latest_only(self):
+        if self._poller is None:
+            raise RuntimeError('CameraInference must be created with latest_only=True.')
+
+    def latest(self):
+        """Returns (result, age) of the newest result without waiting.
+
+        Age is the number of seconds since the result was received. Returns
+        (None, None) before the first result. Requires latest_only mode.
+        """
+        self._check_latest_only()
+        return self._poller.latest()
+
+    def wait(self, after=None, timeout=None):
+        """Waits for the newest result with frame.index greater than after.
+
+        Args:
+          after: int, frame index of an already processed result, or None to
+            return any result.
+          timeout: float, maximum number of seconds to wait, unlimited by
+            default.
+        Returns:
+          pb2.InferenceResult, or None on timeout or after close().
+          Requires latest_only mode.
+        """
+        self._check_latest_only()
+        return self._poller.wait(after, timeout)
+
     def run(self, count=None):
         before = None
         for _ in (itertools.count() if count is None else range(count)):
-            result = self._engine.camera_inference()
+            result = self._next_result()
+            if result is None:
+                return  # Closed.
             now = time.monotonic()
             self._rate = 1.0 / (now - before) if before else 0.0
             before = now
@@ -147,21 +356,55 @@ class CameraInference:
 class ImageInference:
     """Helper class to run image inference."""
 
-    def __init__(self, descriptor):
+    def __init__(self, descriptor, optimize_transfer=False, max_input_scale=2.0,
+                 jpeg_quality=90, model_cache=None):
+        """Initialization.
+
+        Args:
+          descriptor: ModelDescriptor of the model to run.
+          optimize_transfer: bool, whether to downscale large images to at most
+            max_input_scale times model input size and send them either raw or
+            as JPEG, whichever payload is estimated to be cheaper. Result size
+            and window stay in the original image space.
+          max_input_scale: float, maximum ratio of sent image size to model
+            input size when optimize_transfer is set.
+          jpeg_quality: int, JPEG quality when optimize_transfer is set.
+          model_cache: ModelCache to borrow the model from. By default the
+            model is loaded if needed and unloaded on close.
+        """
         self._stack = contextlib.ExitStack()
         self._engine = self._stack.enter_context(InferenceEngine())
+        self._prepared = None
+        self._input_size = (descriptor.input_shape[2], descriptor.input_shape[1])
+        self._optimize_transfer = optimize_transfer
+        self._max_input_scale = max_input_scale
+        self._jpeg_quality = jpeg_quality
 
         try:
-            self._model_name = descriptor.name
-            if self._model_name not in self._engine.get_inference_state().loaded_models:
-                self._model_name = self._engine.load_model(descriptor)
-                self._stack.callback(lambda: self._engine.unload_model(self._model_name))
+            self._model_name = _enter_model(self._stack, self._engine, descriptor,
+                                            model_cache)
         except Exception:
             _close_stack_silently(self._stack)
             raise
 
     def run(self, image, params=None, sparse_configs=None):
-        return self._engine.image_inference(self._model_name, image, params, sparse_configs)
+        original_size = None
+        if self._optimize_transfer:
+            image, original_size = _transfer.optimize(image, self._input_size,
+                                                      self._max_input_scale,
+                                                      self._jpeg_quality)
+
+        if params is None and sparse_configs is None:
+            if self._prepared is None:
+                self._prepared = self._engine.prepare_image_inference(self._model_name)
+            result = self._prepared.run(image)
+        else:
+            result = self._engine.image_inference(self._model_name, image, params,
+                                                  sparse_configs)
+
+        if original_size:
+            _transfer.restore(result, original_size)
+        return result
 
     @property
     def engine(self):
@@ -206,26 +449,11 @@ def _get_sparse_configs(configs):
     return None
 
 
-def _image_to_tensor(image):
-    if isinstance(image, (bytes, bytearray)):
-        # Only JPEG is supported on the bonnet side.
-        return pb2.ByteTensor(
-            shape=pb2.TensorShape(batch=1, height=0, width=0, depth=0),
-            data=image)
-
-    width, height = image.size
-    if image.mode == 'RGB':
-        r, g, b = image.split()
-        return pb2.ByteTensor(
-            shape=pb2.TensorShape(batch=1, height=height, width=width, depth=3),
-            data=r.tobytes() + g.tobytes() + b.tobytes())
-
-    if image.mode == 'L':
-        return pb2.ByteTensor(
-            shape=pb2.TensorShape(batch=1, height=height, width=width, depth=1),
-            data=image.tobytes())
-
-    raise InferenceException('Unsupported image format: %s. Must be L or RGB.' % image.mode)
+def _tensor_shape(image):
+    try:
+        return _tensor.tensor_shape(image)
+    except _tensor.TensorError as e:
+        raise InferenceException(str(e))
 
 
 def _get_params(params):
@@ -237,6 +465,83 @@ def _check_model_name(model_name):
         raise ValueError('Model name must not be empty.')
 
 
+def model_digest(descriptor):
+    """Returns hex digest of everything which is uploaded for the model."""
+    h = hashlib.sha256()
+    h.update(repr((tuple(descriptor.input_shape),
+                   tuple(float(x) for x in descriptor.input_normalizer))).encode())
+    h.update(descriptor.compute_graph)
+    return h.hexdigest()
+
+
+DEFAULT_MODEL_DIGESTS_PATH = os.path.expanduser('~/.cache/aiy/vision_models.json')
+
+# Digests of models loaded on the bonnet by this user, model name -> digest.
+# Bonnet keeps models between host process restarts, but has no place to
+# store digests itself. Models without digest are uploaded again.
+_model_digests_lock = threading.Lock()
+
+
+def _model_digests_path():
+    return os.environ.get('VISION_BONNET_MODEL_DIGESTS', DEFAULT_MODEL_DIGESTS_PATH)
+
+
+def _read_model_digests(path):
+    try:
+        with open(path) as f:
+            digests = json.load(f)
+        if isinstance(digests, dict):
+            return digests
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _write_model_digests(path, digests):
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), prefix='.tmp',
+                                     delete=False) as f:
+        try:
+            json.dump(digests, f)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+    try:
+        os.replace(f.name, path)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+
+def _get_model_digest(model_name):
+    return _read_model_digests(_model_digests_path()).get(model_name)
+
+
+def _update_model_digests(updates, loaded_models=None):
+    """Applies dict of model name -> digest (None to remove).
+
+    Entries of models not in loaded_models are removed, if it is given. The
+    file is locked for read-modify-write against other processes.
+    """
+    path = _model_digests_path()
+    with _model_digests_lock:
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            with open(path + '.lock', 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)  # Released on close.
+                digests = _read_model_digests(path)
+                digests.update(updates)
+                _write_model_digests(path, {
+                    name: digest for name, digest in digests.items()
+                    if digest and (loaded_models is None or name in loaded_models)})
+        except OSError as e:
+            logger.warning('Cannot update model digests in %s: %s', path, e)
+
+
+def _is_model_loaded(model_name, digest, loaded_models):
+    """Returns whether load_model() can skip upload of the model."""
+    return model_name in loaded_models and _get_model_digest(model_name) == digest
+
+
 def _request_bytes(*args, **kwargs):
     return pb2.Request(*args, **kwargs).SerializeToString()
 
@@ -249,6 +554,179 @@ _REQ_GET_INFERENCE_STATE = _request_bytes(get_inference_state=pb2.Request.GetInf
 _REQ_GET_CAMERA_STATE = _request_bytes(get_camera_state=pb2.Request.GetCameraState())
 _REQ_RESET = _request_bytes(reset=pb2.Request.Reset())
 
+
+def _varint(value):
+    """Returns protobuf varint encoding of non-negative integer."""
+    buf = bytearray()
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+    return bytes(buf)
+
+
+def _length_delimited_tag(descriptor, field_name):
+    return _varint(descriptor.fields_by_name[field_name].number << 3 | 2)
+
+
+_TAG_IMAGE_INFERENCE = _length_delimited_tag(pb2.Request.DESCRIPTOR, 'image_inference')
+_TAG_IMAGE_INFERENCE_TENSOR = _length_delimited_tag(pb2.Request.ImageInference.DESCRIPTOR,
+                                                    'tensor')
+_TAG_BYTE_TENSOR_SHAPE = _length_delimited_tag(pb2.ByteTensor.DESCRIPTOR, 'shape')
+_TAG_BYTE_TENSOR_DATA = _length_delimited_tag(pb2.ByteTensor.DESCRIPTOR, 'data')
+
+
+def _request_kind(request_bytes):
+    """Returns request type name, e.g. 'camera_inference', from serialized request."""
+    # Request is a single oneof field, its number is in the first (tag) byte.
+    field = pb2.Request.DESCRIPTOR.fields_by_number.get(request_bytes[0] >> 3)
+    return field.name if field else 'unknown'
+
+
+class Histogram:
+    """Histogram of non-negative values with power-of-two buckets."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.buckets = {}  # upper bound -> number of values
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        bound = 1 << int(value).bit_length()
+        self.buckets[bound] = self.buckets.get(bound, 0) + 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p):
+        """Returns upper bound of the bucket which contains p-th percentile."""
+        seen = 0
+        for bound in sorted(self.buckets):
+            seen += self.buckets[bound]
+            if seen >= p * self.count:
+                return min(bound, self.max)
+        return 0
+
+    def copy(self):
+        h = Histogram()
+        h.count, h.total, h.min, h.max = self.count, self.total, self.min, self.max
+        h.buckets = dict(self.buckets)
+        return h
+
+    def __str__(self):
+        return 'count=%d mean=%.1f p50=%d p90=%d max=%s' % (
+            self.count, self.mean, self.percentile(0.5), self.percentile(0.9), self.max)
+
+
+# serialize_us: Histogram, time to serialize request, microseconds.
+# transport_us: Histogram, time spent in transport (ioctl or socket), microseconds.
+# parse_us: Histogram, time to parse response, microseconds.
+# request_bytes: Histogram, request sizes.
+# response_bytes: Histogram, response sizes.
+TransactionStats = namedtuple('TransactionStats',
+    ('serialize_us', 'transport_us', 'parse_us', 'request_bytes', 'response_bytes'))
+
+
+def _new_transaction_stats():
+    return TransactionStats(*(Histogram() for _ in TransactionStats._fields))
+
+
+def _stats_enabled():
+    return os.environ.get('VISION_BONNET_ENGINE_STATS', '0') not in ('', '0')
+
+
+def _fast_tensors_enabled():
+    return os.environ.get('VISION_BONNET_FAST_TENSORS', '0') not in ('', '0')
+
+class PreparedImageInference:
+    """Image inference request with model name, params and sparse configs
+    serialized once, see InferenceEngine.prepare_image_inference()."""
+
+    def __init__(self, engine, model_name, params=None, sparse_configs=None):
+        _check_model_name(model_name)
+        self._engine = engine
+        self._model_name = model_name
+        self._lock = threading.Lock()  # Protects _buf.
+        self._buf = bytearray()
+        # Protobuf fields can go in any order, so tensor field is appended in run().
+        self._prefix = pb2.Request.ImageInference(
+            model_name=model_name,
+            params=_get_params(params),
+            sparse_configs=_get_sparse_configs(sparse_configs)).SerializeToString()
+
+    @property
+    def model_name(self):
+        return self._model_name
+
+    def request_bytes(self, image):
+        """Returns serialized pb2.Request to run inference on image.
+
+        Returned memoryview points to internal buffer, which is reused by the
+        next call.
+        """
+        shape = _tensor_shape(image)
+        if _tensor.is_jpeg(image):
+            data_size = len(memoryview(image).cast('B'))
+        else:
+            data_size = _tensor.tensor_data_size(shape)
+
+        batch, height, width, depth = shape
+        shape = pb2.TensorShape(batch=batch, height=height, width=width,
+                                depth=depth).SerializeToString()
+        tensor_head = b''.join((_TAG_BYTE_TENSOR_SHAPE, _varint(len(shape)), shape,
+                                _TAG_BYTE_TENSOR_DATA, _varint(data_size)))
+        tensor_size = len(tensor_head) + data_size
+        inference_head = b''.join((self._prefix, _TAG_IMAGE_INFERENCE_TENSOR,
+                                   _varint(tensor_size)))
+        head = b''.join((_TAG_IMAGE_INFERENCE,
+                         _varint(len(inference_head) + tensor_size),
+                         inference_head, tensor_head))
+
+        size = len(head) + data_size
+        if len(self._buf) < size:
+            self._buf = bytearray(size)
+        view = memoryview(self._buf)[:size]
+        view[:len(head)] = head
+        # Image is converted to planar layout directly inside the request.
+        _tensor.write_tensor(image, view[len(head):])
+        return view
+
+    def run(self, image):
+        """Runs inference on image.
+
+        Args:
+          image: PIL.Image (RGB or L), HxW or HxWxC uint8 NumPy array,
+            RawImage (e.g. picamera RGB or YUV capture buffer) or JPEG bytes.
+
+        Returns:
+          pb2.Response.InferenceResult
+        """
+        logger.info('Image inference on "%s".', self._model_name)
+        with self._lock:
+            response = self._engine._communicate_prepared(
+                self.request_bytes, image, parse=self._engine._parse_inference)
+        return response.inference_result
+
+    def run_bytes(self, image):
+        """Runs inference on image, returns serialized pb2.InferenceResult.
+
+        Result is not parsed, e.g. to parse and decode it in a worker process,
+        see postprocess.ordered_map().
+        """
+        logger.info('Image inference on "%s".', self._model_name)
+        with self._lock:
+            response = self._engine._communicate_prepared(
+                self.request_bytes, image, parse=_wire.parse_response_raw)
+        return response.inference_result
+
+
 class InferenceEngine:
     """Class to access InferenceEngine on VisionBonnet board.
 
@@ -271,7 +749,31 @@ class InferenceEngine:
       }
     """
 
-    def __init__(self):
+    def __init__(self, zero_copy=True, collect_stats=None, fast_tensors=None):
+        """Initialization.
+
+        Args:
+          zero_copy: bool, whether to parse responses directly from the
+            transport buffer instead of copying them first.
+          collect_stats: bool, whether to collect per-transaction timing
+            returned by stats(). Default is taken from VISION_BONNET_ENGINE_STATS
+            environment variable.
+          fast_tensors: bool, whether inference results have output tensor
+            data as read-only float32 NumPy arrays, which are decoded without
+            creating Python floats. Requires NumPy. Default is taken from
+            VISION_BONNET_FAST_TENSORS environment variable.
+        """
+        if collect_stats is None:
+            collect_stats = _stats_enabled()
+        if fast_tensors is None:
+            fast_tensors = _fast_tensors_enabled()
+        if fast_tensors and _wire.np is None:
+            logger.warning('NumPy is not available, fast_tensors is disabled.')
+            fast_tensors = False
+        self._zero_copy = zero_copy
+        self._parse_inference = _wire.parse_response if fast_tensors else pb2.Response.FromString
+        self._lock = threading.Lock()  # Protects transport buffer until response is parsed.
+        self._stats = {} if collect_stats else None  # Request kind -> TransactionStats.
         self._transport = make_transport()
         logger.info('InferenceEngine transport: %s', self._transport.__class__.__name__)
 
@@ -284,26 +786,106 @@ class InferenceEngine:
     def __exit__(self, exc_type, exc_value, exc_tb):
         self.close()
 
-    def _communicate(self, request, timeout=None):
-        return self._communicate_bytes(request.SerializeToString(), timeout=timeout)
+    def stats(self):
+        """Returns dict of request kind -> TransactionStats copy.
+
+        Request kind is the name of Request field, e.g. 'camera_inference'.
+        Empty if engine was created without collect_stats.
+        """
+        with self._lock:
+            if self._stats is None:
+                return {}
+            return {kind: TransactionStats(*(h.copy() for h in stats))
+                    for kind, stats in self._stats.items()}
+
+    def reset_stats(self):
+        """Clears collected stats."""
+        with self._lock:
+            if self._stats is not None:
+                self._stats.clear()
 
-    def _communicate_bytes(self, request_bytes, timeout=None):
-        response = pb2.Response()
-        response.ParseFromString(self._transport.send(request_bytes, timeout=timeout))
+    def _communicate(self, request, timeout=None):
+        if self._stats is None:
+            return self._communicate_bytes(request.SerializeToString(), timeout=timeout)
+
+        start = time.perf_counter()
+        request_bytes = request.SerializeToString()
+        serialize_time = time.perf_counter() - start
+        return self._communicate_bytes(request_bytes, timeout=timeout,
+                                       serialize_time=serialize_time)
+
+    def _communicate_bytes(self, request_bytes, timeout=None, serialize_time=0.0,
+                           parse=pb2.Response.FromString):
+        with self._lock:
+            if self._stats is not None:
+                start = time.perf_counter()
+            response_bytes = self._transport.send(request_bytes, timeout=timeout,
+                                                  copy=not self._zero_copy)
+            try:
+                if self._stats is not None:
+                    sent = time.perf_counter()
+                response = parse(response_bytes)
+                if self._stats is not None:
+                    self._add_stats(request_bytes, response_bytes, serialize_time,
+                                    sent - start, time.perf_counter() - sent)
+            finally:
+                # Zero-copy response is only valid until the next transaction.
+                if isinstance(response_bytes, memoryview):
+                    response_bytes.release()
         if response.status.code != pb2.Response.Status.OK:
             raise InferenceException(response.status.message)
         return response
 
+    def _communicate_prepared(self, make_request_bytes, *args, parse=pb2.Response.FromString):
+        if self._stats is None:
+            return self._communicate_bytes(make_request_bytes(*args), parse=parse)
+
+        start = time.perf_counter()
+        request_bytes = make_request_bytes(*args)
+        serialize_time = time.perf_counter() - start
+        return self._communicate_bytes(request_bytes, serialize_time=serialize_time,
+                                       parse=parse)
+
+    def _add_stats(self, request_bytes, response_bytes, serialize_time, transport_time,
+                   parse_time):
+        kind = _request_kind(request_bytes)
+        stats = self._stats.get(kind)
+        if stats is None:
+            stats = self._stats[kind] = _new_transaction_stats()
+        stats.serialize_us.add(int(1000000 * serialize_time))
+        stats.transport_us.add(int(1000000 * transport_time))
+        stats.parse_us.add(int(1000000 * parse_time))
+        stats.request_bytes.add(len(request_bytes))
+        stats.response_bytes.add(len(response_bytes))
+
     def load_model(self, descriptor):
         """Loads model on VisionBonnet.
 
+        Uploaded models are tagged with model_digest(), digests are kept in
+        VISION_BONNET_MODEL_DIGESTS file (~/.cache/aiy/vision_models.json by
+        default). Upload is skipped only when the model with the same name is
+        already loaded and has the same digest. Loaded model with different
+        or unknown digest is replaced. Models with different names are never
+        shared, even if their content is identical: results carry the name of
+        the model which produced them.
+
         Args:
           descriptor: ModelDescriptor, meta info that defines model name,
             where to get the model and etc.
         Returns:
           Model identifier.
+        Raises:
+          InferenceException: model with the same name but different or
+            unknown content is running camera inference.
+        """
+        return self._load_model(descriptor)[0]
+
+    def _load_model(self, descriptor, state=None):
+        """Returns (model name, whether model was uploaded).
+
+        An already loaded model costs one transaction, or none if state (the
+        current pb2.InferenceState) is given.
         """
-        _check_firmware_info(self.get_firmware_info())
         mean, stddev = descriptor.input_normalizer
         batch, height, width, depth = descriptor.input_shape
         if batch != 1:
@@ -312,11 +894,27 @@ class InferenceEngine:
         if depth != 3:
             raise ValueError('Unsupported depth value: %d. Must be 3.')
 
+        model_name = descriptor.name
+        digest = model_digest(descriptor)
+        if state is None:
+            state = self.get_inference_state()
+        if _is_model_loaded(model_name, digest, state.loaded_models):
+            logger.info('Model "%s" is already loaded.', model_name)
+            return model_name, False
+
+        _check_firmware_info(self.get_firmware_info())
+        if model_name in state.loaded_models:
+            if model_name in state.processing_models:
+                raise InferenceException('Model "%s" with different or unknown content is '
+                                         'running camera inference.' % model_name)
+            logger.info('Replace model "%s".', model_name)
+            self.unload_model(model_name)
+
         try:
-            logger.info('Load model "%s".', descriptor.name)
+            logger.info('Load model "%s".', model_name)
             self._communicate(pb2.Request(
                 load_model=pb2.Request.LoadModel(
-                    model_name=descriptor.name,
+                    model_name=model_name,
                     input_shape=pb2.TensorShape(
                         batch=batch,
                         height=height,
@@ -328,8 +926,11 @@ class InferenceEngine:
                     compute_graph=descriptor.compute_graph)))
         except InferenceException as e:
             logger.warning(str(e))
+            return model_name, False
 
-        return descriptor.name
+        _update_model_digests({model_name: digest},
+                              set(state.loaded_models) | {model_name})
+        return model_name, True
 
     def unload_model(self, model_name):
         """Deletes model on VisionBonnet.
@@ -342,6 +943,7 @@ class InferenceEngine:
         logger.info('Unload model "%s".', model_name)
         self._communicate(pb2.Request(
             unload_model=pb2.Request.UnloadModel(model_name=model_name)))
+        _update_model_digests({model_name: None})
 
     def start_camera_inference(self, model_name, params=None, sparse_configs=None):
         """Starts inference running on VisionBonnet."""
@@ -356,7 +958,13 @@ class InferenceEngine:
 
     def camera_inference(self):
         """Returns the latest inference result from VisionBonnet."""
-        return self._communicate_bytes(_REQ_CAMERA_INFERENCE).inference_result
+        return self._communicate_bytes(_REQ_CAMERA_INFERENCE,
+                                       parse=self._parse_inference).inference_result
+
+    def camera_inference_bytes(self):
+        """Returns the latest inference result as serialized pb2.InferenceResult."""
+        return self._communicate_bytes(_REQ_CAMERA_INFERENCE,
+                                       parse=_wire.parse_response_raw).inference_result
 
     def stop_camera_inference(self):
         """Stops inference running on VisionBonnet."""
@@ -388,21 +996,28 @@ class InferenceEngine:
 
         Args:
           model_name: string, unique identifier used to refer a model.
-          image: PIL.Image,
+          image: PIL.Image (RGB or L), HxW or HxWxC uint8 NumPy array,
+            RawImage (e.g. picamera RGB or YUV capture buffer) or JPEG bytes.
           params: dict, additional parameters to run inference
 
         Returns:
           pb2.Response.InferenceResult
         """
-        _check_model_name(model_name)
+        return self.prepare_image_inference(model_name, params, sparse_configs).run(image)
 
-        logger.info('Image inference on "%s".', model_name)
-        return self._communicate(pb2.Request(
-            image_inference=pb2.Request.ImageInference(
-                model_name=model_name,
-                tensor=_image_to_tensor(image),
-                params=_get_params(params),
-                sparse_configs=_get_sparse_configs(sparse_configs)))).inference_result
+    def prepare_image_inference(self, model_name, params=None, sparse_configs=None):
+        """Returns PreparedImageInference to run inference on many images
+        with the same parameters.
+
+        Only image tensor is serialized on each PreparedImageInference.run() call.
+
+        Args:
+          model_name: string, unique identifier used to refer a model.
+          params: dict, additional parameters to run inference
+          sparse_configs: dict, sparse configs of output tensors.
+        """
+        return PreparedImageInference(self, model_name, params, sparse_configs)
 
     def reset(self):
         self._communicate_bytes(_REQ_RESET)
+        _update_model_digests({}, loaded_models=())
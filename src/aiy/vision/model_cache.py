@@ -0,0 +1,210 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Keeps several models resident on the Vision Bonnet.
+
+CameraInference and ImageInference unload their model on close, so switching
+between models pays the full upload every time. With a shared ModelCache they
+borrow models instead, and models stay loaded until the memory budget is
+exceeded::
+
+  with ModelCache() as cache:
+      while True:
+          with CameraInference(face_detection.model(), model_cache=cache) as inference:
+              ...
+          with ImageInference(object_detection.model(), model_cache=cache) as inference:
+              ...
+
+Least recently used models which are not borrowed are unloaded first.
+"""
+
+import collections
+import contextlib
+import logging
+import os
+import threading
+
+from .inference import InferenceEngine, model_digest, _is_model_loaded
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _default_max_bytes():
+    return int(os.environ.get('VISION_BONNET_MODEL_MEMORY', DEFAULT_MAX_BYTES))
+
+
+class _Entry:
+
+    def __init__(self, size, digest):
+        self.size = size
+        self.digest = digest
+        self.borrowers = 0
+
+
+class ModelCache:
+    """LRU set of models loaded on the bonnet.
+
+    SystemInfo reported by the bonnet has no memory figures, so model memory
+    is estimated by compute graph size and the budget is given in bytes.
+    Models loaded by somebody else are never unloaded, but count against the
+    budget once acquired through the cache.
+    """
+
+    def __init__(self, engine=None, max_bytes=None, max_models=None):
+        """Initialization.
+
+        Args:
+          engine: InferenceEngine to use, new one is created by default and
+            closed together with this object.
+          max_bytes: int, budget for total compute graph size of resident
+            models. Default is taken from VISION_BONNET_MODEL_MEMORY
+            environment variable, 64 MB if not set.
+          max_models: int, maximum number of resident models, unlimited by
+            default.
+        """
+        self._owns_engine = engine is None
+        self._engine = engine or InferenceEngine()
+        self._max_bytes = _default_max_bytes() if max_bytes is None else max_bytes
+        self._max_models = max_models
+        self._lock = threading.Lock()  # Protects _entries.
+        self._entries = collections.OrderedDict()  # Model name -> _Entry, LRU first.
+        self._owned = set()  # Names of models loaded by this cache.
+
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def resident_models(self):
+        """Returns list of model names, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+    @property
+    def resident_bytes(self):
+        with self._lock:
+            return sum(entry.size for entry in self._entries.values())
+
+    def _sync(self):
+        """Forgets models which are not loaded anymore, e.g. after reset."""
+        state = self._engine.get_inference_state()
+        loaded = set(state.loaded_models)
+        for model_name in list(self._entries):
+            if model_name not in loaded:
+                del self._entries[model_name]
+                self._owned.discard(model_name)
+        return state
+
+    def _unload(self, model_name):
+        del self._entries[model_name]
+        if model_name in self._owned:
+            self._owned.discard(model_name)
+            logger.info('Evict model "%s".', model_name)
+            self._engine.unload_model(model_name)
+
+    def _make_room(self, size, processing_models):
+        used = sum(entry.size for entry in self._entries.values())
+        count = len(self._entries)
+        for model_name, entry in list(self._entries.items()):
+            if used + size <= self._max_bytes and \
+               (self._max_models is None or count < self._max_models):
+                return
+            if (entry.borrowers or model_name in processing_models or
+                    model_name not in self._owned):
+                continue
+            self._unload(model_name)
+            used -= entry.size
+            count -= 1
+
+        if used + size > self._max_bytes:
+            logger.warning('Model memory budget exceeded: %d bytes used, %d bytes needed, '
+                           '%d bytes allowed.', used, size, self._max_bytes)
+
+    def acquire(self, descriptor):
+        """Loads model if needed and marks it as borrowed.
+
+        Returns:
+          Model identifier, the same as InferenceEngine.load_model returns.
+        """
+        digest = model_digest(descriptor)
+        with self._lock:
+            state = self._sync()
+            model_name = descriptor.name
+            entry = self._entries.get(model_name)
+            if entry is None or entry.digest != digest:
+                size = len(descriptor.compute_graph)
+                # Room is only needed if the model is really uploaded.
+                if not _is_model_loaded(model_name, digest, state.loaded_models):
+                    self._make_room(size, set(state.processing_models))
+                    state = None  # Evictions changed loaded models.
+                model_name, uploaded = self._engine._load_model(descriptor, state)
+                entry = self._entries.get(model_name)
+                if entry is None:
+                    entry = self._entries[model_name] = _Entry(size, digest)
+                elif entry.digest != digest:
+                    entry.size, entry.digest = size, digest
+                if uploaded:
+                    self._owned.add(model_name)
+            self._entries.move_to_end(model_name)
+            entry.borrowers += 1
+            return model_name
+
+    def release(self, model_name):
+        """Marks model as not borrowed, it stays loaded until evicted."""
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is not None and entry.borrowers:
+                entry.borrowers -= 1
+
+    @contextlib.contextmanager
+    def borrow(self, descriptor):
+        """Context manager which yields model identifier."""
+        model_name = self.acquire(descriptor)
+        try:
+            yield model_name
+        finally:
+            self.release(model_name)
+
+    def evict(self, model_name):
+        """Unloads model now if it is not borrowed."""
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is None:
+                return
+            if entry.borrowers:
+                raise ValueError('Model "%s" is borrowed.' % model_name)
+            self._unload(model_name)
+
+    def clear(self):
+        """Unloads all models which are not borrowed."""
+        with self._lock:
+            for model_name, entry in list(self._entries.items()):
+                if not entry.borrowers:
+                    self._unload(model_name)
+
+    def close(self):
+        try:
+            self.clear()
+        finally:
+            if self._owns_engine:
+                self._engine.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
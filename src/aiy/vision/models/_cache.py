@@ -0,0 +1,131 @@
+"""Binary cache of parsed model text files (labels, SSD anchors).
+
+Parsing text files with thousands of lines takes tens of milliseconds on
+Pi Zero. Parsed data is saved once into a binary file and later loaded with
+mmap. Cache files are named after the source file and its directory and are
+valid while source modification time and size don't change.
+
+Cache directory is VISION_BONNET_MODELS_CACHE (~/.cache/aiy/models by
+default); empty value disables the cache.
+"""
+
+import hashlib
+import logging
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.expanduser('~/.cache/aiy/models')
+
+_MAGIC = b'AIYM'
+_VERSION = 1
+# magic, version, kind, source mtime_ns, source size, rows, columns.
+_HEADER = struct.Struct('<4sII q q I I')
+
+_KIND_LABELS = 1
+_KIND_FLOATS = 2
+
+
+def _cache_dir():
+    return os.environ.get('VISION_BONNET_MODELS_CACHE', DEFAULT_CACHE_DIR)
+
+
+def _cache_path(path, suffix):
+    path = os.path.abspath(path)
+    digest = hashlib.sha1(os.path.dirname(path).encode()).hexdigest()[:8]
+    return os.path.join(_cache_dir(), '%s.%s.%s' % (os.path.basename(path), digest, suffix))
+
+
+def _kind_version(kind):
+    # Marshal format depends on Python version.
+    return kind | (marshal.version << 8) if kind == _KIND_LABELS else kind
+
+
+def _read(path, suffix, kind):
+    """Returns (rows, columns, memoryview of payload) or None if not valid."""
+    cache_dir = _cache_dir()
+    if not cache_dir:
+        return None
+    try:
+        st = os.stat(path)
+        with open(_cache_path(path, suffix), 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(mm) < _HEADER.size:
+        mm.close()
+        return None
+    magic, version, cached_kind, mtime_ns, size, rows, columns = _HEADER.unpack_from(mm)
+    if (magic, version, cached_kind, mtime_ns, size) != \
+       (_MAGIC, _VERSION, _kind_version(kind), st.st_mtime_ns, st.st_size):
+        mm.close()
+        return None
+    # Mapping stays open while the view (or anything made from it) is alive.
+    return rows, columns, memoryview(mm)[_HEADER.size:]
+
+
+def _close(view):
+    """Releases view returned by _read() and closes its mapping."""
+    mm = view.obj
+    view.release()
+    mm.close()
+
+
+def _write(path, suffix, kind, rows, columns, payload):
+    cache_dir = _cache_dir()
+    if not cache_dir:
+        return
+    try:
+        st = os.stat(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        header = _HEADER.pack(_MAGIC, _VERSION, _kind_version(kind), st.st_mtime_ns,
+                              st.st_size, rows, columns)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, prefix='.tmp', delete=False) as f:
+            f.write(header)
+            f.write(payload)
+        os.replace(f.name, _cache_path(path, suffix))
+    except OSError as e:
+        logger.debug('Cannot write model cache for %s: %s', path, e)
+
+
+def load_labels(path, parse):
+    """Returns tuple of label tuples from cache, parse(path) on cache miss."""
+    cached = _read(path, 'labels', _KIND_LABELS)
+    if cached is not None:
+        try:
+            # Labels are copied into Python objects, mapping is not needed after.
+            return marshal.loads(cached[2])
+        except (EOFError, ValueError, TypeError):
+            pass
+        finally:
+            _close(cached[2])
+
+    labels = parse(path)
+    _write(path, 'labels', _KIND_LABELS, len(labels), 0, marshal.dumps(labels))
+    return labels
+
+
+def load_floats(path, parse):
+    """Returns (rows, columns, memoryview of doubles) of numeric table.
+
+    parse(path) must return tuple of equally sized float tuples, it is called
+    on cache miss.
+    """
+    cached = _read(path, 'floats', _KIND_FLOATS)
+    if cached is not None:
+        rows, columns, view = cached
+        if len(view) == 8 * rows * columns:
+            return rows, columns, view.cast('d')
+        _close(view)
+
+    table = parse(path)
+    rows = len(table)
+    columns = len(table[0]) if table else 0
+    payload = struct.pack('=%dd' % (rows * columns), *(x for row in table for x in row))
+    _write(path, 'floats', _KIND_FLOATS, rows, columns, payload)
+    return rows, columns, memoryview(payload).cast('d')
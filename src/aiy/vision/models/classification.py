@@ -0,0 +1,96 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Decoding of classification model outputs, shared by classification models.
+
+Only top_k best classes are selected instead of sorting all probabilities, and
+label strings are joined once per model instead of once per result::
+
+  labels = classification.join_labels(utils.load_labels('labels.txt'))
+  ...
+  classes = classification.get_classes(tensor.data, labels, top_k=3)
+"""
+
+import heapq
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def join_labels(labels):
+    """Returns tuple of label strings from load_labels() tuples, e.g. 'cat/kitty'."""
+    return tuple('/'.join(label) for label in labels)
+
+
+def _float_array(probs):
+    if isinstance(probs, np.ndarray):
+        return probs.astype(np.float64, copy=False).ravel()
+    # Much faster than np.asarray() for protobuf repeated fields.
+    return np.fromiter(probs, dtype=np.float64)
+
+
+def _top_k_numpy(probs, top_k, threshold):
+    probs = _float_array(probs)
+    indices = np.flatnonzero(probs > threshold)
+    values = probs[indices]
+    if top_k is not None and 0 <= top_k < len(indices):
+        if top_k == 0:
+            return []
+        # Smallest of top_k values, then all greater values and the first
+        # equal ones, so ties are resolved by index like in a stable sort.
+        kth = -np.partition(-values, top_k - 1)[top_k - 1]
+        greater = np.flatnonzero(values > kth)
+        equal = np.flatnonzero(values == kth)[:top_k - len(greater)]
+        selected = np.concatenate((greater, equal))
+        indices, values = indices[selected], values[selected]
+    order = np.lexsort((indices, -values))
+    return list(zip(indices[order].tolist(), values[order].tolist()))[0:top_k]
+
+
+def top_k_pairs(probs, top_k=None, threshold=0.0):
+    """Returns list of (index, probability) pairs, highest probability first.
+
+    The result is the same as of sorting all (index, probability) pairs with
+    probability greater than threshold by probability and taking the first
+    top_k, but without the full sort.
+
+    Args:
+      probs: sequence of floats or NumPy array, e.g. FloatTensor.data.
+      top_k: int, maximum number of pairs, unlimited by default. Negative
+        value drops that many pairs from the end, like a slice.
+      threshold: float, minimum probability (exclusive).
+    """
+    if np is not None:
+        return _top_k_numpy(probs, top_k, threshold)
+
+    pairs = [pair for pair in enumerate(probs) if pair[1] > threshold]
+    if top_k is None or top_k < 0:
+        return sorted(pairs, key=lambda pair: pair[1], reverse=True)[0:top_k]
+    return heapq.nlargest(top_k, pairs, key=lambda pair: pair[1])
+
+
+def get_classes(probs, labels, top_k=None, threshold=0.0):
+    """Returns list of (label, probability) pairs, highest probability first.
+
+    Args:
+      probs: sequence of floats or NumPy array, e.g. FloatTensor.data.
+      labels: sequence of label strings, see join_labels().
+      top_k: int, maximum number of pairs, unlimited by default. Negative
+        value drops that many pairs from the end, like a slice.
+      threshold: float, minimum probability (exclusive).
+    """
+    return [(labels[index], prob) for index, prob in top_k_pairs(probs, top_k, threshold)]
@@ -0,0 +1,108 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Detections of one frame stored as arrays, one row per detection.
+
+Detection models return them from get_detections() in addition to lists of
+per-detection objects, so trackers, loggers and overlays can process all
+boxes at once::
+
+  detections = object_detection.get_detections(result)
+  people = detections.take(detections.classes == object_detection.Object.PERSON)
+  for obj in object_detection.to_objects(people):
+      ...
+
+Fields are NumPy arrays when NumPy is available and tuples otherwise.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _array(values, dtype):
+    if np is not None:
+        return np.asarray(values, dtype=dtype)
+    return tuple(values)
+
+
+def _tolist(values):
+    if hasattr(values, 'tolist'):
+        return values.tolist()
+    return list(values)
+
+
+class Detections:
+    """Struct of arrays of N detections.
+
+    Attributes:
+      boxes: [N, 4] array of (x, y, width, height) boxes.
+      scores: [N] float array of detection scores.
+      classes: [N] int array of class ids.
+      columns: dict of extra model-specific [N, ...] arrays, e.g. joy scores
+        of face detection.
+    """
+    __slots__ = ('boxes', 'scores', 'classes', 'columns')
+
+    def __init__(self, boxes, scores, classes, columns=None, box_dtype='float64'):
+        self.boxes = _array(boxes, box_dtype)
+        self.scores = _array(scores, 'float64')
+        self.classes = _array(classes, 'int64')
+        self.columns = {name: _array(column, None) for name, column in (columns or {}).items()}
+        if np is not None:
+            self.boxes = self.boxes.reshape(-1, 4)
+        if not len(self.boxes) == len(self.scores) == len(self.classes):
+            raise ValueError('Boxes, scores and classes must have the same length.')
+        for name, column in self.columns.items():
+            if len(column) != len(self.scores):
+                raise ValueError('Column "%s" must have %d rows.' % (name, len(self.scores)))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __repr__(self):
+        return 'Detections(boxes=%r, scores=%r, classes=%r, columns=%r)' % (
+            self.boxes, self.scores, self.classes, self.columns)
+
+    def take(self, indices):
+        """Returns Detections with selected rows.
+
+        Args:
+          indices: sequence of row indices, or boolean mask of N values.
+        """
+        if np is not None:
+            indices = np.asarray(indices)
+            if indices.dtype == bool:
+                indices = np.flatnonzero(indices)
+            indices = indices.astype(np.int64)
+            select = lambda values: np.asarray(values)[indices]
+        else:
+            indices = list(indices)
+            if len(indices) == len(self) and all(isinstance(i, bool) for i in indices):
+                indices = [i for i, keep in enumerate(indices) if keep]
+            select = lambda values: tuple(values[i] for i in indices)
+        return Detections(select(self.boxes), select(self.scores), select(self.classes),
+                          {name: select(column) for name, column in self.columns.items()},
+                          box_dtype=self.boxes.dtype if np is not None else None)
+
+    def tolists(self):
+        """Returns (boxes, scores, classes, columns) as Python lists.
+
+        Boxes are lists of 4 numbers and columns is dict of lists.
+        """
+        boxes = [list(box) for box in _tolist(self.boxes)]
+        return (boxes, _tolist(self.scores), _tolist(self.classes),
+                {name: _tolist(column) for name, column in self.columns.items()})
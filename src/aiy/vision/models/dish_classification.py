@@ -14,10 +14,16 @@
 """API for Dish Classification."""
 
 from aiy.vision.inference import ModelDescriptor
+from aiy.vision.models import classification
 from aiy.vision.models import utils
 
 _COMPUTE_GRAPH_NAME = 'mobilenet_v1_192res_1.0_seefood.binaryproto'
-_CLASSES = utils.load_labels('mobilenet_v1_192res_1.0_seefood_labels.txt')
+
+@utils.lazy
+def _classes():
+    return classification.join_labels(
+        utils.load_labels('mobilenet_v1_192res_1.0_seefood_labels.txt'))
+
 
 def model():
     return ModelDescriptor(
@@ -31,7 +37,7 @@ def _get_probs(result):
     assert len(result.tensors) == 1
     tensor = result.tensors['MobilenetV1/Predictions/Softmax']
     assert utils.shape_tuple(tensor.shape) == (1, 1, 1, 2024)
-    return tuple(tensor.data)
+    return tensor.data
 
 
 def get_classes(result, top_k=None, threshold=0.0):
@@ -51,8 +57,4 @@ def get_classes(result, top_k=None, threshold=0.0):
       [('Ramen', 0.981934)
        ('Yaka mein, 0.005497)]
     """
-    probs = _get_probs(result)
-    pairs = [pair for pair in enumerate(probs) if pair[1] > threshold]
-    pairs = sorted(pairs, key=lambda pair: pair[1], reverse=True)
-    pairs = pairs[0:top_k]
-    return [('/'.join(_CLASSES[index]), prob) for index, prob in pairs]
+    return classification.get_classes(_get_probs(result), _classes(), top_k, threshold)
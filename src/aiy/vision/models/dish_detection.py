@@ -15,12 +15,24 @@
 
 from collections import namedtuple
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from aiy.vision.inference import ModelDescriptor
+from aiy.vision.models import classification
 from aiy.vision.models import utils
+from aiy.vision.models.detections import Detections
 
 
 _COMPUTE_GRAPH_NAME = 'dish_detection.binaryproto'
-_CLASSES = utils.load_labels('mobilenet_v1_192res_1.0_seefood_labels.txt')
+
+@utils.lazy
+def _classes():
+    return classification.join_labels(
+        utils.load_labels('mobilenet_v1_192res_1.0_seefood_labels.txt'))
+
 
 # sorted_scores: sorted list of (label, score) tuples.
 # bounding_box: (x, y, width, height) tuple.
@@ -36,17 +48,48 @@ def model():
 
 
 def _get_sorted_scores(scores, top_k, threshold):
-    pairs = [('/'.join(_CLASSES[i]), prob) for i, prob in enumerate(scores) if prob > threshold]
-    pairs = sorted(pairs, key=lambda pair: pair[1], reverse=True)
-    return pairs[0:top_k]
+    return classification.get_classes(scores, _classes(), top_k, threshold)
 
 
 def get_dishes(result, top_k=3, threshold=0.1):
     """Returns list of Dish objects decoded from the inference result."""
     assert len(result.tensors) == 2
-    bboxes = utils.reshape(result.tensors['bounding_boxes'].data, 4)
-    dish_scores = utils.reshape(result.tensors['dish_scores'].data, len(_CLASSES))
+    bboxes = utils.reshape(utils.floats(result.tensors['bounding_boxes'].data), 4)
+    dish_scores = utils.reshape(result.tensors['dish_scores'].data, len(_classes()))
     assert len(bboxes) == len(dish_scores)
 
     return [Dish(_get_sorted_scores(scores, top_k, threshold), tuple(bbox))
         for scores, bbox in zip(dish_scores, bboxes)]
+
+
+def get_detections(result):
+    """Returns dishes of get_dishes() as Detections.
+
+    Classes and scores are the best label indices and their scores, all
+    label scores are in [N, labels] 'class_scores' column, see to_dishes().
+    """
+    assert len(result.tensors) == 2
+    bboxes = result.tensors['bounding_boxes'].data
+    dish_scores = result.tensors['dish_scores'].data
+    num_classes = len(_classes())
+    assert len(bboxes) * num_classes == 4 * len(dish_scores)
+
+    if np is None:
+        bboxes = utils.reshape(utils.floats(bboxes), 4)
+        dish_scores = utils.reshape(utils.floats(dish_scores), num_classes)
+        best = [scores.index(max(scores)) for scores in dish_scores]
+        return Detections(bboxes, [scores[i] for scores, i in zip(dish_scores, best)], best,
+                          {'class_scores': dish_scores})
+
+    bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    dish_scores = np.asarray(dish_scores, dtype=np.float64).reshape(len(bboxes), num_classes)
+    best = dish_scores.argmax(axis=1)
+    return Detections(bboxes, dish_scores[np.arange(len(best)), best], best,
+                      {'class_scores': dish_scores})
+
+
+def to_dishes(detections, top_k=3, threshold=0.1):
+    """Returns list of Dish from Detections of get_detections()."""
+    boxes, _, _, columns = detections.tolists()
+    return [Dish(_get_sorted_scores(scores, top_k, threshold), tuple(bbox))
+            for scores, bbox in zip(columns['class_scores'], boxes)]
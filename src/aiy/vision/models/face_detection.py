@@ -15,8 +15,14 @@
 
 from collections import namedtuple
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from aiy.vision.inference import ModelDescriptor
 from aiy.vision.models import utils
+from aiy.vision.models.detections import Detections
 
 
 _COMPUTE_GRAPH_NAME = 'face_detection.binaryproto'
@@ -41,12 +47,40 @@ def get_faces(result):
     """Returns list of Face objects decoded from the inference result."""
     assert len(result.tensors) == 3
     # TODO(dkovalev): check tensor shapes
-    bboxes = utils.reshape(result.tensors['bounding_boxes'].data, 4)
-    face_scores = tuple(result.tensors['face_scores'].data)
-    joy_scores = tuple(result.tensors['joy_scores'].data)
+    bboxes = utils.reshape(utils.floats(result.tensors['bounding_boxes'].data), 4)
+    face_scores = utils.floats(result.tensors['face_scores'].data)
+    joy_scores = utils.floats(result.tensors['joy_scores'].data)
     assert len(bboxes) == len(joy_scores)
     assert len(bboxes) == len(face_scores)
     return [
         Face(face_score, joy_score, tuple(bbox))
         for face_score, joy_score, bbox in zip(face_scores, joy_scores, bboxes)
     ]
+
+
+def get_detections(result):
+    """Returns faces of get_faces() as Detections.
+
+    Scores are face scores, all classes are 0 and joy scores are in
+    'joy_scores' column, see to_faces().
+    """
+    assert len(result.tensors) == 3
+    bboxes = result.tensors['bounding_boxes'].data
+    face_scores = result.tensors['face_scores'].data
+    joy_scores = result.tensors['joy_scores'].data
+    assert len(bboxes) == 4 * len(joy_scores)
+    assert len(bboxes) == 4 * len(face_scores)
+    if np is None:
+        return Detections(utils.reshape(utils.floats(bboxes), 4), utils.floats(face_scores),
+                          [0] * len(face_scores), {'joy_scores': utils.floats(joy_scores)})
+    return Detections(np.asarray(bboxes, dtype=np.float64).reshape(-1, 4),
+                      np.asarray(face_scores, dtype=np.float64),
+                      np.zeros(len(face_scores), dtype=np.int64),
+                      {'joy_scores': np.asarray(joy_scores, dtype=np.float64)})
+
+
+def to_faces(detections):
+    """Returns list of Face from Detections of get_detections()."""
+    boxes, face_scores, _, columns = detections.tolists()
+    return [Face(face_score, joy_score, tuple(bbox))
+            for face_score, joy_score, bbox in zip(face_scores, columns['joy_scores'], boxes)]
@@ -14,6 +14,7 @@
 """API for Image Classification tasks."""
 
 from aiy.vision.inference import ModelDescriptor, ThresholdingConfig
+from aiy.vision.models import classification
 from aiy.vision.models import utils
 
 # There are two models in our repository that can do image classification. One
@@ -35,14 +36,18 @@ _OUTPUT_TENSOR_NAME_MAP = {
     SQUEEZENET: 'Prediction',
 }
 
-_CLASSES = utils.load_labels('mobilenet_v1_160res_0.5_imagenet_labels.txt')
+@utils.lazy
+def _classes():
+    return classification.join_labels(
+        utils.load_labels('mobilenet_v1_160res_0.5_imagenet_labels.txt'))
 
-def sparse_configs(top_k=len(_CLASSES), threshold=0.0, model_type=MOBILENET):
+def sparse_configs(top_k=None, threshold=0.0, model_type=MOBILENET):
     name = _OUTPUT_TENSOR_NAME_MAP[model_type]
+    num_classes = len(_classes())
     return {
-        name: ThresholdingConfig(logical_shape=[len(_CLASSES)],
+        name: ThresholdingConfig(logical_shape=[num_classes],
                                  threshold=threshold,
-                                 top_k=top_k,
+                                 top_k=num_classes if top_k is None else top_k,
                                  to_ignore=[])
     }
 
@@ -57,8 +62,8 @@ def model(model_type=MOBILENET):
 def _get_probs(result):
     assert len(result.tensors) == 1
     tensor = result.tensors[_OUTPUT_TENSOR_NAME_MAP[result.model_name]]
-    assert utils.shape_tuple(tensor.shape) == (1, 1, 1, len(_CLASSES))
-    return tuple(tensor.data)
+    assert utils.shape_tuple(tensor.shape) == (1, 1, 1, len(_classes()))
+    return tensor.data
 
 
 def get_classes(result, top_k=None, threshold=0.0):
@@ -79,18 +84,14 @@ def get_classes(result, top_k=None, threshold=0.0):
        ('tiger cat, 0.163574)
        ('lynx/catamount', 0.039795)]
     """
-    probs = _get_probs(result)
-    pairs = [pair for pair in enumerate(probs) if pair[1] > threshold]
-    pairs = sorted(pairs, key=lambda pair: pair[1], reverse=True)
-    pairs = pairs[0:top_k]
-    return [('/'.join(_CLASSES[index]), prob) for index, prob in pairs]
+    return classification.get_classes(_get_probs(result), _classes(), top_k, threshold)
 
 
 def _get_pairs(result):
     assert len(result.tensors) == 1
     tensor = result.tensors[_OUTPUT_TENSOR_NAME_MAP[result.model_name]]
     indices = tuple(tensor.indices)
-    data = tuple(tensor.data)
+    data = utils.floats(tensor.data)
     return [(index.values[0], prob) for index, prob in zip(indices, data)]
 
 
@@ -110,4 +111,5 @@ def get_classes_sparse(result):
     """
     pairs = _get_pairs(result)
     pairs = sorted(pairs, key=lambda pair: pair[1], reverse=True)
-    return [('/'.join(_CLASSES[index]), prob) for index, prob in pairs]
+    classes = _classes()
+    return [(classes[index], prob) for index, prob in pairs]
@@ -16,15 +16,34 @@
 API for detecting plants, insects, and birds from the iNaturalist dataset.
 """
 
+import collections.abc
+import functools
 from collections import namedtuple
 
 from aiy.vision.inference import ModelDescriptor, ThresholdingConfig
+from aiy.vision.models import classification
 from aiy.vision.models import utils
 
 PLANTS  = 'inaturalist_plants'
 INSECTS = 'inaturalist_insects'
 BIRDS   = 'inaturalist_birds'
 
+class _LazyLabels(collections.abc.Sequence):
+    """load_labels() tuples of labels_file, read on first use."""
+
+    def __init__(self, labels_file):
+        self.labels_file = labels_file
+        self._load = utils.lazy(functools.partial(utils.load_labels, labels_file))
+
+    def __getitem__(self, index):
+        return self._load()[index]
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        return '_LazyLabels(%r)' % self.labels_file
+
 class Model(namedtuple('Model', ('labels',
                                  'compute_graph_file',
                                  'input_shape',
@@ -34,23 +53,27 @@ class Model(namedtuple('Model', ('labels',
         return utils.load_compute_graph(self.compute_graph_file)
 
 _MODELS = {
-   PLANTS:  Model(labels=utils.load_labels('mobilenet_v2_192res_1.0_inat_plant_labels.txt'),
+   PLANTS:  Model(labels=_LazyLabels('mobilenet_v2_192res_1.0_inat_plant_labels.txt'),
                   compute_graph_file='mobilenet_v2_192res_1.0_inat_plant.binaryproto',
                   input_shape=(1, 192, 192, 3),
                   input_normalizer=(128.0, 128.0),
                   output_name='prediction'),
-   INSECTS: Model(labels=utils.load_labels('mobilenet_v2_192res_1.0_inat_insect_labels.txt'),
+   INSECTS: Model(labels=_LazyLabels('mobilenet_v2_192res_1.0_inat_insect_labels.txt'),
                   compute_graph_file='mobilenet_v2_192res_1.0_inat_insect.binaryproto',
                   input_shape=(1, 192, 192, 3),
                   input_normalizer=(128.0, 128.0),
                   output_name='prediction'),
-   BIRDS:   Model(labels=utils.load_labels('mobilenet_v2_192res_1.0_inat_bird_labels.txt'),
+   BIRDS:   Model(labels=_LazyLabels('mobilenet_v2_192res_1.0_inat_bird_labels.txt'),
                   compute_graph_file='mobilenet_v2_192res_1.0_inat_bird.binaryproto',
                   input_shape=(1, 192, 192, 3),
                   input_normalizer=(128.0, 128.0),
                   output_name='prediction'),
 }
 
+# Model type -> function which joins labels on first call.
+_JOINED_LABELS = {model_type: utils.lazy(functools.partial(classification.join_labels, m.labels))
+                  for model_type, m in _MODELS.items()}
+
 
 def sparse_configs(model_type, top_k=None, threshold=0.0):
     this_model = _MODELS[model_type]
@@ -75,25 +98,22 @@ def get_classes(result, top_k=None, threshold=0.0):
     assert len(result.tensors) == 1
 
     this_model = _MODELS[result.model_name]
-    labels = this_model.labels
+    labels = _JOINED_LABELS[result.model_name]()
 
     tensor = result.tensors[this_model.output_name]
     probs, shape = tensor.data, tensor.shape
     assert shape.depth == len(labels)
-    pairs = [pair for pair in enumerate(probs) if pair[1] > threshold]
-    pairs = sorted(pairs, key=lambda pair: pair[1], reverse=True)
-    pairs = pairs[0:top_k]
-    return [('/'.join(labels[index]), prob) for index, prob in pairs]
+    return classification.get_classes(probs, labels, top_k, threshold)
 
 
 def get_classes_sparse(result):
     assert len(result.tensors) == 1
 
     this_model = _MODELS[result.model_name]
-    labels = this_model.labels
+    labels = _JOINED_LABELS[result.model_name]()
 
     tensor = result.tensors[this_model.output_name]
-    indices, probs = tuple(tensor.indices), tuple(tensor.data)
+    indices, probs = tuple(tensor.indices), utils.floats(tensor.data)
     pairs = [(index.values[0], prob) for index, prob in zip(indices, probs)]
     pairs = sorted(pairs, key=lambda pair: pair[1], reverse=True)
-    return [('/'.join(labels[index]), prob) for index, prob in pairs]
+    return [(labels[index], prob) for index, prob in pairs]
@@ -0,0 +1,207 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Non-maximum suppression of detection boxes, shared by SSD-style models.
+
+Boxes are (x, y, width, height) tuples, as in object_detection.Object. Example::
+
+  indices, scores = nms.non_max_suppression(boxes, scores, classes, per_class=True,
+                                            max_detections=10)
+
+IoU of the picked box against all remaining candidates is computed in one
+vectorized step when NumPy is available and there are enough boxes; there is a
+pure Python fallback with the same results.
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HARD = 'hard'
+LINEAR = 'linear'
+GAUSSIAN = 'gaussian'
+METHODS = (HARD, LINEAR, GAUSSIAN)
+
+# Below this number of boxes pure Python is faster than NumPy per-call overhead.
+_NUMPY_MIN_BOXES = 50
+
+
+def iou(box1, box2):
+    """Returns intersection over union of two (x, y, width, height) boxes.
+
+    Boxes with zero union area are considered fully overlapping.
+    """
+    x1, y1, width1, height1 = box1
+    x2, y2, width2, height2 = box2
+    width = max(min(x1 + width1, x2 + width2) - max(x1, x2), 0)
+    height = max(min(y1 + height1, y2 + height2) - max(y1, y2), 0)
+    intersection = width * height
+    union = width1 * height1 + width2 * height2 - intersection
+    if union > 0:
+        return float(intersection) / float(union)
+    return 1.0
+
+
+def iou_matrix(boxes1, boxes2):
+    """Returns [N, M] NumPy array of IoU between [N, 4] and [M, 4] boxes."""
+    boxes1 = np.asarray(boxes1, dtype=np.float64).reshape(-1, 1, 4)
+    boxes2 = np.asarray(boxes2, dtype=np.float64).reshape(1, -1, 4)
+    return _iou_rows(boxes1, boxes2)
+
+
+def _iou_rows(box, boxes):
+    """Vectorized iou() of box (or [N, 1, 4] boxes) against [M, 4] boxes."""
+    x1, y1, w1, h1 = (box[..., i] for i in range(4))
+    x2, y2, w2, h2 = (boxes[..., i] for i in range(4))
+    width = np.maximum(np.minimum(x1 + w1, x2 + w2) - np.maximum(x1, x2), 0)
+    height = np.maximum(np.minimum(y1 + h1, y2 + h2) - np.maximum(y1, y2), 0)
+    intersection = width * height
+    union = w1 * h1 + w2 * h2 - intersection
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union > 0, intersection / union, 1.0)
+
+
+def _decay(overlap, method, iou_threshold, sigma):
+    if method == LINEAR:
+        return 1.0 - overlap if overlap > iou_threshold else 1.0
+    return math.exp(-overlap * overlap / sigma)
+
+
+def _suppress_python(boxes, scores, classes, iou_threshold, max_detections, method,
+                     sigma, score_threshold):
+    candidates = [i for i in sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+                  if scores[i] >= score_threshold]
+    scores = list(scores)
+    indices, kept_scores = [], []
+    while candidates and len(indices) < max_detections:
+        if method != HARD:
+            best = max(range(len(candidates)), key=lambda k: scores[candidates[k]])
+            candidates.insert(0, candidates.pop(best))
+        i = candidates.pop(0)
+        indices.append(i)
+        kept_scores.append(scores[i])
+
+        remaining = []
+        for j in candidates:
+            if classes is not None and classes[i] != classes[j]:
+                remaining.append(j)
+                continue
+            overlap = iou(boxes[i], boxes[j])
+            if method == HARD:
+                if overlap <= iou_threshold:
+                    remaining.append(j)
+            else:
+                scores[j] *= _decay(overlap, method, iou_threshold, sigma)
+                if scores[j] >= score_threshold:
+                    remaining.append(j)
+        candidates = remaining
+    return indices, kept_scores
+
+
+def _suppress_numpy(boxes, scores, classes, iou_threshold, max_detections, method,
+                    sigma, score_threshold):
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.array(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind='stable')  # Ties keep input order.
+    order = order[scores[order] >= score_threshold]
+    if classes is not None:
+        classes = np.asarray(classes)[order]
+    boxes, scores = boxes[order], scores[order]
+
+    indices, kept_scores = [], []
+    candidates = np.arange(len(order))
+    while len(candidates) and len(indices) < max_detections:
+        if method != HARD:
+            best = int(np.argmax(scores[candidates]))
+            if best:
+                candidates = np.concatenate((candidates[best:best + 1],
+                                             np.delete(candidates, best)))
+        i, candidates = candidates[0], candidates[1:]
+        indices.append(int(order[i]))
+        kept_scores.append(float(scores[i]))
+        if not len(candidates):
+            break
+
+        overlap = _iou_rows(boxes[i], boxes[candidates])
+        if classes is not None:
+            overlap[classes[candidates] != classes[i]] = 0.0
+        if method == HARD:
+            candidates = candidates[overlap <= iou_threshold]
+        else:
+            if method == LINEAR:
+                decay = np.where(overlap > iou_threshold, 1.0 - overlap, 1.0)
+            else:
+                decay = np.exp(-overlap * overlap / sigma)
+            scores[candidates] *= decay
+            candidates = candidates[scores[candidates] >= score_threshold]
+    return indices, kept_scores
+
+
+def _tolist(values):
+    if hasattr(values, 'tolist'):
+        return values.tolist()
+    return values
+
+
+def non_max_suppression(boxes, scores, classes=None, iou_threshold=0.5, per_class=False,
+                        max_detections=None, method=HARD, sigma=0.5, score_threshold=None,
+                        use_numpy=None):
+    """Runs greedy non-maximum suppression.
+
+    Args:
+      boxes: sequence of (x, y, width, height) boxes or [N, 4] array.
+      scores: sequence of N floats or [N] array.
+      classes: sequence of N class ids or [N] array, needed only if
+        per_class is True.
+      iou_threshold: float, boxes with higher IoU with a picked box are
+        suppressed (hard) or get lower score (linear soft-NMS).
+      per_class: bool, whether boxes only suppress boxes of the same class.
+      max_detections: int, stop after picking this many boxes.
+      method: HARD, LINEAR or GAUSSIAN (soft-NMS, scores decay by IoU).
+      sigma: float, parameter of GAUSSIAN decay.
+      score_threshold: float, candidates with lower (decayed) score are
+        dropped. Default is 0.001 for soft-NMS and no threshold for HARD.
+      use_numpy: bool, whether to use NumPy implementation. By default it is
+        used when NumPy is available and there are enough boxes.
+
+    Returns:
+      Tuple of (indices, scores): lists of picked box indices in the order
+      of picking (highest score first) and their possibly decayed scores.
+    """
+    if method not in METHODS:
+        raise ValueError('Unsupported method: %s. Must be one of %s.' %
+                         (method, ', '.join(METHODS)))
+    if per_class and classes is None:
+        raise ValueError('Classes are required for per class suppression.')
+    if score_threshold is None:
+        score_threshold = -math.inf if method == HARD else 0.001
+    if max_detections is None:
+        max_detections = len(scores)
+
+    if use_numpy is None:
+        use_numpy = np is not None and len(scores) >= _NUMPY_MIN_BOXES
+    elif use_numpy and np is None:
+        raise ValueError('NumPy is not available.')
+    classes = classes if per_class else None
+
+    if use_numpy:
+        return _suppress_numpy(boxes, scores, classes, iou_threshold, max_detections,
+                               method, sigma, score_threshold)
+    # Python numbers are much faster than NumPy scalars one at a time.
+    return _suppress_python(_tolist(boxes), _tolist(scores), _tolist(classes), iou_threshold,
+                            max_detections, method, sigma, score_threshold)
@@ -0,0 +1,97 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Microbenchmark of non-maximum suppression::
+
+  python3 -m aiy.vision.models.nms_bench
+  python3 -m aiy.vision.models.nms_bench --sizes 10,2000 --methods hard,gaussian
+
+Candidate boxes are clustered around a few objects, like SSD output.
+"""
+
+import argparse
+import random
+import time
+from collections import namedtuple
+
+from aiy.vision.models import nms
+
+DEFAULT_SIZES = (10, 100, 500, 1000, 2000)
+
+# implementation: string, 'numpy' or 'python'.
+# method: string, one of nms.METHODS.
+# size: int, number of candidate boxes.
+# median_ms: float, median time of one suppression.
+# kept: int, number of picked boxes.
+BenchmarkResult = namedtuple('BenchmarkResult',
+    ('implementation', 'method', 'size', 'median_ms', 'kept'))
+
+
+def candidates(size, seed=0, num_objects=10, image_size=(640, 480)):
+    """Returns (boxes, scores, classes) of random candidates."""
+    rng = random.Random(seed)
+    width, height = image_size
+    objects = [(rng.uniform(0, width), rng.uniform(0, height),
+                rng.uniform(20, width / 3), rng.uniform(20, height / 3), rng.randint(1, 3))
+               for _ in range(num_objects)]
+    boxes, scores, classes = [], [], []
+    for _ in range(size):
+        x, y, w, h, kind = rng.choice(objects)
+        boxes.append((int(x + rng.gauss(0, 5)), int(y + rng.gauss(0, 5)),
+                      int(w * rng.uniform(0.8, 1.2)), int(h * rng.uniform(0.8, 1.2))))
+        scores.append(rng.random())
+        classes.append(kind)
+    return boxes, scores, classes
+
+
+def benchmark(implementation, method, size, repeats=10, per_class=False):
+    boxes, scores, classes = candidates(size)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        indices, _ = nms.non_max_suppression(boxes, scores, classes, method=method,
+                                             per_class=per_class,
+                                             use_numpy=implementation == 'numpy')
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return BenchmarkResult(implementation, method, size, 1000 * times[len(times) // 2],
+                           len(indices))
+
+
+def _parse_list(value):
+    return [x.strip() for x in value.split(',') if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Non-maximum suppression benchmark.')
+    parser.add_argument('--sizes', type=lambda v: [int(x) for x in _parse_list(v)],
+                        default=list(DEFAULT_SIZES), help='Comma-separated numbers of boxes.')
+    parser.add_argument('--methods', type=_parse_list, default=list(nms.METHODS),
+                        help='Comma-separated methods.')
+    parser.add_argument('--per_class', action='store_true')
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    implementations = ['numpy', 'python'] if nms.np is not None else ['python']
+    print('%-8s %-10s %6s %10s %6s' % ('impl', 'method', 'size', 'median_ms', 'kept'))
+    for method in args.methods:
+        for size in args.sizes:
+            for implementation in implementations:
+                print('%-8s %-10s %6d %10.3f %6d' % benchmark(implementation, method, size,
+                                                            args.repeats, args.per_class))
+
+
+if __name__ == '__main__':
+    main()
@@ -17,7 +17,14 @@ import sys
 
 from collections import defaultdict
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 from aiy.vision.inference import ModelDescriptor, ThresholdingConfig, FromSparseTensorConfig
+from aiy.vision.models.detections import Detections
+from aiy.vision.models import nms
 from aiy.vision.models import utils
 
 _COMPUTE_GRAPH_NAME = 'mobilenet_ssd_256res_0.125_person_cat_dog.binaryproto'
@@ -25,8 +32,25 @@ _MACHINE_EPS = sys.float_info.epsilon
 _SCORE_TENSOR_NAME = 'concat_1'
 _ANCHOR_TENSOR_NAME = 'concat'
 _DEFAULT_THRESHOLD = 0.3
-_ANCHORS = utils.load_ssd_anchors('mobilenet_ssd_256res_0.125_person_cat_dog_anchors.txt')
-_NUM_ANCHORS = len(_ANCHORS)
+_ANCHORS_NAME = 'mobilenet_ssd_256res_0.125_person_cat_dog_anchors.txt'
+_NUM_ANCHORS = 1917  # Number of lines in anchors file.
+
+
+@utils.lazy
+def _anchors():
+    anchors = utils.load_ssd_anchors(_ANCHORS_NAME)
+    assert len(anchors) == _NUM_ANCHORS
+    return anchors
+
+
+@utils.lazy
+def _anchor_arrays():
+    """Returns (ycenter, xcenter, height, width) arrays of all anchors."""
+    num_anchors, view = utils.load_ssd_anchors_buffer(_ANCHORS_NAME)
+    assert num_anchors == _NUM_ANCHORS
+    ymin, xmin, ymax, xmax = np.frombuffer(view, dtype=np.float64).reshape(-1, 4).T
+    # The same operations as in _decode_box_encoding.
+    return (ymax + ymin) / 2, (xmax + xmin) / 2, ymax - ymin, xmax - xmin
 
 def _logit(x):
     return math.log(x / (1.0 - x))
@@ -84,7 +108,12 @@ def _decode_detection_result(logit_scores, box_encodings, threshold,
     assert len(logit_scores) == 4 * _NUM_ANCHORS
     assert len(box_encodings) == 4 * _NUM_ANCHORS
 
+    if np is not None:
+        return _decode_detection_result_numpy(logit_scores, box_encodings, threshold,
+                                              image_size, image_offset)
+
     logit_threshold = _logit(max(threshold, _MACHINE_EPS))
+    anchors = _anchors()
     objs = []
 
     for i in range(_NUM_ANCHORS):
@@ -94,13 +123,62 @@ def _decode_detection_result(logit_scores, box_encodings, threshold,
         if max_logit_index == 0 or max_logit <= logit_threshold:
             continue  # Skip 'background' and below threshold.
 
-        bbox = _decode_bbox(box_encodings[4 * i: 4 * (i + 1)], _ANCHORS[i],
+        bbox = _decode_bbox(box_encodings[4 * i: 4 * (i + 1)], anchors[i],
                             image_size, image_offset)
         objs.append(Object(bbox, max_logit_index, _logistic(max_logit)))
 
     return objs
 
 
+def _decode_detection_result_numpy(logit_scores, box_encodings, threshold,
+                                   image_size, image_offset):
+    """Vectorized _decode_detection_result, returns exactly the same objects."""
+    boxes, kinds, scores = _decode_detection_arrays(logit_scores, box_encodings, threshold,
+                                                    image_size, image_offset)
+    return [Object(tuple(bbox), kind, score)
+            for bbox, kind, score in zip(boxes.tolist(), kinds.tolist(), scores.tolist())]
+
+
+def _decode_detection_arrays(logit_scores, box_encodings, threshold, image_size,
+                             image_offset):
+    """Returns ([N, 4] int boxes, [N] kinds, [N] scores) arrays of candidates."""
+    logit_threshold = _logit(max(threshold, _MACHINE_EPS))
+    logits = np.asarray(logit_scores, dtype=np.float64).reshape(-1, 4)
+    kinds = logits.argmax(axis=1)  # First maximum, like list.index(max(...)).
+    max_logits = logits[np.arange(len(logits)), kinds]
+    # Skip 'background' and below threshold.
+    indices = np.flatnonzero((kinds != 0) & (max_logits > logit_threshold))
+    if not len(indices):
+        return np.zeros((0, 4), dtype=np.int64), indices, np.zeros(0)
+
+    encodings = np.asarray(box_encodings, dtype=np.float64).reshape(-1, 4)[indices]
+    anchor_ycenter, anchor_xcenter, anchor_height, anchor_width = \
+        (a[indices] for a in _anchor_arrays())
+
+    ycenter = anchor_ycenter + anchor_height * (encodings[:, 0] / 10.0)
+    xcenter = anchor_xcenter + anchor_width * (encodings[:, 1] / 10.0)
+    # Only candidates above threshold get here. np.exp may differ from math.exp
+    # in the last bit, which changes int() of box edges, so math.exp keeps
+    # results identical to the pure Python decoder.
+    height = np.array([math.exp(x) for x in (encodings[:, 2] / 5.0).tolist()]) * anchor_height
+    width = np.array([math.exp(x) for x in (encodings[:, 3] / 5.0).tolist()]) * anchor_width
+
+    xmin = np.clip(xcenter - width / 2, 0.0, 1.0)
+    ymin = np.clip(ycenter - height / 2, 0.0, 1.0)
+    xmax = np.clip(xcenter + width / 2, 0.0, 1.0)
+    ymax = np.clip(ycenter + height / 2, 0.0, 1.0)
+
+    x0, y0 = image_offset
+    image_width, image_height = image_size
+    boxes = np.stack(((x0 + xmin * image_width).astype(np.int64),
+                      (y0 + ymin * image_height).astype(np.int64),
+                      ((xmax - xmin) * image_width).astype(np.int64),
+                      ((ymax - ymin) * image_height).astype(np.int64)), axis=1)
+
+    scores = np.array([_logistic(x) for x in max_logits[indices].tolist()])
+    return boxes, kinds[indices], scores
+
+
 def _decode_sparse_detection_result(logit_scores_indices, logit_scores,
                                     box_encodings_indices, box_encodings,
                                     image_size, image_offset):
@@ -108,6 +186,7 @@ def _decode_sparse_detection_result(logit_scores_indices, logit_scores,
     assert 4 * len(box_encodings_indices) == len(box_encodings)
 
     logits_dict = defaultdict(lambda: [0.0, 0.0, 0.0, 0.0])
+    anchors = _anchors()
     objs = []
 
     for index, logit_score in zip(logit_scores_indices, logit_scores):
@@ -121,7 +200,7 @@ def _decode_sparse_detection_result(logit_scores_indices, logit_scores,
         max_logit = max(logits)
         max_logit_index = logits.index(max_logit)
 
-        bbox = _decode_bbox(box_encodings[4 * j: 4 * (j + 1)], _ANCHORS[i],
+        bbox = _decode_bbox(box_encodings[4 * j: 4 * (j + 1)], anchors[i],
                             image_size, image_offset)
         objs.append(Object(bbox, max_logit_index, _logistic(max_logit)))
 
@@ -183,44 +262,8 @@ def _decode_box_encoding(box_encoding, anchor):
     return xmin, ymin, xmax, ymax
 
 
-def _area(box):
-    _, _, width, height = box
-    area = width * height
-    assert area >= 0
-    return area
-
-
-def _intersection_area(box1, box2):
-    x1, y1, width1, height1 = box1
-    x2, y2, width2, height2 = box2
-    x = max(x1, x2)
-    y = max(y1, y2)
-    width = max(min(x1 + width1, x2 + width2) - x, 0)
-    height = max(min(y1 + height1, y2 + height2) - y, 0)
-    area = width * height
-    assert area >= 0
-    return area
-
-
-def _overlap_ratio(box1, box2):
-    """Computes overlap ratio of two bounding boxes.
-
-    Args:
-      box1: (x, y, width, height).
-      box2: (x, y, width, height).
-
-    Returns:
-      float, represents overlap ratio between given boxes.
-    """
-    intersection_area = _intersection_area(box1, box2)
-    union_area = _area(box1) + _area(box2) - intersection_area
-    assert union_area >= 0
-    if union_area > 0:
-        return float(intersection_area) / float(union_area)
-    return 1.0
-
-
-def _non_maximum_suppression(objs, overlap_threshold=0.5):
+def _non_maximum_suppression(objs, overlap_threshold=0.5, per_class=False,
+                              max_detections=None):
     """Runs Non Maximum Suppression.
 
     Removes candidate that overlaps with existing candidate who has higher
@@ -229,22 +272,18 @@ def _non_maximum_suppression(objs, overlap_threshold=0.5):
     Args:
       objs: list of ObjectDetection.Object
       overlap_threshold: float
+      per_class: bool, whether objects only suppress objects of the same kind.
+      max_detections: int, maximum number of returned objects.
     Returns:
-      A list of ObjectDetection.Object
+      A list of ObjectDetection.Object, highest score first.
     """
-    objs = sorted(objs, key=lambda x: x.score, reverse=True)
-    for i in range(len(objs)):
-        if objs[i].score < 0.0:
-            continue
-        # Suppress any nearby bounding boxes having lower score than boxes[i]
-        for j in range(i + 1, len(objs)):
-            if objs[j].score < 0.0:
-                continue
-            if _overlap_ratio(objs[i].bounding_box,
-                              objs[j].bounding_box) > overlap_threshold:
-                objs[j].score = -1.0  # Suppress box
-
-    return [obj for obj in objs if obj.score >= 0.0]  # Exclude suppressed boxes
+    indices, _ = nms.non_max_suppression([obj.bounding_box for obj in objs],
+                                         [obj.score for obj in objs],
+                                         [obj.kind for obj in objs],
+                                         iou_threshold=overlap_threshold,
+                                         per_class=per_class,
+                                         max_detections=max_detections)
+    return [objs[i] for i in indices]
 
 
 def model():
@@ -254,29 +293,72 @@ def model():
         input_normalizer=(128.0, 128.0),
         compute_graph=utils.load_compute_graph(_COMPUTE_GRAPH_NAME))
 
-def get_objects(result, threshold=_DEFAULT_THRESHOLD, offset=(0, 0)):
+def _get_tensors(result, threshold):
     if threshold < 0 or threshold > 1.0:
         raise ValueError('Threshold must be in [0.0, 1.0]')
 
     assert len(result.tensors) == 2
-    logit_scores = tuple(result.tensors[_SCORE_TENSOR_NAME].data)
-    box_encodings = tuple(result.tensors[_ANCHOR_TENSOR_NAME].data)
+    # NumPy arrays (see InferenceEngine fast_tensors) are decoded without copies.
+    logit_scores = result.tensors[_SCORE_TENSOR_NAME].data
+    box_encodings = result.tensors[_ANCHOR_TENSOR_NAME].data
+    if np is None:
+        logit_scores, box_encodings = tuple(logit_scores), tuple(box_encodings)
+    return logit_scores, box_encodings, (result.window.width, result.window.height)
 
-    size = (result.window.width, result.window.height)
+
+def get_objects(result, threshold=_DEFAULT_THRESHOLD, offset=(0, 0), per_class=False,
+                max_detections=None):
+    logit_scores, box_encodings, size = _get_tensors(result, threshold)
     objs = _decode_detection_result(logit_scores, box_encodings, threshold, size, offset)
-    return _non_maximum_suppression(objs)
+    return _non_maximum_suppression(objs, per_class=per_class, max_detections=max_detections)
+
+
+def get_detections(result, threshold=_DEFAULT_THRESHOLD, offset=(0, 0), per_class=False,
+                   max_detections=None):
+    """Returns the same detections as get_objects() as Detections.
+
+    Boxes are ints, classes are Object kinds, see to_objects().
+    """
+    if np is None:
+        return _to_detections(get_objects(result, threshold, offset, per_class,
+                                          max_detections))
+
+    logit_scores, box_encodings, size = _get_tensors(result, threshold)
+    assert len(logit_scores) == 4 * _NUM_ANCHORS
+    assert len(box_encodings) == 4 * _NUM_ANCHORS
+    boxes, kinds, scores = _decode_detection_arrays(logit_scores, box_encodings, threshold,
+                                                    size, offset)
+    indices, _ = nms.non_max_suppression(boxes, scores, kinds, per_class=per_class,
+                                         max_detections=max_detections)
+    return Detections(boxes[indices], scores[indices], kinds[indices], box_dtype='int64')
+
 
+def _to_detections(objs):
+    return Detections([obj.bounding_box for obj in objs], [obj.score for obj in objs],
+                      [obj.kind for obj in objs], box_dtype='int64')
 
-def get_objects_sparse(result, offset=(0, 0)):
+
+def to_objects(detections):
+    """Returns list of Object from Detections of get_detections()."""
+    boxes, scores, kinds, _ = detections.tolists()
+    return [Object(tuple(bbox), kind, score) for bbox, kind, score in zip(boxes, kinds, scores)]
+
+
+def get_objects_sparse(result, offset=(0, 0), per_class=False, max_detections=None):
     assert len(result.tensors) == 2
 
     logit_scores_indices = tuple(result.tensors[_SCORE_TENSOR_NAME].indices)
-    logit_scores = tuple(result.tensors[_SCORE_TENSOR_NAME].data)
+    logit_scores = utils.floats(result.tensors[_SCORE_TENSOR_NAME].data)
     box_encodings_indices = tuple(result.tensors[_ANCHOR_TENSOR_NAME].indices)
-    box_encodings = tuple(result.tensors[_ANCHOR_TENSOR_NAME].data)
+    box_encodings = utils.floats(result.tensors[_ANCHOR_TENSOR_NAME].data)
 
     size = (result.window.width, result.window.height)
     objs = _decode_sparse_detection_result(logit_scores_indices, logit_scores,
                                            box_encodings_indices, box_encodings,
                                            size, offset)
-    return _non_maximum_suppression(objs)
\ No newline at end of file
+    return _non_maximum_suppression(objs, per_class=per_class, max_detections=max_detections)
+
+
+def get_detections_sparse(result, offset=(0, 0), per_class=False, max_detections=None):
+    """Returns the same detections as get_objects_sparse() as Detections."""
+    return _to_detections(get_objects_sparse(result, offset, per_class, max_detections))
@@ -1,6 +1,11 @@
 """Set of reusable utilities to work with AIY models."""
 
+import functools
 import os
+import struct
+import threading
+
+from aiy.vision.models import _cache
 
 
 def _path(filename):
@@ -8,24 +13,67 @@ def _path(filename):
     return os.path.join(path, filename)
 
 
+def lazy(func):
+    """Decorator which calls func without arguments at most once, on first use.
+
+    Model modules use it to defer reading of labels and anchors until they are
+    needed. The result is memoized and initialization is thread-safe.
+    """
+    lock = threading.Lock()
+    result = []
+
+    @functools.wraps(func)
+    def wrapper():
+        if not result:
+            with lock:
+                if not result:
+                    result.append(func())
+        return result[0]
+    return wrapper
+
+
 def load_compute_graph(filename):
     with open(_path(filename), 'rb') as f:
         return f.read()
 
-def load_labels(filename):
+def _parse_labels(path):
     def split(line):
         return tuple(word.strip() for word in line.split(','))
 
-    with open(_path(filename), encoding='utf-8') as f:
+    with open(path, encoding='utf-8') as f:
         return tuple(split(line) for line in f)
 
-def load_ssd_anchors(filename):
+def load_labels(filename):
+    """Returns tuple of label tuples, parsed once and then loaded from cache."""
+    return _cache.load_labels(_path(filename), _parse_labels)
+
+def _parse_ssd_anchors(path):
     def split(line):
         return tuple(float(word.strip()) for word in line.split(' '))
 
-    with open(_path(filename), encoding='utf-8') as f:
+    with open(path, encoding='utf-8') as f:
         return tuple(split(line) for line in f)
 
+def load_ssd_anchors_buffer(filename):
+    """Returns (num_anchors, memoryview of doubles) of memory mapped anchors.
+
+    Each anchor is 4 consecutive values: (ymin, xmin, ymax, xmax).
+    """
+    rows, columns, view = _cache.load_floats(_path(filename), _parse_ssd_anchors)
+    assert columns == 4 or rows == 0
+    return rows, view
+
+def load_ssd_anchors(filename):
+    _, view = load_ssd_anchors_buffer(filename)
+    return tuple(struct.iter_unpack('4d', view.cast('B')))
+
+
+def floats(data):
+    """Returns tuple of Python floats from FloatTensor.data or NumPy array."""
+    if hasattr(data, 'tolist'):
+        return tuple(data.tolist())
+    return tuple(data)
+
 
 def shape_tuple(shape):
     return (shape.batch, shape.height, shape.width, shape.depth)
@@ -0,0 +1,157 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Camera inference with several models taking turns on the camera feed.
+
+Vision Bonnet runs camera inference with one model at a time. Here all models
+are loaded once and stay resident, and camera inference is restarted with the
+next model according to model weights, so switching costs only stop and start
+transactions::
+
+  models = [ScheduledModel(object_detection.model(), weight=9),
+            ScheduledModel(inaturalist_classification.model(PLANTS), weight=1)]
+  with MultiCameraInference(models) as inference:
+      for name, result in inference.run():
+          if name == 'object_detection':
+              ...
+
+With weights 9 and 1 the second model gets every 10th frame. Frames are
+interleaved smoothly and consecutive frames of the same model need no switch.
+"""
+
+import contextlib
+import itertools
+import logging
+from collections import namedtuple
+
+from .inference import InferenceEngine, ModelDescriptor, _close_stack_silently, _enter_model
+
+logger = logging.getLogger(__name__)
+
+# descriptor: ModelDescriptor of the model to run.
+# weight: int, relative number of frames processed by the model.
+# params: dict, additional parameters to run inference.
+# sparse_configs: dict, sparse configs of output tensors.
+ScheduledModel = namedtuple('ScheduledModel',
+    ('descriptor', 'weight', 'params', 'sparse_configs'))
+ScheduledModel.__new__.__defaults__ = (1, None, None)
+
+# name: string, ModelDescriptor name of the model which produced result.
+# result: pb2.InferenceResult.
+ModelResult = namedtuple('ModelResult', ('name', 'result'))
+
+
+class _Scheduler:
+    """Smooth weighted round-robin, e.g. weights (2, 1) give A, B, A, A, B, A..."""
+
+    def __init__(self, weights):
+        self._weights = list(weights)
+        self._current = [0] * len(self._weights)
+        self._total = sum(self._weights)
+
+    def next(self):
+        for i, weight in enumerate(self._weights):
+            self._current[i] += weight
+        best = self._current.index(max(self._current))
+        self._current[best] -= self._total
+        return best
+
+
+class MultiCameraInference:
+    """Runs camera inference with several models in turn."""
+
+    def __init__(self, models, model_cache=None):
+        """Initialization.
+
+        Args:
+          models: sequence of ScheduledModel, or ModelDescriptor for weight 1.
+            Descriptor names must be unique.
+          model_cache: ModelCache to borrow models from. By default models are
+            loaded if needed and unloaded on close.
+        """
+        models = [ScheduledModel(m) if isinstance(m, ModelDescriptor) else m for m in models]
+        if not models:
+            raise ValueError('At least one model is required.')
+        names = [model.descriptor.name for model in models]
+        if len(set(names)) != len(names):
+            raise ValueError('Model names must be unique: %s.' % ', '.join(names))
+        for model in models:
+            if model.weight <= 0:
+                raise ValueError('Weight of model "%s" must be positive.' %
+                                 model.descriptor.name)
+
+        self._models = models
+        self._scheduler = _Scheduler(model.weight for model in models)
+        self._running = None  # Index of model running camera inference.
+        self._switches = 0
+        self._counts = dict.fromkeys(names, 0)
+        self._stack = contextlib.ExitStack()
+        self._engine = self._stack.enter_context(InferenceEngine())
+
+        try:
+            self._model_names = [_enter_model(self._stack, self._engine, model.descriptor,
+                                              model_cache) for model in models]
+            self._stack.callback(self._stop)
+        except Exception:
+            _close_stack_silently(self._stack)
+            raise
+
+    def _stop(self):
+        if self._running is not None:
+            self._running = None
+            self._engine.stop_camera_inference()
+
+    def _switch(self, index):
+        self._stop()
+        model = self._models[index]
+        logger.debug('Switch camera inference to "%s".', model.descriptor.name)
+        self._engine.start_camera_inference(self._model_names[index], model.params,
+                                            model.sparse_configs)
+        self._running = index
+        self._switches += 1
+
+    def run(self, count=None):
+        """Yields ModelResult for each processed frame."""
+        for _ in (itertools.count() if count is None else range(count)):
+            index = self._scheduler.next()
+            if index != self._running:
+                self._switch(index)
+            result = self._engine.camera_inference()
+            name = self._models[index].descriptor.name
+            self._counts[name] += 1
+            yield ModelResult(name, result)
+
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def counts(self):
+        """Dict of model name -> number of results."""
+        return dict(self._counts)
+
+    @property
+    def switches(self):
+        """Number of camera inference restarts."""
+        return self._switches
+
+    def close(self):
+        self._stack.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
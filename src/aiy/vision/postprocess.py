@@ -0,0 +1,95 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Parallel decoding of inference results in worker processes.
+
+Decoding dense model outputs (e.g. object detection) keeps one core busy while
+the bonnet is waiting. Here results are parsed and decoded by a pool of worker
+processes and come back in the original order::
+
+  with CameraInference(object_detection.model(), raw_results=True) as inference:
+      for objects in postprocess.ordered_map(object_detection.get_objects,
+                                             inference.run()):
+          ...
+
+Serialized results (see CameraInference raw_results and
+PreparedImageInference.run_bytes()) are parsed in the workers too, so the
+main process only moves bytes. Decode function and its return value must be
+picklable, e.g. a module-level function or functools.partial of one.
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+import os
+
+from .proto import protocol_pb2 as pb2
+
+
+def _decode(decode, data):
+    return decode(pb2.InferenceResult.FromString(data))
+
+
+def _serialize(result):
+    if isinstance(result, (bytes, bytearray, memoryview)):
+        return bytes(result)
+    # Generated message classes can't be pickled, messages go as bytes.
+    # Results with NumPy tensors (see _wire) serialize their tensors too.
+    return result.SerializeToString()
+
+
+def ordered_map(decode, results, max_workers=None, window=None, executor=None):
+    """Yields decode(result) for each result in the order of results.
+
+    At most window results are taken from results and not yet yielded, so
+    memory use and latency stay bounded even if results never end (e.g.
+    camera inference).
+
+    Args:
+      decode: function of pb2.InferenceResult, e.g. face_detection.get_faces.
+      results: iterable of serialized pb2.InferenceResult bytes or
+        pb2.InferenceResult messages (also with NumPy tensors, see
+        InferenceEngine fast_tensors), which are serialized for workers.
+      max_workers: int, number of worker processes, os.cpu_count() by default.
+        Ignored if executor is given.
+      window: int, maximum number of results in flight, twice the number of
+        workers by default.
+      executor: concurrent.futures.Executor to use instead of a new
+        ProcessPoolExecutor, e.g. to keep workers between calls.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if window is None:
+        window = 2 * max_workers
+    if window < 1:
+        raise ValueError('Window must be positive.')
+
+    with contextlib.ExitStack() as stack:
+        if executor is None:
+            executor = stack.enter_context(
+                concurrent.futures.ProcessPoolExecutor(max_workers=max_workers))
+
+        pending = collections.deque()
+        try:
+            for result in results:
+                pending.append(executor.submit(_decode, decode, _serialize(result)))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Consumer stopped early or decode failed.
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,281 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of VisionBonnet transports.
+
+Measures round-trip latency and throughput of every Spicomm implementation
+(see VISION_BONNET_SPICOMM environment variable) for a range of request sizes,
+from tiny CameraInference polls to multi-megabyte ImageInference requests::
+
+  python3 -m aiy.vision.spicomm_bench             # Real device.
+  python3 -m aiy.vision.spicomm_bench --fake      # Loopback fake device.
+  python3 -m aiy.vision.spicomm_bench --emulator  # Socket transport + emulator.
+  python3 -m aiy.vision.spicomm_bench --auto      # Update VISION_BONNET_SPICOMM=auto cache.
+
+Requests are GetSystemInfo requests padded to size with an unknown field,
+which protobuf parsers skip, so the board replies with a small SystemInfo
+response and mostly transport overhead is measured. The fake device echoes
+requests back, so response size equals request size.
+
+VISION_BONNET_SPICOMM=auto only reads the type saved by --auto, the board is
+never benchmarked implicitly.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+from collections import namedtuple
+
+from . import _spicomm
+from .inference import _REQ_GET_SYSTEM_INFO, _varint
+from .proto import protocol_pb2 as pb2
+
+logger = logging.getLogger(__name__)
+
+SPICOMM_TYPES = ('sync', 'sync_mmap', 'async', 'async_shm')
+DEFAULT_SIZES = (64, 4 * 1024, 64 * 1024, 1024 * 1024, 6 * 1024 * 1024)
+AUTO_SIZES = (64, 64 * 1024, 1024 * 1024)
+
+# Field number unknown to pb2.Request, used for padding.
+_PADDING_FIELD = 15
+assert _PADDING_FIELD not in pb2.Request.DESCRIPTOR.fields_by_number
+DEFAULT_CACHE_PATH = os.path.expanduser('~/.cache/aiy/spicomm.json')
+
+# spicomm_type: string, key of _spicomm._spicomm_types or 'socket'.
+# size: int, request size in bytes.
+# median_ms: float, median round-trip time.
+# p90_ms: float, 90th percentile round-trip time.
+# throughput: float, request megabytes per second at median round-trip time.
+BenchmarkResult = namedtuple('BenchmarkResult',
+    ('spicomm_type', 'size', 'median_ms', 'p90_ms', 'throughput'))
+
+
+class _FakeFcntl:
+    """Replacement of fcntl module for _spicomm which implements loopback device.
+
+    Payload stays in the transaction buffer (or mapping), so every response is
+    exactly the request.
+    """
+
+    def ioctl(self, fd, request, arg=0, mutate_flag=True):
+        if request in (_spicomm.SPICOMM_IOCTL_TRANSACT, _spicomm.SPICOMM_IOCTL_TRANSACT_MMAP):
+            _, timeout_ms, size, payload_size = struct.unpack_from('IIII', arg)
+            if not payload_size:
+                raise OSError('Empty request.')
+            struct.pack_into('IIII', arg, 0, 0, timeout_ms, size, payload_size)
+        return 0
+
+
+@contextlib.contextmanager
+def FakeDevice(size=256 * 1024 * 1024):
+    """Makes Spicomm classes talk to a loopback fake device backed by a file."""
+    old_dev, old_fcntl = _spicomm.SPICOMM_DEV, _spicomm.fcntl
+    with tempfile.NamedTemporaryFile(prefix='fake_spicomm') as f:
+        os.truncate(f.name, size)  # Sparse file, mappings need backing storage.
+        _spicomm.SPICOMM_DEV, _spicomm.fcntl = f.name, _FakeFcntl()
+        try:
+            yield
+        finally:
+            _spicomm.SPICOMM_DEV, _spicomm.fcntl = old_dev, old_fcntl
+
+
+def _percentile(sorted_values, p):
+    return sorted_values[min(int(p * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def _request(size):
+    """Returns GetSystemInfo request padded to size bytes (if it is bigger)."""
+    for varint_size in range(1, 6):
+        padding = size - len(_REQ_GET_SYSTEM_INFO) - 1 - varint_size
+        if padding >= 0 and len(_varint(padding)) == varint_size:
+            return b''.join((_REQ_GET_SYSTEM_INFO, bytes(((_PADDING_FIELD << 3) | 2,)),
+                             _varint(padding), bytes(padding)))
+    return _REQ_GET_SYSTEM_INFO
+
+
+def _measure(send, spicomm_type, size, repeats):
+    request = _request(size)
+    send(request)  # Warm up.
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        send(request)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    median = _percentile(times, 0.5)
+    return BenchmarkResult(spicomm_type=spicomm_type,
+                           size=size,
+                           median_ms=1000 * median,
+                           p90_ms=1000 * _percentile(times, 0.9),
+                           throughput=size / median / 1024 / 1024)
+
+
+def benchmark(spicomm_type, sizes=DEFAULT_SIZES, repeats=20):
+    """Returns list of BenchmarkResult for Spicomm implementation."""
+    with _spicomm._spicomm_types[spicomm_type]() as spicomm:
+        return [_measure(spicomm.transact, spicomm_type, size, repeats) for size in sizes]
+
+
+def benchmark_socket(sizes=DEFAULT_SIZES, repeats=20):
+    """Returns list of BenchmarkResult for socket transport.
+
+    VISION_BONNET_HOST and VISION_BONNET_PORT define where to connect.
+    """
+    from ._transport import _SocketTransport
+    transport = _SocketTransport()
+    try:
+        return [_measure(transport.send, 'socket', size, repeats) for size in sizes]
+    finally:
+        transport.close()
+
+
+def fastest(results):
+    """Returns Spicomm type with the best latency relative to other types.
+
+    Each type gets the average ratio of its median time to the best median
+    time for the same request size, the lowest average wins.
+    """
+    best = {}
+    for r in results:
+        best[r.size] = min(best.get(r.size, r.median_ms), r.median_ms)
+
+    scores = {}
+    for r in results:
+        scores.setdefault(r.spicomm_type, []).append(r.median_ms / best[r.size])
+    return min(scores, key=lambda t: sum(scores[t]) / len(scores[t]))
+
+
+def _cache_path():
+    return os.environ.get('VISION_BONNET_SPICOMM_CACHE', DEFAULT_CACHE_PATH)
+
+
+def _cache_key():
+    uname = os.uname()
+    return '%s %s %d' % (uname.release, uname.machine, _spicomm._get_default_payload_size())
+
+
+def _read_cache(path):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+        if cache['key'] == _cache_key() and cache['type'] in _spicomm._spicomm_types:
+            return cache['type']
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _write_cache(path, spicomm_type, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'key': _cache_key(),
+                   'type': spicomm_type,
+                   'results': [r._asdict() for r in results]}, f, indent=2)
+
+
+def cached_type():
+    """Returns Spicomm type saved by autotune(), None if there is none valid."""
+    return _read_cache(_cache_path())
+
+
+def autotune(types=SPICOMM_TYPES, sizes=AUTO_SIZES, repeats=10, force=False):
+    """Returns the fastest Spicomm type, benchmarking only if not cached.
+
+    The result is cached in VISION_BONNET_SPICOMM_CACHE file (default is
+    ~/.cache/aiy/spicomm.json) and is valid until kernel or default payload
+    size changes.
+    """
+    if not force:
+        spicomm_type = cached_type()
+        if spicomm_type:
+            return spicomm_type
+
+    logger.info('Benchmarking Spicomm types: %s', ', '.join(types))
+    results = []
+    for spicomm_type in types:
+        results.extend(benchmark(spicomm_type, sizes, repeats))
+    spicomm_type = fastest(results)
+    logger.info('Fastest Spicomm type: %s', spicomm_type)
+
+    path = _cache_path()
+    try:
+        _write_cache(path, spicomm_type, results)
+    except OSError as e:
+        logger.warning('Cannot write Spicomm cache %s: %s', path, e)
+    return spicomm_type
+
+
+def _print_results(results):
+    print('%-10s %10s %10s %10s %10s' % ('type', 'size', 'median_ms', 'p90_ms', 'MB/s'))
+    for r in results:
+        print('%-10s %10d %10.3f %10.3f %10.1f' % r)
+
+
+def _parse_list(value):
+    return [x.strip() for x in value.split(',') if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='VisionBonnet transport benchmark.')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--fake', action='store_true',
+                        help='Use loopback fake device instead of %s.' % _spicomm.SPICOMM_DEV)
+    source.add_argument('--emulator', action='store_true',
+                        help='Benchmark socket transport against in-process emulator.')
+    source.add_argument('--socket', action='store_true',
+                        help='Benchmark socket transport against VISION_BONNET_HOST.')
+    parser.add_argument('--types', type=_parse_list, default=list(SPICOMM_TYPES),
+                        help='Comma-separated Spicomm types.')
+    parser.add_argument('--sizes', type=lambda v: [int(x) for x in _parse_list(v)],
+                        default=list(DEFAULT_SIZES), help='Comma-separated request sizes.')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--auto', action='store_true',
+                        help='Pick the fastest type and save it for VISION_BONNET_SPICOMM=auto.')
+    args = parser.parse_args()
+    if args.auto and (args.fake or args.emulator or args.socket):
+        parser.error('--auto only benchmarks %s, results for other devices would not be '
+                     'valid.' % _spicomm.SPICOMM_DEV)
+
+    logging.basicConfig(level=logging.INFO)
+
+    with contextlib.ExitStack() as stack:
+        if args.emulator or args.socket:
+            if args.emulator:
+                from .emulator import EmulatorServer
+                server = stack.enter_context(EmulatorServer(port=0))
+                host, port = server.address
+                os.environ['VISION_BONNET_HOST'] = host
+                os.environ['VISION_BONNET_PORT'] = str(port)
+            _print_results(benchmark_socket(args.sizes, args.repeats))
+            return
+
+        if args.fake:
+            stack.enter_context(FakeDevice(size=2 * max(args.sizes) + 64 * 1024 * 1024))
+
+        if args.auto:
+            print('Fastest: %s' % autotune(args.types, args.sizes, args.repeats, force=True))
+            return
+
+        for spicomm_type in args.types:
+            _print_results(benchmark(spicomm_type, args.sizes, args.repeats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Host-side multi-object tracking of detection results.
+
+Detections of consecutive frames are associated by IoU of their boxes with
+boxes predicted by a constant velocity model, so each object keeps a stable
+track id::
+
+  tracker = tracking.Tracker()
+  with CameraInference(face_detection.model()) as inference:
+      for result in inference.run():
+          for track in tracker.update(face_detection.get_faces(result)):
+              print(track.id, track.box, track.item.joy_score)
+
+Tracks also predict boxes between detector frames, e.g. to draw overlays at
+camera rate while the detector runs at lower rate::
+
+  boxes = [track.predict(time.monotonic()) for track in tracker.tracks]
+"""
+
+import itertools
+import math
+import time
+
+from aiy.vision.models import nms
+from aiy.vision.models.detections import Detections
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+GREEDY = 'greedy'
+HUNGARIAN = 'hungarian'
+MATCHINGS = (GREEDY, HUNGARIAN)
+
+
+class Track:
+    """Tracked object.
+
+    Attributes:
+      id: int, unique track identifier within Tracker.
+      box: (x, y, width, height) tuple of floats, box at the last update.
+      velocity: (dx, dy, dwidth, dheight) tuple, change of box per second.
+      kind: class id of the detection, None if detections have no classes.
+      score: float, detection score, None if detections have no scores.
+      item: detection object (e.g. Face) of the last match, None for
+        Detections.
+      timestamp: float, time of box in seconds.
+      last_seen: float, time of the last matched detection in seconds.
+      hits: int, number of matched detections.
+      misses: int, number of consecutive updates without matched detection.
+    """
+
+    def __init__(self, track_id, box, kind, score, item, timestamp):
+        self.id = track_id
+        self.box = tuple(float(x) for x in box)
+        self.velocity = (0.0, 0.0, 0.0, 0.0)
+        self.kind = kind
+        self.score = score
+        self.item = item
+        self.timestamp = timestamp
+        self.last_seen = timestamp
+        self.hits = 1
+        self.misses = 0
+
+    def __repr__(self):
+        return 'Track(id=%d, box=%s, kind=%s, score=%s, hits=%d, misses=%d)' % (
+            self.id, self.box, self.kind, self.score, self.hits, self.misses)
+
+    def predict(self, timestamp):
+        """Returns (x, y, width, height) box extrapolated to timestamp."""
+        dt = timestamp - self.timestamp
+        return tuple(x + v * dt for x, v in zip(self.box, self.velocity))
+
+    def _update(self, box, kind, score, item, timestamp, smoothing):
+        dt = timestamp - self.timestamp
+        if dt > 0:
+            measured = tuple((x - x0) / dt for x, x0 in zip(box, self.box))
+            if self.hits == 1:
+                self.velocity = measured  # Nothing to smooth with yet.
+            else:
+                self.velocity = tuple(smoothing * v + (1.0 - smoothing) * m
+                                      for v, m in zip(self.velocity, measured))
+        self.box = tuple(float(x) for x in box)
+        self.kind, self.score, self.item = kind, score, item
+        self.timestamp = self.last_seen = timestamp
+        self.hits += 1
+        self.misses = 0
+
+    def _coast(self, timestamp):
+        """Moves predicted box to timestamp without detection."""
+        self.box = self.predict(timestamp)
+        self.timestamp = timestamp
+        self.misses += 1
+
+
+def _iou_matrix(boxes1, boxes2, kinds1=None, kinds2=None):
+    """Returns list of rows of IoU between two sequences of boxes.
+
+    If kinds are given, IoU of boxes of different kinds is zero.
+    """
+    if np is not None:
+        iou = nms.iou_matrix(boxes1, boxes2)
+        if kinds1 is not None:
+            # Object arrays, kinds may be None.
+            kinds1 = np.array(kinds1, dtype=object)
+            kinds2 = np.array(kinds2, dtype=object)
+            iou[kinds1[:, None] != kinds2[None, :]] = 0.0
+        return iou.tolist()
+    if kinds1 is None:
+        return [[nms.iou(box1, box2) for box2 in boxes2] for box1 in boxes1]
+    return [[nms.iou(box1, box2) if kind1 == kind2 else 0.0
+             for box2, kind2 in zip(boxes2, kinds2)]
+            for box1, kind1 in zip(boxes1, kinds1)]
+
+
+def _match_greedy(iou, threshold):
+    pairs = sorted(((value, i, j) for i, row in enumerate(iou)
+                    for j, value in enumerate(row) if value >= threshold),
+                   key=lambda pair: pair[0], reverse=True)
+    rows, columns, matches = set(), set(), []
+    for _, i, j in pairs:
+        if i not in rows and j not in columns:
+            rows.add(i)
+            columns.add(j)
+            matches.append((i, j))
+    return matches
+
+
+def _hungarian(cost):
+    """Returns column of each row minimizing total cost, rows <= columns.
+
+    Shortest augmenting path version of Kuhn-Munkres algorithm, O(n^2 m).
+    """
+    n, m = len(cost), len(cost[0])
+    u, v = [0.0] * (n + 1), [0.0] * (m + 1)
+    row_of = [0] * (m + 1)  # 1-based row matched to column, 0 if free.
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        row_of[0] = i
+        j0 = 0
+        minv = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while row_of[j0]:
+            used[j0] = True
+            i0, delta, j1 = row_of[j0], math.inf, 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    reduced = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if reduced < minv[j]:
+                        minv[j], way[j] = reduced, j0
+                    if minv[j] < delta:
+                        delta, j1 = minv[j], j
+            for j in range(m + 1):
+                if used[j]:
+                    u[row_of[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+        while j0:
+            j1 = way[j0]
+            row_of[j0] = row_of[j1]
+            j0 = j1
+
+    columns = [0] * n
+    for j in range(1, m + 1):
+        if row_of[j]:
+            columns[row_of[j] - 1] = j - 1
+    return columns
+
+
+def _match_hungarian(iou, threshold):
+    if not iou or not iou[0]:
+        return []
+    transposed = len(iou) > len(iou[0])
+    if transposed:
+        iou = [list(column) for column in zip(*iou)]
+    cost = [[1.0 - value for value in row] for row in iou]
+    matches = [(i, j) for i, j in enumerate(_hungarian(cost)) if iou[i][j] >= threshold]
+    if transposed:
+        matches = [(i, j) for j, i in matches]
+    return sorted(matches)
+
+
+def _detection_lists(detections):
+    """Returns (boxes, kinds, scores, items) lists from detections."""
+    if isinstance(detections, Detections):
+        boxes, scores, kinds, _ = detections.tolists()
+        return boxes, kinds, scores, [None] * len(boxes)
+
+    items = list(detections)
+    boxes = [item.bounding_box for item in items]
+    kinds = [getattr(item, 'kind', None) for item in items]
+    scores = [getattr(item, 'score', getattr(item, 'face_score', None)) for item in items]
+    return boxes, kinds, scores, items
+
+
+class Tracker:
+    """Associates detections of consecutive frames into tracks."""
+
+    def __init__(self, iou_threshold=0.3, max_misses=5, matching=GREEDY, per_class=True,
+                 smoothing=0.5):
+        """Initialization.
+
+        Args:
+          iou_threshold: float, minimum IoU of detection and predicted track
+            box to match them.
+          max_misses: int, track is deleted after this many consecutive updates
+            without matched detection.
+          matching: GREEDY (highest IoU pairs first) or HUNGARIAN (maximum
+            total IoU).
+          per_class: bool, whether detections only match tracks of the same
+            kind.
+          smoothing: float in [0, 1), weight of the previous velocity in
+            velocity update; 0 uses only the last displacement.
+        """
+        if matching not in MATCHINGS:
+            raise ValueError('Unsupported matching: %s. Must be one of %s.' %
+                             (matching, ', '.join(MATCHINGS)))
+        if not 0.0 <= smoothing < 1.0:
+            raise ValueError('Smoothing must be in [0.0, 1.0).')
+        self._iou_threshold = iou_threshold
+        self._max_misses = max_misses
+        self._match = _match_greedy if matching == GREEDY else _match_hungarian
+        self._per_class = per_class
+        self._smoothing = smoothing
+        self._ids = itertools.count(1)
+        self._tracks = []
+
+    @property
+    def tracks(self):
+        """List of live tracks, oldest first."""
+        return list(self._tracks)
+
+    def reset(self):
+        """Deletes all tracks, new tracks get new ids."""
+        self._tracks = []
+
+    def update(self, detections, timestamp=None):
+        """Updates tracks with detections of the next frame.
+
+        Args:
+          detections: Detections, or sequence of objects with bounding_box
+            attribute, e.g. face_detection.Face or object_detection.Object.
+            Their kind is used as class and score (or face_score) as score.
+          timestamp: float, frame time in seconds, e.g.
+            result.frame.timestamp_us / 1e6. Default is time.monotonic().
+        Returns:
+          List of tracks matched or created in this frame, in the order of
+          detections.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        boxes, kinds, scores, items = _detection_lists(detections)
+
+        predicted = [track.predict(timestamp) for track in self._tracks]
+        iou = []
+        if predicted and boxes:
+            if self._per_class:
+                iou = _iou_matrix(predicted, boxes, [track.kind for track in self._tracks],
+                                  kinds)
+            else:
+                iou = _iou_matrix(predicted, boxes)
+        matches = self._match(iou, self._iou_threshold) if iou else []
+
+        updated = [None] * len(boxes)
+        for i, j in matches:
+            track = self._tracks[i]
+            track._update(boxes[j], kinds[j], scores[j], items[j], timestamp,
+                          self._smoothing)
+            updated[j] = track
+
+        matched = set(i for i, _ in matches)
+        tracks = []
+        for i, track in enumerate(self._tracks):
+            if i not in matched:
+                track._coast(timestamp)
+                if track.misses >= self._max_misses:
+                    continue
+            tracks.append(track)
+
+        for j, track in enumerate(updated):
+            if track is None:
+                updated[j] = Track(next(self._ids), boxes[j], kinds[j], scores[j], items[j],
+                                   timestamp)
+                tracks.append(updated[j])
+        self._tracks = tracks
+        return updated
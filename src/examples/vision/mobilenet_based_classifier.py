@@ -19,6 +19,7 @@ import argparse
 from picamera import PiCamera, Color
 
 from aiy.vision import inference
+from aiy.vision.models import classification
 from aiy.vision.models import utils
 
 
@@ -41,10 +42,8 @@ def process(result, labels, tensor_name, threshold, top_k):
     tensor = result.tensors[tensor_name]
     probs, shape = tensor.data, tensor.shape
     assert shape.depth == len(labels)
-    pairs = [pair for pair in enumerate(probs) if pair[1] > threshold]
-    pairs = sorted(pairs, key=lambda pair: pair[1], reverse=True)
-    pairs = pairs[0:top_k]
-    return [' %s (%.2f)' % (labels[index], prob) for index, prob in pairs]
+    classes = classification.get_classes(probs, labels, top_k, threshold)
+    return [' %s (%.2f)' % (label, prob) for label, prob in classes]
 
 
 def main():
@@ -126,7 +126,8 @@ def main():
         overlay = OverlayManager(
             camera) if flags.output_overlay else DummyOverlayManager()
         servo = AngularServo(PIN_A, min_pulse_width=.0005, max_pulse_width=.0019)
-        with CameraInference(image_classification.model()) as classifier:
+        # Servo should follow the newest frame, stale results are skipped.
+        with CameraInference(image_classification.model(), latest_only=True) as classifier:
             print('Load Model %f' % (time.time() - load_model))
             for result in classifier.run():
                 if not button.on():
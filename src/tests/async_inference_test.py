@@ -0,0 +1,94 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import unittest
+
+from aiy.vision.async_inference import AsyncInferenceEngine, AsyncCameraInference
+
+from .emulator_test import EmulatorTestCase, MODEL
+
+
+class AsyncInferenceTest(EmulatorTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        super().tearDown()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_image_inference(self):
+        async def run():
+            async with AsyncInferenceEngine() as engine:
+                model_name = await engine.load_model(MODEL)
+                result = await engine.image_inference(model_name, b'\xff\xd8')
+                await engine.unload_model(model_name)
+                return result
+        result = self.run_async(run())
+        self.assertEqual(10, len(result.tensors['scores'].data))
+
+    def test_camera_inference(self):
+        async def run():
+            async with AsyncCameraInference(MODEL) as inference:
+                indices = []
+                async for result in inference.results(5):
+                    indices.append(result.frame.index)
+                return indices, inference.count
+        indices, count = self.run_async(run())
+        self.assertEqual(5, count)
+        self.assertEqual(5, len(set(indices)))
+
+    def test_camera_inference_cancel(self):
+        self.server.emulator._default_latency = 0.2
+
+        async def consume(inference):
+            async for _ in inference.results():
+                pass
+
+        async def run():
+            async with AsyncInferenceEngine() as engine:
+                async with AsyncCameraInference(MODEL, engine=engine) as inference:
+                    task = asyncio.ensure_future(consume(inference))
+                    await asyncio.sleep(0.3)
+                    task.cancel()
+                    with self.assertRaises(asyncio.CancelledError):
+                        await task
+                return await engine.get_inference_state()
+
+        state = self.run_async(run())
+        self.assertFalse(state.loaded_models)
+        self.assertFalse(state.processing_models)
+
+    def test_close_twice(self):
+        async def run():
+            inference = AsyncCameraInference(MODEL)
+            await inference.open()
+            await inference.close()
+            await inference.close()
+            engine = AsyncInferenceEngine()
+            await engine.close()
+            await engine.close()
+
+        self.run_async(run())
+        self.assertFalse(self.server.emulator.loaded_models)
+
+
+if __name__ == '__main__':
+    unittest.main()
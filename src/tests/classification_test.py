@@ -0,0 +1,72 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import random
+import unittest
+
+import numpy as np
+
+import aiy.vision.proto.protocol_pb2 as pb2
+
+from aiy.vision.models import classification
+
+
+def _reference(probs, top_k, threshold):
+    """Original full sort implementation."""
+    pairs = [pair for pair in enumerate(probs) if pair[1] > threshold]
+    pairs = sorted(pairs, key=lambda pair: pair[1], reverse=True)
+    return pairs[0:top_k]
+
+
+class ClassificationTest(unittest.TestCase):
+
+    def check(self, probs, top_k, threshold):
+        expected = _reference(probs, top_k, threshold)
+        self.assertEqual(expected, classification.top_k_pairs(probs, top_k, threshold))
+        self.assertEqual(expected, classification.top_k_pairs(np.array(probs), top_k, threshold))
+        # Protobuf and fast tensors hold float32 values.
+        probs32 = np.array(probs, dtype=np.float32)
+        expected32 = _reference(probs32.tolist(), top_k, threshold)
+        self.assertEqual(expected32, classification.top_k_pairs(probs32, top_k, threshold))
+        tensor = pb2.FloatTensor()
+        tensor.data.extend(probs)
+        self.assertEqual(expected32, classification.top_k_pairs(tensor.data, top_k, threshold))
+        np_module, classification.np = classification.np, None
+        try:
+            self.assertEqual(expected, classification.top_k_pairs(probs, top_k, threshold))
+        finally:
+            classification.np = np_module
+
+    def test_top_k(self):
+        rng = random.Random(0)
+        probs = [rng.random() for _ in range(1000)]
+        for top_k in (None, -2000, -3, -1, 0, 1, 3, 999, 1000, 2000):
+            for threshold in (0.0, 0.5, 0.999):
+                self.check(probs, top_k, threshold)
+
+    def test_ties(self):
+        # Quantized outputs have many equal values.
+        rng = random.Random(1)
+        probs = [rng.randint(0, 5) / 5.0 for _ in range(200)]
+        for top_k in (1, 3, 10, 50):
+            self.check(probs, top_k, 0.0)
+
+    def test_get_classes(self):
+        labels = classification.join_labels((('cat', 'kitty'), ('dog',), ('fish',)))
+        self.assertEqual(('cat/kitty', 'dog', 'fish'), labels)
+        self.assertEqual([('dog', 0.5), ('cat/kitty', 0.25)],
+                         classification.get_classes([0.25, 0.5, 0.125], labels, top_k=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import random
+import tempfile
+import unittest
+
+import aiy.vision.proto.protocol_pb2 as pb2
+
+from aiy.vision.models import detections
+from aiy.vision.models import dish_detection
+from aiy.vision.models import face_detection
+from aiy.vision.models import utils
+
+
+class DetectionsTest(unittest.TestCase):
+
+    def make(self):
+        return detections.Detections([(0, 0, 10, 10), (5, 5, 10, 10), (1, 2, 3, 4)],
+                                     [0.9, 0.5, 0.7], [1, 2, 1],
+                                     {'extra': [10.0, 20.0, 30.0]}, box_dtype='int64')
+
+    def check(self):
+        dets = self.make()
+        self.assertEqual(3, len(dets))
+        boxes, scores, classes, columns = dets.take([2, 0]).tolists()
+        self.assertEqual([[1, 2, 3, 4], [0, 0, 10, 10]], boxes)
+        self.assertEqual([0.7, 0.9], scores)
+        self.assertEqual([1, 1], classes)
+        self.assertEqual({'extra': [30.0, 10.0]}, columns)
+
+        boxes, _, _, _ = dets.take([False, True, False]).tolists()
+        self.assertEqual([[5, 5, 10, 10]], boxes)
+        self.assertEqual(0, len(dets.take([])))
+
+        with self.assertRaises(ValueError):
+            detections.Detections([(0, 0, 1, 1)], [0.5, 0.5], [1, 1])
+        with self.assertRaises(ValueError):
+            detections.Detections([(0, 0, 1, 1)], [0.5], [1], {'extra': []})
+
+    def test_numpy(self):
+        self.check()
+        dets = self.make()
+        self.assertEqual((3, 4), dets.boxes.shape)
+        self.assertEqual(2, len(dets.take(dets.classes == 1)))
+
+    def test_python(self):
+        np_module, detections.np = detections.np, None
+        try:
+            self.check()
+        finally:
+            detections.np = np_module
+
+
+class ModelDetectionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_faces(self):
+        result = pb2.InferenceResult()
+        result.tensors['bounding_boxes'].data.extend(self.rng.uniform(0, 100)
+                                                     for _ in range(4 * 5))
+        result.tensors['face_scores'].data.extend(self.rng.random() for _ in range(5))
+        result.tensors['joy_scores'].data.extend(self.rng.random() for _ in range(5))
+        dets = face_detection.get_detections(result)
+        self.assertEqual(5, len(dets))
+        self.assertEqual(face_detection.get_faces(result), face_detection.to_faces(dets))
+
+    def test_dishes(self):
+        with tempfile.TemporaryDirectory() as models_path:
+            environ = dict(os.environ)
+            os.environ['VISION_BONNET_MODELS_PATH'] = models_path
+            os.environ['VISION_BONNET_MODELS_CACHE'] = ''
+            with open(os.path.join(models_path,
+                                   'mobilenet_v1_192res_1.0_seefood_labels.txt'), 'w') as f:
+                f.write(''.join('dish%d\n' % i for i in range(20)))
+            lazy = dish_detection._classes
+            dish_detection._classes = utils.lazy(lazy.__wrapped__)
+            try:
+                result = pb2.InferenceResult()
+                result.tensors['bounding_boxes'].data.extend(self.rng.uniform(0, 100)
+                                                             for _ in range(4 * 3))
+                result.tensors['dish_scores'].data.extend(self.rng.random()
+                                                          for _ in range(20 * 3))
+                dets = dish_detection.get_detections(result)
+                self.assertEqual(3, len(dets))
+                self.assertEqual((3, 20), dets.columns['class_scores'].shape)
+                self.assertEqual(dish_detection.get_dishes(result, top_k=5),
+                                 dish_detection.to_dishes(dets, top_k=5))
+                best = [dish.sorted_scores[0] for dish in dish_detection.get_dishes(result)]
+                self.assertEqual([label for label, _ in best],
+                                 ['dish%d' % i for i in dets.classes.tolist()])
+                self.assertEqual([score for _, score in best], dets.scores.tolist())
+            finally:
+                dish_detection._classes = lazy
+                os.environ.clear()
+                os.environ.update(environ)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,370 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests which run InferenceEngine against VisionBonnet emulator."""
+
+import contextlib
+import io
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+import numpy as np
+from PIL import Image
+
+import aiy.vision.proto.protocol_pb2 as pb2
+
+from aiy.vision.emulator import BonnetEmulator, EmulatorServer, read_results, write_results
+from aiy.vision.inference import InferenceEngine, InferenceException, \
+                                 ImageInference, CameraInference, ModelDescriptor, \
+                                 PreparedImageInference, RawImage, ThresholdingConfig, \
+                                 _enter_model, _get_sparse_configs
+
+MODEL = ModelDescriptor(name='test_model',
+                        input_shape=(1, 16, 16, 3),
+                        input_normalizer=(128.0, 128.0),
+                        compute_graph=b'graph')
+
+SHAPES = {'scores': (1, 1, 1, 10), 'boxes': (1, 1, 10, 4)}
+
+
+def _recording(send, requests):
+    def wrapper(request, *args, **kwargs):
+        requests.append(bytes(request))
+        return send(request, *args, **kwargs)
+    return wrapper
+
+
+class EmulatorTestCase(unittest.TestCase):
+    """Starts emulator and points InferenceEngine to it."""
+
+    def setUp(self):
+        self.server = EmulatorServer(BonnetEmulator(results={MODEL.name: SHAPES}, seed=0),
+                                     port=0)
+        host, port = self.server.address
+        self.environ = dict(os.environ)
+        os.environ['VISION_BONNET_TRANSPORT'] = 'socket'
+        os.environ['VISION_BONNET_HOST'] = host
+        os.environ['VISION_BONNET_PORT'] = str(port)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.environ['VISION_BONNET_MODEL_DIGESTS'] = os.path.join(self.tmpdir.name,
+                                                                 'models.json')
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        self.tmpdir.cleanup()
+        self.server.close()
+
+
+class EmulatorTest(EmulatorTestCase):
+
+    def test_firmware_info(self):
+        with InferenceEngine() as engine:
+            self.assertEqual((1, 2), engine.get_firmware_info())
+
+    def test_load_unload(self):
+        with InferenceEngine() as engine:
+            model_name = engine.load_model(MODEL)
+            state = engine.get_inference_state()
+            self.assertEqual({model_name}, set(state.loaded_models))
+
+            with self.assertRaises(InferenceException):
+                engine.unload_model('invalid_model_name')
+
+            engine.unload_model(model_name)
+            self.assertFalse(engine.get_inference_state().loaded_models)
+
+    def test_load_model_dedup(self):
+        with InferenceEngine(collect_stats=True) as engine:
+            self.assertEqual(MODEL.name, engine.load_model(MODEL))
+            self.assertEqual(MODEL.name, engine.load_model(MODEL))
+            self.assertEqual(1, engine.stats()['load_model'].request_bytes.count)
+
+            # Identical content under different name is a different model.
+            self.assertEqual('other', engine.load_model(MODEL._replace(name='other')))
+            self.assertEqual(2, engine.stats()['load_model'].request_bytes.count)
+
+            # Changed content under the same name is uploaded again.
+            changed = MODEL._replace(compute_graph=b'new graph')
+            self.assertEqual(MODEL.name, engine.load_model(changed))
+            self.assertEqual(3, engine.stats()['load_model'].request_bytes.count)
+            self.assertEqual(1, engine.stats()['unload_model'].request_bytes.count)
+
+        # Digests survive engine (and process) restarts.
+        with InferenceEngine(collect_stats=True) as engine:
+            engine.load_model(changed)
+            self.assertNotIn('load_model', engine.stats())
+
+    def test_load_model_unknown_digest(self):
+        with InferenceEngine(collect_stats=True) as engine:
+            engine.load_model(MODEL)
+            # E.g. loaded by other user, content may differ.
+            os.remove(os.environ['VISION_BONNET_MODEL_DIGESTS'])
+            engine.load_model(MODEL)
+            self.assertEqual(2, engine.stats()['load_model'].request_bytes.count)
+            self.assertEqual({MODEL.name}, set(engine.get_inference_state().loaded_models))
+
+    def test_load_model_transactions(self):
+        with InferenceEngine(collect_stats=True) as engine:
+            engine.load_model(MODEL)
+            engine.reset_stats()
+            with contextlib.ExitStack() as stack:
+                self.assertEqual(MODEL.name, _enter_model(stack, engine, MODEL, None))
+            # Loaded model is neither uploaded nor unloaded.
+            self.assertEqual({'get_inference_state'}, set(engine.stats()))
+            self.assertEqual(1, engine.stats()['get_inference_state'].request_bytes.count)
+
+    def test_load_model_running_mismatch(self):
+        with CameraInference(MODEL) as camera_inference:
+            with self.assertRaises(InferenceException):
+                camera_inference.engine.load_model(MODEL._replace(compute_graph=b'new graph'))
+            self.assertEqual([MODEL.name],
+                             list(camera_inference.engine.get_inference_state().processing_models))
+
+    def test_reset(self):
+        with InferenceEngine() as engine:
+            engine.load_model(MODEL)
+            engine.reset()
+            self.assertFalse(engine.get_inference_state().loaded_models)
+
+    def test_image_inference(self):
+        with ImageInference(MODEL) as inference:
+            result = inference.run(b'\xff\xd8')
+            self.assertEqual(MODEL.name, result.model_name)
+            self.assertEqual(10, len(result.tensors['scores'].data))
+            self.assertEqual(40, len(result.tensors['boxes'].data))
+
+    def test_image_inference_large(self):
+        with ImageInference(MODEL) as inference:
+            for size in (1024, 4 * 1024 * 1024, 1024):
+                result = inference.run(b'\xff\xd8' + bytes(size))
+                self.assertEqual(10, len(result.tensors['scores'].data))
+
+    def test_prepared_image_inference(self):
+        with InferenceEngine() as engine:
+            engine.load_model(MODEL)
+            prepared = engine.prepare_image_inference(MODEL.name, params={'a': 1})
+            for size in (16, 32):
+                result = prepared.run(Image.new('RGB', (size, size)))
+                self.assertEqual((size, size), (result.width, result.height))
+
+    def test_image_inference_array(self):
+        with ImageInference(MODEL) as inference:
+            result = inference.run(np.zeros((24, 40, 3), dtype=np.uint8))
+            self.assertEqual((40, 24), (result.width, result.height))
+            result = inference.run(RawImage(bytes(32 * 16), 30, 10, 'gray'))
+            self.assertEqual((30, 10), (result.width, result.height))
+            with self.assertRaises(InferenceException):
+                inference.run(Image.new('RGBA', (16, 16)))
+
+    def test_image_inference_optimize_transfer(self):
+        image = Image.new('RGB', (1640, 1232))
+        with ImageInference(MODEL, optimize_transfer=True) as inference:
+            # Downscaled to twice the model input size, sent raw.
+            sent = []
+            inference.engine._transport.send = _recording(inference.engine._transport.send, sent)
+            result = inference.run(image)
+            self.assertEqual((1640, 1232), (result.width, result.height))
+            self.assertEqual((0, 0, 1640, 1232), (result.window.x, result.window.y,
+                                                  result.window.width, result.window.height))
+            self.assertLess(len(sent[-1]), 3 * 32 * 32 + 100)
+
+        # Model accepts any size, image is sent as JPEG.
+        with ImageInference(MODEL._replace(input_shape=(1, 0, 0, 3)),
+                            optimize_transfer=True) as inference:
+            sent = []
+            inference.engine._transport.send = _recording(inference.engine._transport.send, sent)
+            result = inference.run(np.zeros((1232, 1640, 3), dtype=np.uint8))
+            self.assertEqual((1640, 1232), (result.width, result.height))
+            self.assertLess(len(sent[-1]), 1640 * 1232)
+
+            # Small images are sent unchanged.
+            result = inference.run(Image.new('RGB', (64, 48)))
+            self.assertEqual((64, 48), (result.width, result.height))
+            self.assertGreater(len(sent[-1]), 3 * 64 * 48)
+
+    def test_prepared_request_bytes(self):
+        sparse_configs = {'scores': ThresholdingConfig(logical_shape=[10], threshold=0.5,
+                                                       top_k=3, to_ignore=[])}
+        image = Image.new('RGB', (300, 200), color=(1, 2, 3))
+        prepared = PreparedImageInference(None, MODEL.name, {'a': 1}, sparse_configs)
+        request = pb2.Request()
+        request.ParseFromString(prepared.request_bytes(image))
+
+        expected = pb2.Request(image_inference=pb2.Request.ImageInference(
+            model_name=MODEL.name,
+            tensor=pb2.ByteTensor(
+                shape=pb2.TensorShape(batch=1, height=200, width=300, depth=3),
+                data=bytes([1]) * 60000 + bytes([2]) * 60000 + bytes([3]) * 60000),
+            params={'a': '1'},
+            sparse_configs=_get_sparse_configs(sparse_configs)))
+        self.assertEqual(expected, request)
+
+    def test_camera_inference(self):
+        with CameraInference(MODEL) as inference:
+            state = inference.engine.get_inference_state()
+            self.assertEqual([MODEL.name], list(state.processing_models))
+            indices = [result.frame.index for result in inference.run(5)]
+            self.assertEqual(indices, sorted(indices))
+            self.assertEqual(5, len(set(indices)))
+
+    def test_camera_inference_prefetch(self):
+        self.server.emulator._default_latency = 0.05
+
+        def elapsed(prefetch):
+            with CameraInference(MODEL, prefetch=prefetch) as inference:
+                start = time.monotonic()
+                indices = []
+                for result in inference.run(6):
+                    indices.append(result.frame.index)
+                    time.sleep(0.05)  # Processing overlaps with the next transaction.
+                self.assertEqual(indices, sorted(indices))
+                self.assertEqual(6, len(set(indices)))
+                return time.monotonic() - start
+
+        self.assertLess(elapsed(2), 0.8 * elapsed(0))
+
+    def test_camera_inference_prefetch_close(self):
+        inference = CameraInference(MODEL, prefetch=3)
+        next(inference.run())
+        time.sleep(0.2)  # Queue is full, prefetch thread waits.
+        inference.close()
+        self.assertEqual([], list(inference.run()))
+        self.assertEqual(1, inference.count)
+        with InferenceEngine() as engine:
+            state = engine.get_inference_state()
+            self.assertFalse(state.processing_models)
+            self.assertFalse(state.loaded_models)
+
+    def test_camera_inference_prefetch_error(self):
+        with CameraInference(MODEL, prefetch=1) as inference:
+            inference.engine.stop_camera_inference()
+            with self.assertRaises(InferenceException):
+                for _ in inference.run(10):
+                    pass
+            with self.assertRaises(InferenceException):
+                next(inference.run())
+
+    def test_camera_inference_latest_only(self):
+        with CameraInference(MODEL, latest_only=True) as inference:
+            result = inference.wait(timeout=5.0)
+            latest, age = inference.latest()
+            self.assertGreaterEqual(latest.frame.index, result.frame.index)
+            self.assertGreaterEqual(age, 0.0)
+
+            newer = inference.wait(after=latest.frame.index, timeout=5.0)
+            self.assertGreater(newer.frame.index, latest.frame.index)
+            self.assertIsNone(inference.wait(after=newer.frame.index + 1000, timeout=0.1))
+
+            # Slow consumer gets only fresh results, stale ones are skipped.
+            indices = []
+            for result in inference.run(3):
+                indices.append(result.frame.index)
+                time.sleep(0.2)
+            self.assertTrue(all(b - a > 1 for a, b in zip(indices, indices[1:])))
+        self.assertIsNone(inference.wait())
+
+    def test_camera_inference_latest_only_errors(self):
+        with self.assertRaises(ValueError):
+            CameraInference(MODEL, prefetch=1, latest_only=True)
+        with CameraInference(MODEL) as inference:
+            with self.assertRaises(RuntimeError):
+                inference.latest()
+        with CameraInference(MODEL, latest_only=True) as inference:
+            inference.wait()
+            inference.engine.stop_camera_inference()
+            with self.assertRaises(InferenceException):
+                inference.wait(after=1000000)
+            with self.assertRaises(InferenceException):
+                inference.latest()
+
+    def test_fast_tensors(self):
+        with InferenceEngine(fast_tensors=True) as engine:
+            engine.load_model(MODEL)
+            result = engine.image_inference(MODEL.name, b'\xff\xd8')
+            self.assertEqual(MODEL.name, result.model_name)
+            self.assertEqual(np.float32, result.tensors['boxes'].data.dtype)
+            self.assertEqual(40, len(result.tensors['boxes'].data))
+            self.assertEqual(4, result.tensors['boxes'].shape.depth)
+
+            engine.start_camera_inference(MODEL.name)
+            fast = engine.camera_inference()
+            self.assertIsInstance(fast.tensors['scores'].data, np.ndarray)
+            engine.stop_camera_inference()
+
+        with InferenceEngine(fast_tensors=False) as engine:
+            engine.start_camera_inference(MODEL.name)
+            result = engine.camera_inference()
+            self.assertIsInstance(result, pb2.InferenceResult)
+            engine.stop_camera_inference()
+            engine.unload_model(MODEL.name)
+
+    def test_stats(self):
+        with InferenceEngine(collect_stats=True) as engine:
+            engine.load_model(MODEL)
+            engine.start_camera_inference(MODEL.name)
+            for _ in range(3):
+                engine.camera_inference()
+            engine.stop_camera_inference()
+
+            stats = engine.stats()
+            self.assertEqual(3, stats['camera_inference'].transport_us.count)
+            self.assertEqual(1, stats['load_model'].request_bytes.count)
+            self.assertGreater(stats['load_model'].request_bytes.min, len(MODEL.compute_graph))
+            self.assertGreater(stats['camera_inference'].response_bytes.min, 10 * 4)
+
+            engine.reset_stats()
+            self.assertFalse(engine.stats())
+
+        with InferenceEngine(collect_stats=False) as engine:
+            engine.get_system_info()
+            self.assertFalse(engine.stats())
+
+    def test_camera_inference_not_started(self):
+        with InferenceEngine() as engine:
+            with self.assertRaises(InferenceException):
+                engine.camera_inference()
+
+
+class TimeoutTest(EmulatorTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server.emulator._default_latency = 0.5
+
+    def test_timeout(self):
+        request = pb2.Request(image_inference=pb2.Request.ImageInference(model_name=MODEL.name))
+        with InferenceEngine() as engine:
+            engine.load_model(MODEL)
+            with self.assertRaises(socket.timeout):
+                engine._communicate(request, timeout=0.1)
+            # Transport reconnects after timeout.
+            self.assertEqual((1, 2), engine.get_firmware_info())
+
+
+class ReplayTest(unittest.TestCase):
+
+    def test_read_write(self):
+        emulator = BonnetEmulator(results={MODEL.name: SHAPES}, seed=0)
+        results = [emulator._make_result(MODEL.name, 16, 16) for _ in range(3)]
+        f = io.BytesIO()
+        write_results(f, results)
+        f.seek(0)
+        self.assertEqual(results, read_results(f))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+from aiy.vision.inference import CameraInference, ImageInference, InferenceEngine
+from aiy.vision.model_cache import ModelCache
+
+from .emulator_test import EmulatorTestCase, MODEL
+
+
+def _model(name, size):
+    return MODEL._replace(name=name, compute_graph=name.encode() * size)
+
+
+A, B, C = _model('a', 100), _model('b', 100), _model('c', 100)
+
+
+class ModelCacheTest(EmulatorTestCase):
+
+    def test_lru_eviction(self):
+        with ModelCache(max_bytes=250) as cache:
+            with cache.borrow(A), cache.borrow(B):
+                pass
+            self.assertEqual(['a', 'b'], cache.resident_models)
+
+            with cache.borrow(A):
+                pass
+            self.assertEqual(['b', 'a'], cache.resident_models)
+
+            # Least recently used 'b' makes room for 'c'.
+            with cache.borrow(C):
+                pass
+            self.assertEqual(['a', 'c'], cache.resident_models)
+            self.assertEqual({'a', 'c'}, self.server.emulator.loaded_models)
+            self.assertEqual(200, cache.resident_bytes)
+        self.assertFalse(self.server.emulator.loaded_models)
+
+    def test_borrowed_not_evicted(self):
+        with ModelCache(max_models=1) as cache:
+            with cache.borrow(A):
+                with cache.borrow(B):
+                    self.assertEqual({'a', 'b'}, self.server.emulator.loaded_models)
+                    with self.assertRaises(ValueError):
+                        cache.evict('a')
+            cache.evict('a')
+            self.assertEqual({'b'}, self.server.emulator.loaded_models)
+
+    def test_foreign_model_not_unloaded(self):
+        with InferenceEngine() as engine:
+            engine.load_model(A)
+            with ModelCache(max_models=1) as cache:
+                with cache.borrow(A), cache.borrow(B):
+                    pass
+                with cache.borrow(C):
+                    pass
+                self.assertEqual({'a', 'c'}, self.server.emulator.loaded_models)
+            self.assertEqual({'a'}, self.server.emulator.loaded_models)
+
+    def test_resident_model_no_eviction(self):
+        with InferenceEngine() as engine:
+            engine.load_model(B)
+            with ModelCache(max_models=1) as cache:
+                with cache.borrow(A):
+                    pass
+                # 'b' is already loaded, nothing is uploaded and evicted.
+                with cache.borrow(B):
+                    pass
+                self.assertEqual(['a', 'b'], cache.resident_models)
+                self.assertEqual({'a', 'b'}, self.server.emulator.loaded_models)
+
+    def test_reset(self):
+        with ModelCache() as cache:
+            with cache.borrow(A):
+                pass
+            with InferenceEngine() as engine:
+                engine.reset()
+            with cache.borrow(B):
+                pass
+            self.assertEqual(['b'], cache.resident_models)
+
+    def test_inference_borrows(self):
+        with InferenceEngine(collect_stats=True) as engine:
+            with ModelCache(engine=engine) as cache:
+                for _ in range(3):
+                    with CameraInference(MODEL, model_cache=cache) as inference:
+                        for _ in inference.run(1):
+                            pass
+                    with ImageInference(A, model_cache=cache) as inference:
+                        inference.run(b'\xff\xd8')
+                self.assertEqual({MODEL.name, 'a'}, self.server.emulator.loaded_models)
+                self.assertEqual(2, engine.stats()['load_model'].request_bytes.count)
+            self.assertFalse(self.server.emulator.loaded_models)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from aiy.vision.models import utils
+
+MODULES = ('dish_classification', 'dish_detection', 'face_detection',
+           'image_classification', 'inaturalist_classification', 'object_detection')
+
+# Runs in a fresh interpreter, so modules are really imported.
+IMPORT_SCRIPT = """
+import importlib, os, sys
+models_path = os.environ['VISION_BONNET_MODELS_PATH']
+opened = []
+def hook(event, args):
+    if event == 'open' and isinstance(args[0], str) and args[0].startswith(models_path):
+        opened.append(args[0])
+if hasattr(sys, 'addaudithook'):
+    sys.addaudithook(hook)  # Missing files fail imports anyway.
+for name in sys.argv[1:]:
+    importlib.import_module('aiy.vision.models.' + name)
+print('\\n'.join(opened))
+"""
+
+
+class ModelsImportTest(unittest.TestCase):
+
+    def test_no_file_io_on_import(self):
+        with tempfile.TemporaryDirectory() as models_path:
+            env = dict(os.environ, VISION_BONNET_MODELS_PATH=models_path)
+            env['PYTHONPATH'] = os.pathsep.join(sys.path)
+            output = subprocess.check_output(
+                [sys.executable, '-c', IMPORT_SCRIPT] + list(MODULES),
+                env=env, universal_newlines=True)
+        self.assertEqual('', output.strip())
+
+    def test_lazy(self):
+        calls = []
+        barrier = threading.Barrier(8)
+
+        @utils.lazy
+        def value():
+            calls.append(None)
+            return object()
+
+        results = []
+        def run():
+            barrier.wait()
+            results.append(value())
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(calls))
+        self.assertEqual(1, len(set(id(result) for result in results)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import mmap
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from aiy.vision.models import _cache, utils
+
+LABELS = 'labels.txt'
+ANCHORS = 'anchors.txt'
+
+
+class ModelsCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.environ = dict(os.environ)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.models_path = os.path.join(self.tmpdir.name, 'models')
+        self.cache_path = os.path.join(self.tmpdir.name, 'cache')
+        os.mkdir(self.models_path)
+        os.environ['VISION_BONNET_MODELS_PATH'] = self.models_path
+        os.environ['VISION_BONNET_MODELS_CACHE'] = self.cache_path
+
+        rng = random.Random(0)
+        self.write(LABELS, ''.join('label%d, alias %d\n' % (i, i) for i in range(1000)))
+        self.write(ANCHORS, ''.join('%r %r %r %r\n' % tuple(rng.random() for _ in range(4))
+                                    for _ in range(100)))
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        self.tmpdir.cleanup()
+
+    def write(self, filename, text):
+        with open(os.path.join(self.models_path, filename), 'w') as f:
+            f.write(text)
+
+    def parsed(self, filename):
+        with open(os.path.join(self.models_path, filename)) as f:
+            return [line.split(',' if filename == LABELS else ' ') for line in f]
+
+    def test_labels(self):
+        expected = tuple(tuple(w.strip() for w in words) for words in self.parsed(LABELS))
+        self.assertEqual(expected, utils.load_labels(LABELS))
+        self.assertEqual(1, len(os.listdir(self.cache_path)))
+        self.assertEqual(expected, utils.load_labels(LABELS))  # From cache.
+
+    def test_labels_mapping_closed(self):
+        utils.load_labels(LABELS)
+        mappings = []
+        mmap_file = mmap.mmap
+
+        def recording_mmap(*args, **kwargs):
+            mappings.append(mmap_file(*args, **kwargs))
+            return mappings[-1]
+
+        with mock.patch.object(_cache.mmap, 'mmap', recording_mmap):
+            utils.load_labels(LABELS)  # From cache.
+        self.assertEqual(1, len(mappings))
+        self.assertTrue(mappings[0].closed)
+
+    def test_anchors(self):
+        expected = tuple(tuple(float(w) for w in words) for words in self.parsed(ANCHORS))
+        self.assertEqual(expected, utils.load_ssd_anchors(ANCHORS))
+        self.assertEqual(expected, utils.load_ssd_anchors(ANCHORS))  # From cache.
+        num_anchors, view = utils.load_ssd_anchors_buffer(ANCHORS)
+        self.assertEqual(100, num_anchors)
+        self.assertEqual(expected[1][2], view[6])
+
+    def test_source_changed(self):
+        utils.load_labels(LABELS)
+        self.write(LABELS, 'a, b\nc\n')
+        os.utime(os.path.join(self.models_path, LABELS), ns=(0, 0))
+        self.assertEqual((('a', 'b'), ('c',)), utils.load_labels(LABELS))
+
+    def test_cache_disabled(self):
+        os.environ['VISION_BONNET_MODELS_CACHE'] = ''
+        self.assertEqual(1000, len(utils.load_labels(LABELS)))
+        self.assertFalse(os.path.exists(self.cache_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
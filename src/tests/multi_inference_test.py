@@ -0,0 +1,74 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+from aiy.vision.model_cache import ModelCache
+from aiy.vision.multi_inference import MultiCameraInference, ScheduledModel, _Scheduler
+
+from .emulator_test import EmulatorTestCase, MODEL
+
+A = MODEL._replace(name='a', compute_graph=b'graph_a')
+B = MODEL._replace(name='b', compute_graph=b'graph_b')
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_weights(self):
+        scheduler = _Scheduler([9, 1])
+        order = [scheduler.next() for _ in range(30)]
+        self.assertEqual(3, order.count(1))
+        self.assertEqual([5, 15, 25], [i for i, index in enumerate(order) if index == 1])
+
+        scheduler = _Scheduler([2, 1])
+        self.assertEqual([0, 1, 0, 0, 1, 0], [scheduler.next() for _ in range(6)])
+
+
+class MultiCameraInferenceTest(EmulatorTestCase):
+
+    def test_run(self):
+        with MultiCameraInference([ScheduledModel(A, weight=3), B]) as inference:
+            results = list(inference.run(8))
+            self.assertEqual({'a', 'b'}, self.server.emulator.loaded_models)
+            names = [name for name, _ in results]
+            self.assertEqual(['a', 'a', 'b', 'a', 'a', 'a', 'b', 'a'], names)
+            self.assertEqual(names, [result.model_name for _, result in results])
+            self.assertEqual({'a': 6, 'b': 2}, inference.counts)
+            self.assertEqual(5, inference.switches)
+            indices = [result.frame.index for _, result in results]
+            self.assertEqual(indices, sorted(indices))
+        self.assertFalse(self.server.emulator.loaded_models)
+
+    def test_single_model(self):
+        with MultiCameraInference([A]) as inference:
+            self.assertEqual(5, len(list(inference.run(5))))
+            self.assertEqual(1, inference.switches)
+
+    def test_model_cache(self):
+        with ModelCache() as cache:
+            with MultiCameraInference([A, B], model_cache=cache) as inference:
+                list(inference.run(2))
+            self.assertEqual({'a', 'b'}, self.server.emulator.loaded_models)
+        self.assertFalse(self.server.emulator.loaded_models)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            MultiCameraInference([])
+        with self.assertRaises(ValueError):
+            MultiCameraInference([A, A])
+        with self.assertRaises(ValueError):
+            MultiCameraInference([ScheduledModel(A, weight=0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
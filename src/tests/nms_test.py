@@ -0,0 +1,99 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+import numpy as np
+
+from aiy.vision.models import nms
+from aiy.vision.models import object_detection as od
+from aiy.vision.models.nms_bench import candidates
+
+
+def _reference_nms(boxes, scores, threshold=0.5):
+    """Original O(n^2) object_detection implementation."""
+    order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    suppressed = set()
+    for k, i in enumerate(order):
+        if i in suppressed:
+            continue
+        for j in order[k + 1:]:
+            if j not in suppressed and nms.iou(boxes[i], boxes[j]) > threshold:
+                suppressed.add(j)
+    return [i for i in order if i not in suppressed]
+
+
+class NmsTest(unittest.TestCase):
+
+    def run_both(self, *args, **kwargs):
+        """Returns results of NumPy and pure Python implementations."""
+        return (nms.non_max_suppression(*args, use_numpy=True, **kwargs),
+                nms.non_max_suppression(*args, use_numpy=False, **kwargs))
+
+    def test_hard_matches_reference(self):
+        for size in (0, 1, 10, 200):
+            boxes, scores, _ = candidates(size, seed=size)
+            for (indices, kept), impl in zip(self.run_both(boxes, scores), ('numpy', 'python')):
+                self.assertEqual(_reference_nms(boxes, scores), indices, impl)
+                self.assertEqual([scores[i] for i in indices], kept)
+
+    def test_arrays(self):
+        boxes, scores, classes = candidates(100, seed=2)
+        expected = nms.non_max_suppression(boxes, scores, classes, per_class=True)
+        for result in self.run_both(np.array(boxes), np.array(scores), np.array(classes),
+                                    per_class=True):
+            self.assertEqual(expected, result)
+
+    def test_per_class(self):
+        boxes = [(0, 0, 10, 10), (1, 1, 10, 10), (0, 0, 10, 10)]
+        scores, classes = [0.9, 0.8, 0.7], [1, 1, 2]
+        self.assertEqual(([0], [0.9]), nms.non_max_suppression(boxes, scores, classes))
+        for indices, _ in self.run_both(boxes, scores, classes, per_class=True):
+            self.assertEqual([0, 2], indices)
+        with self.assertRaises(ValueError):
+            nms.non_max_suppression(boxes, scores, per_class=True)
+
+    def test_max_detections(self):
+        boxes, scores, classes = candidates(500)
+        for indices, _ in self.run_both(boxes, scores, classes, max_detections=5):
+            self.assertEqual(_reference_nms(boxes, scores)[:5], indices)
+
+    def test_soft(self):
+        boxes = [(0, 0, 10, 10), (0, 0, 10, 5), (20, 20, 10, 10)]
+        scores = [0.9, 0.8, 0.7]
+        for indices, kept in self.run_both(boxes, scores, method=nms.LINEAR, iou_threshold=0.3):
+            self.assertEqual([0, 2, 1], indices)
+            self.assertAlmostEqual(0.4, kept[2])
+
+        boxes, scores, classes = candidates(300, seed=1)
+        for method in (nms.LINEAR, nms.GAUSSIAN):
+            (numpy_indices, numpy_kept), (python_indices, python_kept) = \
+                self.run_both(boxes, scores, classes, method=method, per_class=True)
+            self.assertEqual(python_indices, numpy_indices)
+            for a, b in zip(numpy_kept, python_kept):
+                self.assertAlmostEqual(a, b)
+            self.assertGreater(len(numpy_indices), len(_reference_nms(boxes, scores)))
+
+        with self.assertRaises(ValueError):
+            nms.non_max_suppression(boxes, scores, method='unknown')
+
+    def test_object_detection(self):
+        objs = [od.Object((0, 0, 10, 10), od.Object.CAT, 0.5),
+                od.Object((1, 1, 10, 10), od.Object.DOG, 0.9)]
+        self.assertEqual([objs[1]], od._non_maximum_suppression(objs))
+        self.assertEqual([objs[1], objs[0]], od._non_maximum_suppression(objs, per_class=True))
+        self.assertEqual([0.5, 0.9], [obj.score for obj in objs])  # Not mutated.
+
+
+if __name__ == '__main__':
+    unittest.main()
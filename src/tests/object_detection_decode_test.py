@@ -0,0 +1,123 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import random
+import tempfile
+import unittest
+
+import aiy.vision.proto.protocol_pb2 as pb2
+
+from aiy.vision import _wire
+from aiy.vision.models import object_detection as od
+from aiy.vision.models import utils
+
+
+def _objects(objs):
+    return [(o.bounding_box, o.kind, o.score) for o in objs]
+
+
+class DecodeTest(unittest.TestCase):
+    """Compares NumPy and pure Python decoders on synthetic anchors."""
+
+    def setUp(self):
+        self.environ = dict(os.environ)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        os.environ['VISION_BONNET_MODELS_PATH'] = self.tmpdir.name
+        os.environ['VISION_BONNET_MODELS_CACHE'] = os.path.join(self.tmpdir.name, 'cache')
+
+        self.rng = random.Random(0)
+        lines = []
+        for _ in range(od._NUM_ANCHORS):
+            ymin, xmin = self.rng.random(), self.rng.random()
+            lines.append('%r %r %r %r\n' % (ymin, xmin, ymin + self.rng.random() / 2,
+                                            xmin + self.rng.random() / 2))
+        with open(os.path.join(self.tmpdir.name, od._ANCHORS_NAME), 'w') as f:
+            f.write(''.join(lines))
+
+        # Fresh memoization, anchors are read from the temporary directory.
+        self.lazies = od._anchors, od._anchor_arrays
+        od._anchors = utils.lazy(od._anchors.__wrapped__)
+        od._anchor_arrays = utils.lazy(od._anchor_arrays.__wrapped__)
+
+    def tearDown(self):
+        od._anchors, od._anchor_arrays = self.lazies
+        os.environ.clear()
+        os.environ.update(self.environ)
+        self.tmpdir.cleanup()
+
+    def decode(self, use_numpy, *args):
+        np_module = od.np
+        if not use_numpy:
+            od.np = None
+        try:
+            return _objects(od._decode_detection_result(*args))
+        finally:
+            od.np = np_module
+
+    def test_identical(self):
+        size = 4 * od._NUM_ANCHORS
+        for threshold in (0.0, 0.3, 0.9):
+            for offset in ((0, 0), (10.5, 3.0)):
+                logits = tuple(self.rng.gauss(0, 2) for _ in range(size))
+                encodings = tuple(self.rng.gauss(0, 2) for _ in range(size))
+                args = (logits, encodings, threshold, (640, 480), offset)
+                expected = self.decode(False, *args)
+                self.assertTrue(expected)
+                self.assertEqual(expected, self.decode(True, *args))
+
+    def test_ties_and_empty(self):
+        size = 4 * od._NUM_ANCHORS
+        logits = (1.0,) * size  # Background wins ties.
+        encodings = (0.0,) * size
+        args = (logits, encodings, 0.3, (640, 480), (0, 0))
+        self.assertEqual([], self.decode(True, *args))
+        self.assertEqual([], self.decode(False, *args))
+
+        logits = (0.0, 2.0, 2.0, 1.0) * od._NUM_ANCHORS
+        args = (logits, encodings, 0.3, (640, 480), (0, 0))
+        objects = self.decode(True, *args)
+        self.assertEqual(self.decode(False, *args), objects)
+        self.assertEqual({od.Object.PERSON}, set(kind for _, kind, _ in objects))
+
+    def test_fast_tensors(self):
+        response = pb2.Response()
+        result = response.inference_result
+        result.window.width, result.window.height = 640, 480
+        for name in (od._SCORE_TENSOR_NAME, od._ANCHOR_TENSOR_NAME):
+            result.tensors[name].data.extend(self.rng.gauss(0, 2)
+                                             for _ in range(4 * od._NUM_ANCHORS))
+        fast = _wire.parse_response(response.SerializeToString()).inference_result
+        expected = _objects(od.get_objects(result, 0.3))
+        self.assertTrue(expected)
+        self.assertEqual(expected, _objects(od.get_objects(fast, 0.3)))
+
+    def test_detections(self):
+        result = pb2.InferenceResult()
+        result.window.width, result.window.height = 640, 480
+        for name in (od._SCORE_TENSOR_NAME, od._ANCHOR_TENSOR_NAME):
+            result.tensors[name].data.extend(self.rng.gauss(0, 2)
+                                             for _ in range(4 * od._NUM_ANCHORS))
+        for per_class in (False, True):
+            expected = _objects(od.get_objects(result, 0.3, per_class=per_class))
+            detections = od.get_detections(result, 0.3, per_class=per_class)
+            self.assertEqual(len(expected), len(detections))
+            self.assertEqual(expected, _objects(od.to_objects(detections)))
+
+        detections = od.get_detections(result, 0.999999)
+        self.assertEqual((0, 4), detections.boxes.shape)
+        self.assertEqual([], od.to_objects(detections))
+
+
+if __name__ == '__main__':
+    unittest.main()
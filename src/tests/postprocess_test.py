@@ -0,0 +1,118 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import concurrent.futures
+import os
+import random
+import time
+import unittest
+
+import aiy.vision.proto.protocol_pb2 as pb2
+
+from aiy.vision import _wire, postprocess
+from aiy.vision.inference import CameraInference, InferenceEngine
+
+from .emulator_test import EmulatorTestCase, MODEL
+
+
+def _frame_index(result):
+    # Random decode time, so results are finished out of order.
+    time.sleep(random.random() * 0.02)
+    return result.frame.index
+
+
+def _frame_scores(result):
+    return result.frame.index, len(result.tensors['scores'].data)
+
+
+def _fail(result):
+    if result.frame.index == 3:
+        raise ValueError('frame 3')
+    return result.frame.index
+
+
+def _results(count):
+    for index in range(count):
+        result = pb2.InferenceResult()
+        result.frame.index = index
+        yield result
+
+
+class OrderedMapTest(unittest.TestCase):
+
+    def test_order(self):
+        results = [result.SerializeToString() for result in _results(20)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
+            for window in (1, 3, 8):
+                self.assertEqual(list(range(20)), list(postprocess.ordered_map(
+                    _frame_index, results, window=window, executor=executor)))
+            self.assertEqual(list(range(20)), list(postprocess.ordered_map(
+                _frame_index, _results(20), executor=executor)))
+
+    def test_window(self):
+        taken = []
+
+        def results():
+            for result in _results(10):
+                taken.append(result.frame.index)
+                yield result
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            outputs = postprocess.ordered_map(_frame_index, results(), window=3,
+                                              executor=executor)
+            self.assertEqual(0, next(outputs))
+            self.assertEqual([0, 1, 2], taken)
+            self.assertEqual(1, next(outputs))
+            self.assertEqual([0, 1, 2, 3], taken)
+            outputs.close()
+
+    def test_error(self):
+        outputs = postprocess.ordered_map(_fail, _results(10), max_workers=2)
+        self.assertEqual([0, 1, 2], [next(outputs) for _ in range(3)])
+        with self.assertRaises(ValueError):
+            next(outputs)
+        with self.assertRaises(ValueError):
+            list(postprocess.ordered_map(_fail, _results(10), window=0))
+
+
+class CameraPostprocessTest(EmulatorTestCase):
+
+    def test_raw_results(self):
+        for prefetch in (0, 2):
+            with CameraInference(MODEL, prefetch=prefetch, raw_results=True) as inference:
+                results = list(inference.run(6))
+                self.assertTrue(all(isinstance(result, bytes) for result in results))
+                indices = list(postprocess.ordered_map(_frame_index, results, max_workers=2))
+                self.assertEqual(indices, sorted(indices))
+                self.assertEqual(6, len(set(indices)))
+
+    def test_fast_tensors(self):
+        os.environ['VISION_BONNET_FAST_TENSORS'] = '1'
+        with CameraInference(MODEL) as inference:
+            results = list(inference.run(4))
+        self.assertIsInstance(results[0], _wire.InferenceResult)
+        outputs = list(postprocess.ordered_map(_frame_scores, results, max_workers=2))
+        self.assertEqual([(result.frame.index, 10) for result in results], outputs)
+
+    def test_run_bytes(self):
+        with InferenceEngine() as engine:
+            engine.load_model(MODEL)
+            data = engine.prepare_image_inference(MODEL.name).run_bytes(b'\xff\xd8')
+            result = pb2.InferenceResult.FromString(data)
+            self.assertEqual(MODEL.name, result.model_name)
+            self.assertEqual(10, len(result.tensors['scores'].data))
+            engine.unload_model(MODEL.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import aiy.vision.proto.protocol_pb2 as pb2
+
+from aiy.vision import _spicomm
+from aiy.vision import spicomm_bench
+from aiy.vision.spicomm_bench import BenchmarkResult, FakeDevice
+
+SIZES = (64, 64 * 1024)
+
+
+class FakeDeviceTest(unittest.TestCase):
+
+    def test_loopback(self):
+        with FakeDevice(size=64 * 1024 * 1024):
+            for spicomm_type in spicomm_bench.SPICOMM_TYPES:
+                with _spicomm._spicomm_types[spicomm_type](default_payload_size=1024) as spicomm:
+                    for size in (10, 1024, 4096):
+                        request = os.urandom(size)
+                        self.assertEqual(request, bytes(spicomm.transact(request)))
+
+    def test_mmap_pool(self):
+        with FakeDevice(size=64 * 1024 * 1024):
+            with _spicomm.SyncSpicommMmap(default_payload_size=1024,
+                                          pool_size=1024 * 1024) as spicomm:
+                for size in (5000, 6000, 5000, 100 * 1024, 5000):
+                    request = os.urandom(size)
+                    self.assertEqual(request, bytes(spicomm.transact(request)))
+                hits, misses, evictions, mapped_bytes = spicomm.pool_stats()
+                self.assertEqual((3, 2, 0), (hits, misses, evictions))
+
+                # Doesn't fit into the pool, evicts nothing.
+                request = os.urandom(2 * 1024 * 1024)
+                self.assertEqual(request, bytes(spicomm.transact(request)))
+                self.assertEqual((3, 3, 0, mapped_bytes), spicomm.pool_stats())
+
+                # Needs the whole pool, evicts both pooled mappings.
+                request = os.urandom(600 * 1024)
+                self.assertEqual(request, bytes(spicomm.transact(request)))
+                self.assertEqual((3, 4, 2, 1024 * 1024), spicomm.pool_stats())
+
+    def test_request(self):
+        for size in (1, 64, 4096, 1024 * 1024):
+            request = spicomm_bench._request(size)
+            self.assertEqual(max(size, 2), len(request))
+            self.assertEqual('get_system_info',
+                             pb2.Request.FromString(request).WhichOneof('request'))
+
+    def test_mmap_pool_disabled(self):
+        with FakeDevice(size=64 * 1024 * 1024):
+            with _spicomm.SyncSpicommMmap(default_payload_size=1024) as spicomm:
+                for size in (5000, 5000):
+                    request = os.urandom(size)
+                    self.assertEqual(request, bytes(spicomm.transact(request)))
+                self.assertEqual((0, 2, 0, 0), spicomm.pool_stats())
+
+    def test_benchmark(self):
+        with FakeDevice(size=64 * 1024 * 1024):
+            results = spicomm_bench.benchmark('sync_mmap', SIZES, repeats=3)
+        self.assertEqual(list(SIZES), [r.size for r in results])
+        self.assertTrue(all(r.median_ms <= r.p90_ms for r in results))
+
+
+class AutotuneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'aiy', 'spicomm.json')
+        os.environ['VISION_BONNET_SPICOMM_CACHE'] = self.path
+
+    def tearDown(self):
+        del os.environ['VISION_BONNET_SPICOMM_CACHE']
+        self.tmpdir.cleanup()
+
+    def test_fastest(self):
+        results = [BenchmarkResult('sync', 64, 1.0, 1.0, 0.0),
+                   BenchmarkResult('sync', 4096, 10.0, 10.0, 0.0),
+                   BenchmarkResult('async', 64, 1.5, 1.5, 0.0),
+                   BenchmarkResult('async', 4096, 2.0, 2.0, 0.0)]
+        self.assertEqual('async', spicomm_bench.fastest(results))
+
+    def test_cache(self):
+        with FakeDevice(size=64 * 1024 * 1024):
+            spicomm_type = spicomm_bench.autotune(sizes=SIZES, repeats=3)
+        self.assertIn(spicomm_type, spicomm_bench.SPICOMM_TYPES)
+
+        # Cached result doesn't need any device.
+        self.assertEqual(spicomm_type, spicomm_bench.autotune())
+
+        with open(self.path) as f:
+            cache = json.load(f)
+        cache['key'] = 'other kernel'
+        with open(self.path, 'w') as f:
+            json.dump(cache, f)
+        self.assertIsNone(spicomm_bench._read_cache(self.path))
+
+    def test_auto_without_cache(self):
+        with FakeDevice(size=64 * 1024 * 1024):
+            with mock.patch.object(spicomm_bench, 'benchmark') as benchmark:
+                with _spicomm._auto_spicomm() as spicomm:
+                    self.assertIsInstance(spicomm, _spicomm.SyncSpicommMmap)
+                self.assertFalse(benchmark.called)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_auto_other_source(self):
+        for source in ('--fake', '--emulator', '--socket'):
+            with mock.patch.object(sys, 'argv', ['spicomm_bench', '--auto', source]):
+                with mock.patch.object(sys, 'stderr'):
+                    with self.assertRaises(SystemExit):
+                        spicomm_bench.main()
+
+
+if __name__ == '__main__':
+    unittest.main()
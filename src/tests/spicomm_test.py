@@ -10,6 +10,7 @@ from aiy.vision._spicomm import SPICOMM_IOCTL_TRANSACT
 from aiy.vision._spicomm import SPICOMM_IOCTL_TRANSACT_MMAP
 
 from aiy.vision._spicomm import AsyncSpicomm
+from aiy.vision._spicomm import AsyncSpicommShm
 from aiy.vision._spicomm import SyncSpicomm
 from aiy.vision._spicomm import SyncSpicommMmap
 
@@ -49,6 +50,17 @@ class SpicommTestMixin:
             response = get_camera_state(spicomm)
             self.assertEqual(pb2.Response.Status.OK, response.status.code)
 
+    def test_valid_request_no_copy(self):
+        request = pb2.Request(get_camera_state=pb2.Request.GetCameraState())
+        with self.Spicomm() as spicomm:
+            for _ in range(3):
+                response_bytes = spicomm.transact(request.SerializeToString(), copy=False)
+                response = pb2.Response()
+                response.ParseFromString(response_bytes)
+                if isinstance(response_bytes, memoryview):
+                    response_bytes.release()
+                self.assertEqual(pb2.Response.Status.OK, response.status.code)
+
     def test_valid_request_force_allocate(self):
         with self.Spicomm(default_payload_size=8) as spicomm:
             response = get_camera_state(spicomm)
@@ -78,6 +90,9 @@ class SpicommTestMixin:
 class AsyncSpicommTest(SpicommTestMixin, unittest.TestCase):
     Spicomm = AsyncSpicomm
 
+class AsyncSpicommShmTest(SpicommTestMixin, unittest.TestCase):
+    Spicomm = AsyncSpicommShm
+
 class SyncSpicommTest(SpicommTestMixin, unittest.TestCase):
     Spicomm = SyncSpicomm
 
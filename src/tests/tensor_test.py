@@ -0,0 +1,109 @@
+# Copyright 2017 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import array
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from aiy.vision import _tensor
+from aiy.vision._tensor import RawImage, TensorError
+
+
+def _tensor_bytes(image):
+    out = bytearray(_tensor.tensor_data_size(_tensor.tensor_shape(image)))
+    _tensor.write_tensor(image, out)
+    return bytes(out)
+
+
+def _planar(image):
+    if image.mode == 'RGB':
+        return b''.join(band.tobytes() for band in image.split())
+    return image.tobytes()
+
+
+class TensorTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.array = rng.randint(0, 256, size=(20, 30, 3), dtype=np.uint8)
+        self.image = Image.fromarray(self.array)
+
+    def test_pil(self):
+        self.assertEqual((1, 20, 30, 3), _tensor.tensor_shape(self.image))
+        self.assertEqual(_planar(self.image), _tensor_bytes(self.image))
+
+        gray = self.image.convert('L')
+        self.assertEqual((1, 20, 30, 1), _tensor.tensor_shape(gray))
+        self.assertEqual(_planar(gray), _tensor_bytes(gray))
+
+        with self.assertRaises(TensorError):
+            _tensor.tensor_shape(self.image.convert('RGBA'))
+
+    def test_pil_without_numpy(self):
+        np_module, _tensor.np = _tensor.np, None
+        try:
+            self.assertEqual(_planar(self.image), _tensor_bytes(self.image))
+        finally:
+            _tensor.np = np_module
+
+    def test_array(self):
+        self.assertEqual(_planar(self.image), _tensor_bytes(self.array))
+        gray = self.array[:, :, 0]
+        self.assertEqual((1, 20, 30, 1), _tensor.tensor_shape(gray))
+        self.assertEqual(gray.tobytes(), _tensor_bytes(gray))
+
+        with self.assertRaises(TensorError):
+            _tensor.tensor_shape(self.array.astype(np.float32))
+        with self.assertRaises(TensorError):
+            _tensor.tensor_shape(np.zeros((20, 30, 4), dtype=np.uint8))
+
+    def test_raw_rgb_padded(self):
+        frame = np.zeros((32, 32, 3), dtype=np.uint8)
+        frame[:20, :30] = self.array
+        raw = RawImage(frame.tobytes(), 30, 20, 'rgb')
+        self.assertEqual((1, 20, 30, 3), _tensor.tensor_shape(raw))
+        self.assertEqual(_planar(self.image), _tensor_bytes(raw))
+
+        with self.assertRaises(TensorError):
+            _tensor_bytes(RawImage(frame.tobytes()[:-1], 30, 20, 'rgb'))
+
+    def test_raw_yuv(self):
+        image = Image.new('RGB', (32, 16), (200, 100, 50))
+        ycbcr = np.asarray(image.convert('YCbCr'))
+        data = b''.join((ycbcr[:, :, 0].tobytes(),
+                         ycbcr[::2, ::2, 1].tobytes(),
+                         ycbcr[::2, ::2, 2].tobytes()))
+        tensor = np.frombuffer(_tensor_bytes(RawImage(data, 32, 16, 'yuv')), dtype=np.uint8)
+        expected = np.frombuffer(_planar(image), dtype=np.uint8)
+        self.assertLessEqual(np.abs(tensor.astype(int) - expected).max(), 2)
+
+    def test_jpeg(self):
+        jpeg = b'\xff\xd8\xff\xd9'
+        self.assertEqual((1, 0, 0, 0), _tensor.tensor_shape(jpeg))
+        out = bytearray(len(jpeg))
+        _tensor.write_tensor(memoryview(jpeg), out)
+        self.assertEqual(jpeg, out)
+
+    def test_jpeg_memoryview_format(self):
+        jpeg = memoryview(array.array('H', [0xd8ff, 0xd9ff]))
+        out = bytearray(4)
+        _tensor.write_tensor(jpeg, out)
+        self.assertEqual(jpeg.tobytes(), out)
+        with self.assertRaises(ValueError):
+            _tensor.write_tensor(jpeg, bytearray(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
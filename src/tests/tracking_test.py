@@ -0,0 +1,132 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import itertools
+import random
+import unittest
+
+from aiy.vision import tracking
+from aiy.vision.models.detections import Detections
+from aiy.vision.models.face_detection import Face
+from aiy.vision.models.object_detection import Object
+
+
+def _faces(*boxes):
+    return [Face(0.9, 0.5, box) for box in boxes]
+
+
+class MatchingTest(unittest.TestCase):
+
+    def test_hungarian(self):
+        rng = random.Random(0)
+        for n, m in ((1, 1), (2, 3), (3, 3), (4, 6), (5, 5)):
+            for _ in range(20):
+                cost = [[rng.random() for _ in range(m)] for _ in range(n)]
+                columns = tracking._hungarian(cost)
+                best = min(sum(cost[i][j] for i, j in enumerate(p))
+                           for p in itertools.permutations(range(m), n))
+                self.assertEqual(n, len(set(columns)))
+                self.assertAlmostEqual(best, sum(cost[i][j] for i, j in enumerate(columns)))
+
+    def test_greedy_and_hungarian(self):
+        iou = [[0.9, 0.8],
+               [0.85, 0.1]]
+        self.assertEqual([(0, 0)], tracking._match_greedy(iou, 0.3))
+        self.assertEqual([(0, 1), (1, 0)], tracking._match_hungarian(iou, 0.3))
+        # More tracks than detections.
+        self.assertEqual([(1, 0)], tracking._match_hungarian([[0.2], [0.7], [0.5]], 0.3))
+
+
+class TrackerTest(unittest.TestCase):
+
+    def check_moving(self, matching):
+        tracker = tracking.Tracker(matching=matching)
+        ids = None
+        for frame in range(10):
+            t = 0.2 * frame
+            tracks = tracker.update(_faces((10 + 50 * t, 10, 40, 40),
+                                           (300 - 50 * t, 200, 60, 60)), timestamp=t)
+            if ids is None:
+                ids = [track.id for track in tracks]
+            self.assertEqual(ids, [track.id for track in tracks])
+        self.assertEqual([1, 2], ids)
+
+        # Constant velocity prediction between detector frames.
+        first, second = tracker.tracks
+        x, y, w, h = first.predict(1.9)
+        self.assertAlmostEqual(10 + 50 * 1.9, x, places=3)
+        self.assertAlmostEqual((10, 40, 40), (y, w, h))
+        self.assertAlmostEqual(300 - 50 * 1.9, second.predict(1.9)[0], places=3)
+        self.assertIs(tracks[1].item, second.item)
+
+    def test_moving_greedy(self):
+        self.check_moving(tracking.GREEDY)
+
+    def test_moving_hungarian(self):
+        self.check_moving(tracking.HUNGARIAN)
+
+    def test_python(self):
+        np_module, tracking.np = tracking.np, None
+        try:
+            self.check_moving(tracking.GREEDY)
+            self.test_per_class()
+        finally:
+            tracking.np = np_module
+
+    def test_coasting(self):
+        tracker = tracking.Tracker(max_misses=2)
+        track, = tracker.update(_faces((0, 0, 40, 40)), timestamp=0.0)
+        tracker.update(_faces((10, 0, 40, 40)), timestamp=1.0)
+        self.assertEqual([], tracker.update([], timestamp=2.0))
+        self.assertEqual(1, track.misses)
+        self.assertAlmostEqual(20.0, track.box[0])  # Velocity 10/s.
+
+        # Object reappears near predicted box.
+        self.assertEqual([track], tracker.update(_faces((20, 0, 40, 40)), timestamp=3.0))
+        self.assertEqual(0, track.misses)
+        self.assertEqual(3, track.hits)
+
+        # Deleted on the max_misses-th consecutive miss.
+        tracker.update([], timestamp=4.0)
+        self.assertEqual([track], tracker.tracks)
+        tracker.update([], timestamp=5.0)
+        self.assertEqual([], tracker.tracks)
+        new, = tracker.update(_faces((20, 0, 40, 40)), timestamp=6.0)
+        self.assertEqual(2, new.id)
+
+    def test_per_class(self):
+        box = (0, 0, 50, 50)
+        for per_class, expected_ids in ((True, [1, 2]), (False, [1, 1])):
+            tracker = tracking.Tracker(per_class=per_class)
+            ids = [tracker.update([Object(box, kind, 0.8)], timestamp=t)[0].id
+                   for t, kind in ((0.0, Object.PERSON), (0.1, Object.CAT))]
+            self.assertEqual(expected_ids, ids)
+
+    def test_detections(self):
+        tracker = tracking.Tracker()
+        for t in (0.0, 0.1):
+            detections = Detections([(0, 0, 10, 10), (100, 100, 20, 20)], [0.9, 0.6], [1, 2])
+            tracks = tracker.update(detections, timestamp=t)
+        self.assertEqual([1, 2], [track.id for track in tracks])
+        self.assertEqual([1, 2], [track.kind for track in tracks])
+        self.assertEqual([0.9, 0.6], [track.score for track in tracks])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            tracking.Tracker(matching='optimal')
+        with self.assertRaises(ValueError):
+            tracking.Tracker(smoothing=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
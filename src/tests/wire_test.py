@@ -0,0 +1,107 @@
+# Copyright 2018 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import random
+import unittest
+
+import numpy as np
+from google.protobuf.message import DecodeError
+
+import aiy.vision.proto.protocol_pb2 as pb2
+
+from aiy.vision import _wire
+
+
+def _response(tensors, sparse=False):
+    response = pb2.Response(status=pb2.Response.Status(code=pb2.Response.Status.OK))
+    result = response.inference_result
+    result.model_name = 'model'
+    result.width, result.height = 640, 480
+    result.window.x, result.window.width = 10, 300
+    result.duration_ms = 7
+    result.frame.index = 42
+    result.frame.timestamp_us = 123456789
+    for name, data in tensors.items():
+        tensor = result.tensors[name]
+        tensor.shape.depth = len(data)
+        tensor.data.extend(data)
+        if sparse:
+            for i in range(len(data)):
+                tensor.indices.add(values=[i, 2 * i])
+    return response
+
+
+class WireTest(unittest.TestCase):
+
+    def assertSameResult(self, expected, result):
+        for field in ('model_name', 'width', 'height', 'window', 'duration_ms', 'frame'):
+            self.assertEqual(getattr(expected, field), getattr(result, field))
+        self.assertEqual(set(expected.tensors), set(result.tensors))
+        for name, tensor in expected.tensors.items():
+            fast = result.tensors[name]
+            self.assertEqual(tensor.shape, fast.shape)
+            self.assertEqual(list(tensor.indices), list(fast.indices))
+            self.assertEqual(list(tensor.data), fast.data.tolist())
+
+    def test_parse(self):
+        rng = random.Random(0)
+        for sparse in (False, True):
+            expected = _response({'scores': [rng.random() for _ in range(7668)],
+                                  'boxes': [rng.uniform(-5, 5) for _ in range(40)],
+                                  'empty': []}, sparse)
+            response = _wire.parse_response(memoryview(expected.SerializeToString()))
+            self.assertEqual(expected.status, response.status)
+            self.assertSameResult(expected.inference_result, response.inference_result)
+            self.assertFalse(response.inference_result.tensors['scores'].data.flags.writeable)
+
+    def test_other_responses(self):
+        expected = pb2.Response(system_info=pb2.SystemInfo(uptime_seconds=5))
+        response = _wire.parse_response(expected.SerializeToString())
+        self.assertEqual(5, response.system_info.uptime_seconds)
+        self.assertFalse(response.inference_result.tensors)
+
+    def test_split_payloads(self):
+        # Concatenated messages are merged: packed chunks and repeated map keys.
+        first = _response({'a': [1.0, 2.0], 'b': [5.0]}).SerializeToString()
+        second = _response({'a': [3.0]}).SerializeToString()
+        expected = pb2.Response.FromString(first + second)
+        response = _wire.parse_response(first + second)
+        self.assertSameResult(expected.inference_result, response.inference_result)
+
+    def test_set_field(self):
+        result = _wire.parse_response(_response({}).SerializeToString()).inference_result
+        result.width = 100
+        result.window.x = 1
+        self.assertEqual((100, 1), (result.width, result.window.x))
+
+    def test_to_message(self):
+        for sparse in (False, True):
+            expected = _response({'a': [1.0, 2.0], 'b': []}, sparse).inference_result
+            data = pb2.Response(inference_result=expected).SerializeToString()
+            result = _wire.parse_response(data).inference_result
+            self.assertEqual(expected, result.to_message())
+            self.assertEqual(expected, pb2.InferenceResult.FromString(result.SerializeToString()))
+            self.assertEqual(expected.ByteSize(), result.ByteSize())
+            self.assertEqual(expected.ListFields(), result.ListFields())
+            self.assertTrue(result.HasField('window'))
+            with self.assertRaises(TypeError):
+                result.CopyFrom(expected)
+
+    def test_truncated(self):
+        data = _response({'a': [1.0, 2.0]}).SerializeToString()
+        with self.assertRaises(DecodeError):
+            _wire.parse_response(data[:-3])
+
+
+if __name__ == '__main__':
+    unittest.main()